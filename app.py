@@ -10,9 +10,8 @@ import os
 import sys
 import json
 import subprocess
-
-# Haal het huidige Python executable path op voor subprocessen
-PYTHON_EXECUTABLE = sys.executable
+from functools import partial
+from contextlib import contextmanager
 
 # Probeer .env bestand te laden indien beschikbaar
 try:
@@ -26,7 +25,7 @@ except ImportError:
 
 # Controleer Flask-afhankelijkheid
 try:
-    from flask import Flask, render_template, request, redirect, url_for
+    from flask import Flask, Response, jsonify, make_response, render_template, request, redirect, url_for, stream_with_context
 except ImportError:
     print("ERROR: Flask is niet geïnstalleerd. Dit is een vereiste afhankelijkheid.")
     print("\nInstalleer met:")
@@ -36,9 +35,9 @@ except ImportError:
     print("Zie README.md voor gedetailleerde installatie-instructies.")
     sys.exit(1)
 
-# Controleer requests-afhankelijkheid
+# Controleer requests-afhankelijkheid (gebruikt door mcp_client)
 try:
-    import requests
+    import requests  # noqa: F401
 except ImportError:
     print("ERROR: requests is niet geïnstalleerd. Dit is een vereiste afhankelijkheid.")
     print("\nInstalleer met:")
@@ -48,6 +47,21 @@ except ImportError:
     print("Zie README.md voor gedetailleerde installatie-instructies.")
     sys.exit(1)
 
+from mcp_breaker import breaker_stats
+from mcp_client import MCPClient
+from mcp_config import load_servers_or_exit, render, replicas, tool_name
+from mcp_context import LATE_RESULTS, PROGRESSIVE, gather_context, gather_progressive
+from mcp_deadline import LLM_TIMEOUT, PROMPT_DEADLINE, deadline_scope, timeout_for
+from mcp_health import HealthMonitor
+from mcp_llm_cache import LLMCache
+from mcp_semantic_cache import SemanticCache
+from mcp_metrics import PHASE_LATENCY, instrument_app
+from mcp_registry import ServerRegistry, terminate_pid
+from mcp_rerank import assemble_context, passage
+from mcp_serve import production_mode, run_production, serve_mode
+from mcp_session import SESSION_COOKIE, SessionStore, add_turn, conversation_prompt, plan_context, update_context
+from mcp_tracing import TRACE_SLOW_MS, current_span, exporter, instrument_tracing, span, use_span, waterfall
+
 # Probeer OpenAI te importeren
 try:
     import openai
@@ -86,6 +100,10 @@ except ImportError:
 
 app = Flask(__name__)
 
+# Verzoekmetrics en het /metrics endpoint
+instrument_app(app, "app")
+instrument_tracing(app, "app")
+
 # Model opties en API keys vanuit omgeving
 MODEL_OPTIONS = {}
 if openai_available:
@@ -93,43 +111,76 @@ if openai_available:
 if anthropic_available:
     MODEL_OPTIONS["anthropic"] = "Anthropic Claude 2"
 
-# Globale dict om subprocessen bij te houden
+# Modellen en parameters per modelkeuze (ook onderdeel van de sleutel in de antwoordcache)
+OPENAI_MODEL = "gpt-3.5-turbo"
+ANTHROPIC_MODEL = "claude-2"
+ANTHROPIC_MAX_TOKENS = 1000
+
+def llm_params(model_choice):
+    """Geef de parameters waarmee het gekozen model wordt aangeroepen."""
+    if model_choice == "openai":
+        return {"model": OPENAI_MODEL}
+    if model_choice == "anthropic":
+        return {"model": ANTHROPIC_MODEL, "max_tokens": ANTHROPIC_MAX_TOKENS}
+    return {}
+
+class LLMError(str):
+    """Foutmelding die in plaats van een antwoord wordt getoond; wordt niet gecachet."""
+
+# Optionele cache voor LLM-antwoorden (MCP_LLM_CACHE=1)
+llm_cache = LLMCache()
+
+# Optionele semantische caches voor bijna-identieke vragen (MCP_SEMANTIC_CACHE=1)
+semantic_context = SemanticCache("context")
+semantic_answers = SemanticCache("answer")
+
+# Optionele gesprekken met hergebruik van toolresultaten (MCP_SESSIONS=1)
+sessions = SessionStore()
+
+# Subprocessen die door dit proces zijn gestart. Welke servers draaien staat in
+# het gedeelde register, zodat alle workers en manage_mcp_servers.py hetzelfde zien.
 processes = {}
-MCP_SERVERS = {
-    "brave": {
-        "command": [PYTHON_EXECUTABLE, "brave_mcp_server.py"],
-        "env": {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY", "")},
-        "port": 5001
-    },
-    "github": {
-        "command": [PYTHON_EXECUTABLE, "github_mcp_server.py"],
-        "env": {"GITHUB_TOKEN": os.getenv("GITHUB_TOKEN", "")},
-        "port": 5002
-    }
-}
+registry = ServerRegistry()
+
+# De MCP-servers komen uit mcp_servers.toml (of het bestand in MCP_CONFIG)
+MCP_SERVERS = load_servers_or_exit()
 
 def start_mcp_server(name):
-    """Start een MCP-server proces als deze nog niet draait."""
-    if name in processes:
-        return False
+    """Start alle replica's van een MCP-server die nog niet draaien."""
     cfg = MCP_SERVERS.get(name)
     if not cfg:
         return False
+    started = [start_replica(key) for key, _, _ in replicas(name, cfg)]
+    return any(started)
+
+def start_replica(key):
+    """Start één replica van een MCP-server als deze nog niet draait."""
+    name = tool_name(key)
+    cfg = MCP_SERVERS.get(name)
+    replica = next((r for r in replicas(name, cfg) if r[0] == key), None) if cfg else None
+    if not replica:
+        return False
+    _, port, replica_env = replica
+    # Reserveer de replica in het register; faalt als een ander proces hem al draait
+    if not registry.claim(key, port):
+        return False
     try:
         # Zorg ervoor dat we hetzelfde Python-executable gebruiken
         # en kopieer de huidige PYTHONPATH om site-packages te vinden
-        env = {**os.environ, **cfg["env"]}
+        env = {**os.environ, **replica_env}
         
         # Geef informatie over het gestarte proces
         python_path = cfg["command"][0]
-        print(f"MCP server '{name}' starten met Python: {python_path}")
+        print(f"MCP server '{key}' starten op poort {port} met Python: {python_path}")
         
         proc = subprocess.Popen(cfg["command"], env=env)
-        processes[name] = proc
+        processes[key] = proc
+        registry.register(key, proc.pid, port, server=serve_mode(env))
         return True
     except Exception as e:
+        registry.remove(key)
         error_message = str(e)
-        print(f"Fout bij het starten van {name}: {error_message}")
+        print(f"Fout bij het starten van {key}: {error_message}")
         
         # Controleer op veelvoorkomende fouten en geef duidelijke meldingen
         if "No such file or directory" in error_message:
@@ -147,114 +198,354 @@ def start_mcp_server(name):
         return False
 
 def stop_mcp_server(name):
-    """Stop een draaiend MCP-server proces."""
-    proc = processes.get(name)
-    if not proc:
+    """Stop alle draaiende replica's van een MCP-server."""
+    keys = [key for key in registry.all(fresh=True) if tool_name(key) == name]
+    keys += [key for key in processes if tool_name(key) == name and key not in keys]
+    stopped = [stop_replica(key) for key in keys]
+    return any(stopped)
+
+def stop_replica(key):
+    """Stop één draaiende replica van een MCP-server."""
+    entry = registry.get(key, fresh=True)
+    proc = processes.get(key)
+    if not entry and not proc:
         return False
     try:
-        proc.terminate()
-        try:
-            proc.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            proc.kill()
-            proc.wait(timeout=2)
-        processes.pop(name, None)
+        # Eerst de status wijzigen, anders ziet de gezondheidsmonitor de stop als crash en herstart hij de replica
+        registry.mark_stopping(key)
+        if proc and (not entry or entry["pid"] == proc.pid):
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait(timeout=2)
+        elif entry and entry["pid"]:
+            # Gestart door een andere worker of door manage_mcp_servers.py
+            terminate_pid(entry["pid"])
+        if processes.get(key) is proc:
+            processes.pop(key, None)
+        registry.remove(key, status="stopping")
         return True
     except Exception as e:
-        print(f"Fout bij het stoppen van {name}: {e}")
+        print(f"Fout bij het stoppen van {key}: {e}")
+        registry.set_status(key, "running", expected="stopping")
         return False
 
+# Achtergrondcontrole van de MCP-servers; herstart gecrashte replica's met backoff
+health_monitor = HealthMonitor(registry, MCP_SERVERS, restart=start_replica)
+
+def replica_ports(name):
+    """Poorten van de draaiende replica's van een tool die bij de laatste gezondheidscontrole bereikbaar waren."""
+    return [
+        entry["port"] for key, entry in registry.all().items()
+        if tool_name(key) == name and health_monitor.is_available(key, entry)
+    ]
+
+def available_tools():
+    """
+    Namen van MCP-servers met ten minste één bereikbare replica en een circuit
+    breaker die aanroepen toelaat; een prompt slaat de andere direct over.
+    """
+    available = {
+        tool_name(key) for key, entry in registry.all().items()
+        if health_monitor.is_available(key, entry)
+    }
+    return [name for name in MCP_SERVERS if name in available and mcp_client.breakers[name].available()]
+
+def running_tools():
+    """Aantal draaiende replica's per MCP-server (voor de webinterface)."""
+    counts = {}
+    for key in registry.running():
+        counts[tool_name(key)] = counts.get(tool_name(key), 0) + 1
+    return counts
+
+# Gedeelde client met verbindingspool voor de lokale MCP-servers; verdeelt de
+# verzoeken over de gezonde replica's van elke server
+mcp_client = MCPClient(MCP_SERVERS, replicas=replica_ports)
+
+def tool_breakers():
+    """Toestand van de circuit breaker per MCP-server (voor de webinterface en /status)."""
+    return breaker_stats(mcp_client.breakers)
+
+def tool_payloads(name, user_prompt):
+    """Bouw de MCP-queries van een tool voor deze prompt volgens de configuratie."""
+    payloads = []
+    for spec in MCP_SERVERS[name]["queries"]:
+        query = " ".join(user_prompt.split()[:spec["words"]]) if spec["words"] else user_prompt
+        payload = {"type": spec["type"], "query": query}
+        if spec["count"]:
+            payload["count"] = spec["count"]
+        payloads.append(payload)
+    return payloads
+
+def tool_passages(name, responses):
+    """Zet de antwoorden van een tool om in passages met de sjablonen uit de configuratie."""
+    cfg = MCP_SERVERS[name]
+    passages = []
+    for spec, data in zip(cfg["queries"], responses):
+        for result in (data or {}).get("results") or []:
+            passages.append(passage(
+                name, render(spec["url"], result), render(spec["title"], result),
+                render(spec["snippet"], result), render(spec["context"], result),
+                weight=cfg["weight"]
+            ))
+    return passages
+
+def query_tool(name, user_prompt, timeout):
+    """Voer de queries van een tool uit; meerdere queries gaan in één batch naar de server."""
+    payloads = tool_payloads(name, user_prompt)
+    if len(payloads) == 1:
+        responses = [mcp_client.query(name, payloads[0], timeout=timeout)]
+    else:
+        responses = mcp_client.batch(name, payloads, timeout=timeout) or []
+    return tool_passages(name, responses)
+
+def context_tools(running):
+    """Tools die context leveren: draaiend, gezond en met ten minste één query, in configuratievolgorde."""
+    return [name for name, cfg in MCP_SERVERS.items() if name in running and cfg["queries"]]
+
+# Afwijkende time-outs per tool uit de configuratie
+TOOL_TIMEOUTS = {name: cfg["timeout"] for name, cfg in MCP_SERVERS.items() if cfg["timeout"] is not None}
+
+def tool_lookups(user_prompt):
+    """Opvragingen (naam, functie) voor alle actieve en gezonde tools."""
+    return [
+        (name, partial(query_tool, name, user_prompt))
+        for name in context_tools(available_tools())
+    ]
+
+def result_passages(results):
+    """Alle passages uit de resultaten van gather_context."""
+    return [item for _, passages in results for item in passages]
+
 def get_tool_context(user_prompt):
     """Maakt gebruik van actieve MCP-tools om extra context te vergaren voor de prompt."""
-    context_parts = []
-    
-    # Brave Search context
-    if "brave" in processes:
-        api_key = os.getenv("BRAVE_API_KEY")
-        if api_key:
-            headers = {"X-Subscription-Token": api_key}
-            params = {"q": user_prompt, "source": "web"}
-            try:
-                res = requests.get("https://api.search.brave.com/res/v1/search", headers=headers, params=params)
-                if res.status_code == 200:
-                    data = res.json()
-                    if data.get("web", {}).get("results"):
-                        top = data["web"]["results"][0]
-                        desc = top.get("description") or top.get("text") or ""
-                        url = top.get("url", "")
-                        context_parts.append(f"Brave zoekresultaat: {top.get('title')}. {desc} [Bron: {url}]")
-                else:
-                    print(f"Brave Search API fout: {res.status_code} - {res.text}")
-            except Exception as e:
-                print(f"Fout bij het bevragen van Brave Search: {e}")
-    
-    # GitHub context
-    if "github" in processes:
-        query = " ".join(user_prompt.split()[:5])
-        try:
-            headers = {}
-            github_token = os.getenv("GITHUB_TOKEN")
-            if github_token:
-                headers["Authorization"] = f"token {github_token}"
-                
-            res = requests.get(
-                "https://api.github.com/search/repositories", 
-                headers=headers,
-                params={"q": query}
-            )
-            
-            if res.status_code == 200:
-                data = res.json()
-                if data.get("items"):
-                    repo = data["items"][0]
-                    context_parts.append(
-                        f"GitHub repo: {repo.get('full_name')} - {repo.get('description')}\n"
-                        f"URL: {repo.get('html_url')}\n"
-                        f"Stars: {repo.get('stargazers_count')}, Forks: {repo.get('forks_count')}"
-                    )
-            else:
-                print(f"GitHub API fout: {res.status_code} - {res.text}")
-        except Exception as e:
-            print(f"Fout bij het bevragen van GitHub: {e}")
-    
-    # Combineer alle contextdelen
-    context = "\n\n".join(context_parts)
+    # Alle actieve en gezonde tools worden gelijktijdig bevraagd
+    results, _ = gather_context(tool_lookups(user_prompt), timeouts=TOOL_TIMEOUTS)
+    return build_context(user_prompt, result_passages(results))
+
+def record_cut(status):
+    """Leg in de actieve span vast welke tools de context haalden en welke te laat waren."""
+    current = current_span()
+    if current is not None:
+        current.set(
+            tools_used=",".join(name for name, outcome in status.items() if outcome == "ok"),
+            tools_late=",".join(name for name, outcome in status.items() if outcome == "te laat")
+        )
+
+def get_progressive_context(user_prompt):
+    """
+    Progressieve variant van get_tool_context.
+
+    Geeft (context, passages, late) terug zodra de snelste tool resultaten heeft
+    of de zachte deadline verstrijkt; late bevat de tools die nog bezig zijn.
+    """
+    results, status, late = gather_progressive(tool_lookups(user_prompt), timeouts=TOOL_TIMEOUTS)
+    record_cut(status)
+    passages = result_passages(results)
+    return build_context(user_prompt, passages), passages, late
+
+def build_context(user_prompt, passages):
+    """Rangschik alle passages tegen de prompt en pak de beste in het tokenbudget."""
+    with span("assemble_context", candidates=len(passages)) as current:
+        selected = assemble_context(user_prompt, passages)
+        current.set(selected=len(selected))
+    context = "\n\n".join(item["context"] for item in selected)
     if context:
         context = "## Aanvullende informatie via MCP-tools\n\n" + context
     return context
 
+def tool_context(user_prompt, use_cache=True):
+    """get_tool_context met de semantische cache ervoor (per combinatie van actieve tools)."""
+    scope = ",".join(sorted(available_tools()))
+    if use_cache:
+        cached = semantic_context.lookup(user_prompt, scope=scope)
+        if cached is not None:
+            return cached
+    context = get_tool_context(user_prompt)
+    if context:
+        semantic_context.add(user_prompt, context, scope=scope)
+    return context
+
+def prompt_context(user_prompt, use_cache=True):
+    """
+    Context voor een prompt als (context, vervolg).
+
+    Zonder progressieve modus is dit tool_context en vervolg None. In de
+    progressieve modus bevat de context alleen de tools die op tijd waren; met
+    MCP_LATE_RESULTS=refine is vervolg dan een (passages, late) voor
+    refine_answer als er nog tools bezig zijn. Onvolledige context komt niet in
+    de semantische cache.
+    """
+    if not PROGRESSIVE:
+        return tool_context(user_prompt, use_cache), None
+    scope = ",".join(sorted(available_tools()))
+    if use_cache:
+        cached = semantic_context.lookup(user_prompt, scope=scope)
+        if cached is not None:
+            return cached, None
+    context, passages, late = get_progressive_context(user_prompt)
+    if not late:
+        if context:
+            semantic_context.add(user_prompt, context, scope=scope)
+        return context, None
+    return context, (passages, late) if LATE_RESULTS == "refine" else None
+
+def late_context(user_prompt, pending):
+    """
+    Wacht op de late tools van prompt_context en geef (context, tools) met hun
+    resultaten erbij, of None als ze niets hebben opgeleverd.
+    """
+    passages, late = pending
+    with span("late_context", tools=",".join(late.names)) as current:
+        results, _ = late.collect()
+        tools = [name for name, _ in results]
+        current.set(tools_used=",".join(tools))
+    if not results:
+        return None
+    context = build_context(user_prompt, passages + result_passages(results))
+    semantic_context.add(user_prompt, context, scope=",".join(sorted(available_tools())))
+    return context, tools
+
+def refine_prompt(user_prompt, context, answer):
+    """Prompt om een eerder antwoord te verbeteren met de volledige context."""
+    return (
+        f"{context}\n\nVraag: {user_prompt}\n\n"
+        f"Eerder antwoord, gegeven zonder een deel van de bovenstaande informatie:\n{answer}\n\n"
+        "Verbeter het eerdere antwoord met de aanvullende informatie waar dat nodig is "
+        "en geef alleen het verbeterde antwoord."
+    )
+
+def refine_answer(model_choice, user_prompt, answer, pending, use_cache=True):
+    """
+    Verfijn een antwoord met de late toolresultaten.
+
+    Geeft (volledige prompt, antwoord, tools) terug, of None als de late tools
+    niets opleverden of het LLM een fout gaf.
+    """
+    late = late_context(user_prompt, pending)
+    if late is None:
+        return None
+    context, tools = late
+    full_prompt = refine_prompt(user_prompt, context, answer)
+    refined = answer_llm(model_choice, full_prompt, use_cache=use_cache)
+    if isinstance(refined, LLMError):
+        return None
+    return full_prompt, refined, tools
+
+def answer_scope(model_choice):
+    """
+    Scope van een antwoord in de semantische cache: het model en de beschikbare tools.
+
+    Een antwoord met context van Brave en GitHub wordt zo niet hergebruikt als
+    die tools niet (meer) beschikbaar zijn, en omgekeerd; net als de
+    contextcache in tool_context.
+    """
+    return f"{model_choice}|{','.join(sorted(available_tools()))}"
+
+def cached_answer(model_choice, user_prompt, use_cache=True):
+    """Geef (volledige prompt, antwoord) van een eerdere, sterk gelijkende vraag, of None."""
+    if not use_cache:
+        return None
+    cached = semantic_answers.lookup(user_prompt, scope=answer_scope(model_choice))
+    return (cached["full_prompt"], cached["answer"]) if cached is not None else None
+
+def remember_answer(model_choice, user_prompt, full_prompt, answer):
+    """Bewaar een geslaagd antwoord in de semantische cache."""
+    if answer and not isinstance(answer, LLMError):
+        semantic_answers.add(user_prompt, {"full_prompt": full_prompt, "answer": answer},
+                             scope=answer_scope(model_choice))
+
+def load_conversation():
+    """Geef (id, gesprek) voor de cookie van dit verzoek, of (None, None) als gesprekken uit staan."""
+    if not sessions.enabled:
+        return None, None
+    return sessions.load(request.cookies.get(SESSION_COOKIE))
+
+def conversation_history(conversation):
+    """Kopie van de samenvatting en de beurten van een gesprek voor de template."""
+    if conversation is None:
+        return None
+    return {"summary": list(conversation["summary"]), "turns": list(conversation["turns"])}
+
+def session_context(conversation, user_prompt):
+    """
+    Context voor een vraag in een gesprek.
+
+    De MCP-tools worden alleen bevraagd bij een nieuw onderwerp of voor de
+    termen die de bewaarde resultaten nog niet dekken (zie plan_context);
+    daarna worden alle bewaarde passages tegen het gesprek gerangschikt.
+    """
+    plan, query, ranking = plan_context(conversation, user_prompt)
+    with span("session_context", plan=plan) as current:
+        passages = []
+        if query is not None:
+            results, _ = gather_context(tool_lookups(query), timeouts=TOOL_TIMEOUTS)
+            passages = result_passages(results)
+        update_context(conversation, plan, user_prompt, passages)
+        current.set(fetched=len(passages), kept=len(conversation["passages"]))
+    return build_context(ranking, conversation["passages"])
+
+def question_prompt(conversation, user_prompt, use_cache=True):
+    """
+    Volledige prompt voor een vraag als (volledige prompt, vervolg).
+
+    In een gesprek bevat de prompt de context van session_context en het
+    eerdere gesprek, en is vervolg altijd None; anders is dit prompt_context.
+    """
+    if conversation is not None:
+        context = session_context(conversation, user_prompt)
+        return conversation_prompt(conversation, context, user_prompt), None
+    context, pending = prompt_context(user_prompt, use_cache)
+    return (f"{context}\n\nVraag: {user_prompt}" if context else user_prompt), pending
+
+def record_turn(session_id, conversation, user_prompt, answer):
+    """Bewaar een geslaagde beurt in het gesprek."""
+    if conversation is not None and answer and not isinstance(answer, LLMError):
+        add_turn(conversation, user_prompt, answer)
+        sessions.save(session_id, conversation)
+
+def with_session_cookie(response, session_id):
+    """Zet de gesprekscookie op een antwoord."""
+    if session_id is not None:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=sessions.ttl, httponly=True, samesite="Lax")
+    return response
+
 def query_llm(model_choice, prompt_text):
     """Stuurt de prompt naar het gekozen LLM-model en geeft het antwoord terug."""
     if model_choice == "openai" and openai_available:
         if not openai.api_key:
-            return "OpenAI API-sleutel niet geconfigureerd. Stel de OPENAI_API_KEY omgevingsvariabele in."
+            return LLMError("OpenAI API-sleutel niet geconfigureerd. Stel de OPENAI_API_KEY omgevingsvariabele in.")
         
         try:
             resp = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt_text}]
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt_text}],
+                request_timeout=timeout_for(LLM_TIMEOUT)
             )
             return resp["choices"][0]["message"]["content"]
         except Exception as e:
             error_msg = f"Fout bij OpenAI API aanroep: {str(e)}"
             print(error_msg)
-            return error_msg
+            return LLMError(error_msg)
     
     elif model_choice == "anthropic" and anthropic_available:
         if not anthropic_api_key:
-            return "Anthropic API-sleutel niet geconfigureerd. Stel de ANTHROPIC_API_KEY omgevingsvariabele in."
+            return LLMError("Anthropic API-sleutel niet geconfigureerd. Stel de ANTHROPIC_API_KEY omgevingsvariabele in.")
         
         if not claude_client:
-            return "Claude client kon niet worden geïnitialiseerd."
+            return LLMError("Claude client kon niet worden geïnitialiseerd.")
         
         try:
             # Update voor nieuwere versies van de Anthropic SDK
             message = claude_client.messages.create(
-                model="claude-2",
-                max_tokens=1000,
+                model=ANTHROPIC_MODEL,
+                max_tokens=ANTHROPIC_MAX_TOKENS,
                 messages=[
                     {"role": "user", "content": prompt_text}
-                ]
+                ],
+                timeout=timeout_for(LLM_TIMEOUT)
             )
             return message.content[0].text
         except AttributeError:
@@ -262,21 +553,133 @@ def query_llm(model_choice, prompt_text):
             try:
                 resp = claude_client.completions.create(
                     prompt=f"{anthropic.HUMAN_PROMPT} {prompt_text} {anthropic.AI_PROMPT}",
-                    model="claude-2",
-                    max_tokens_to_sample=1000
+                    model=ANTHROPIC_MODEL,
+                    max_tokens_to_sample=ANTHROPIC_MAX_TOKENS,
+                    timeout=timeout_for(LLM_TIMEOUT)
                 )
                 return resp.completion
             except Exception as e:
                 error_msg = f"Fout bij Anthropic API aanroep (oudere SDK): {str(e)}"
                 print(error_msg)
-                return error_msg
+                return LLMError(error_msg)
         except Exception as e:
             error_msg = f"Fout bij Anthropic API aanroep: {str(e)}"
             print(error_msg)
-            return error_msg
+            return LLMError(error_msg)
+    
+    else:
+        return LLMError("Ongeldig model of API client niet beschikbaar.")
+
+def stream_llm(model_choice, prompt_text):
+    """Stuurt de prompt naar het gekozen LLM-model en geeft het antwoord in stukjes terug zodra ze binnenkomen."""
+    if model_choice == "openai" and openai_available:
+        if not openai.api_key:
+            yield LLMError("OpenAI API-sleutel niet geconfigureerd. Stel de OPENAI_API_KEY omgevingsvariabele in.")
+            return
+        
+        try:
+            chunks = openai.ChatCompletion.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt_text}],
+                stream=True,
+                request_timeout=timeout_for(LLM_TIMEOUT)
+            )
+            for chunk in chunks:
+                text = chunk["choices"][0].get("delta", {}).get("content")
+                if text:
+                    yield text
+        except Exception as e:
+            error_msg = f"Fout bij OpenAI API aanroep: {str(e)}"
+            print(error_msg)
+            yield LLMError(error_msg)
+    
+    elif model_choice == "anthropic" and anthropic_available:
+        if not anthropic_api_key:
+            yield LLMError("Anthropic API-sleutel niet geconfigureerd. Stel de ANTHROPIC_API_KEY omgevingsvariabele in.")
+            return
+        
+        if not claude_client:
+            yield LLMError("Claude client kon niet worden geïnitialiseerd.")
+            return
+        
+        if hasattr(claude_client, "messages"):
+            try:
+                with claude_client.messages.stream(
+                    model=ANTHROPIC_MODEL,
+                    max_tokens=ANTHROPIC_MAX_TOKENS,
+                    messages=[
+                        {"role": "user", "content": prompt_text}
+                    ],
+                    timeout=timeout_for(LLM_TIMEOUT)
+                ) as stream:
+                    for text in stream.text_stream:
+                        yield text
+            except Exception as e:
+                error_msg = f"Fout bij Anthropic API aanroep: {str(e)}"
+                print(error_msg)
+                yield LLMError(error_msg)
+        else:
+            # Fallback voor oudere versies van de Anthropic SDK
+            try:
+                events = claude_client.completions.create(
+                    prompt=f"{anthropic.HUMAN_PROMPT} {prompt_text} {anthropic.AI_PROMPT}",
+                    model=ANTHROPIC_MODEL,
+                    max_tokens_to_sample=ANTHROPIC_MAX_TOKENS,
+                    stream=True,
+                    timeout=timeout_for(LLM_TIMEOUT)
+                )
+                for event in events:
+                    if event.completion:
+                        yield event.completion
+            except Exception as e:
+                error_msg = f"Fout bij Anthropic API aanroep (oudere SDK): {str(e)}"
+                print(error_msg)
+                yield LLMError(error_msg)
     
     else:
-        return "Ongeldig model of API client niet beschikbaar."
+        yield LLMError("Ongeldig model of API client niet beschikbaar.")
+
+def answer_llm(model_choice, prompt_text, use_cache=True):
+    """query_llm met de antwoordcache ervoor; use_cache=False vraagt altijd een nieuw antwoord."""
+    params = llm_params(model_choice)
+    if use_cache:
+        cached = llm_cache.get(model_choice, params, prompt_text)
+        if cached is not None:
+            return cached
+    answer = query_llm(model_choice, prompt_text)
+    if not isinstance(answer, LLMError):
+        llm_cache.set(model_choice, params, prompt_text, answer)
+    return answer
+
+def stream_answer(model_choice, prompt_text, use_cache=True):
+    """stream_llm met de antwoordcache ervoor; een gecachet antwoord komt in één stuk."""
+    params = llm_params(model_choice)
+    if use_cache:
+        cached = llm_cache.get(model_choice, params, prompt_text)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    for text in stream_llm(model_choice, prompt_text):
+        parts.append(text)
+        yield text
+    if parts and not any(isinstance(text, LLMError) for text in parts):
+        llm_cache.set(model_choice, params, prompt_text, "".join(parts))
+
+def sse_event(event, data):
+    """Formatteer een Server-Sent Event met JSON-data."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@contextmanager
+def phase(name, span_name, **attributes):
+    """Meet een fase van de promptverwerking als metric en als trace-span."""
+    with PHASE_LATENCY.time(phase=name), span(span_name, **attributes):
+        yield
+
+@app.before_request
+def start_health_monitor():
+    """Start de gezondheidsmonitor in elk (worker)proces bij het eerste verzoek."""
+    health_monitor.ensure_started()
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -285,33 +688,166 @@ def index():
     selected_model = None
     user_prompt = None
     full_prompt = None
+    refined_with = None
+    session_id, conversation = load_conversation()
+    history = conversation_history(conversation)
     
     if request.method == "POST" and "prompt" in request.form:
         # Prompt verwerken via tools en model
         selected_model = request.form.get("model")
         user_prompt = request.form.get("prompt", "")
+        use_cache = not request.form.get("geen_cache")
+        # Een vervolgvraag hangt af van het gesprek en hoort niet in de semantische cache
+        follow_up = bool(history and history["turns"])
         
-        # Haal context op via actieve tools
-        context = get_tool_context(user_prompt)
-        
-        # Combineer context en prompt
-        full_prompt = f"{context}\n\nVraag: {user_prompt}" if context else user_prompt
-        
-        # Vraag het LLM om antwoord
-        answer = query_llm(selected_model, full_prompt)
+        # Een sterk gelijkende eerdere vraag kan direct beantwoord worden
+        cached = cached_answer(selected_model, user_prompt, use_cache and not follow_up)
+        if cached is not None:
+            full_prompt, answer = cached
+        else:
+            # Context en LLM samen binnen het tijdsbudget van de prompt
+            with deadline_scope(PROMPT_DEADLINE):
+                # Haal context op via actieve tools en combineer deze met de prompt
+                with phase("context", "get_tool_context"):
+                    full_prompt, pending = question_prompt(conversation, user_prompt, use_cache)
+                
+                # Vraag het LLM om antwoord
+                with phase("llm", "query_llm", model=selected_model):
+                    answer = answer_llm(selected_model, full_prompt, use_cache=use_cache)
+                
+                # Progressieve modus: verfijn het antwoord met de tools die te laat waren
+                if pending and not isinstance(answer, LLMError):
+                    with phase("refine", "refine_answer", model=selected_model):
+                        refined = refine_answer(selected_model, user_prompt, answer, pending, use_cache)
+                    if refined is not None:
+                        full_prompt, answer, refined_with = refined
+            if not follow_up:
+                remember_answer(selected_model, user_prompt, full_prompt, answer)
+        record_turn(session_id, conversation, user_prompt, answer)
     
     # Geeft de indexpagina weer
-    running_tools = list(processes.keys())
+    running = running_tools()
+    with phase("render", "render"):
+        return with_session_cookie(make_response(render_template(
+            "index.html", 
+            models=MODEL_OPTIONS, 
+            running=running,
+            breakers=tool_breakers(),
+            tools={name: cfg["label"] for name, cfg in MCP_SERVERS.items()},
+            selected_model=selected_model, 
+            prompt=user_prompt, 
+            answer=answer,
+            full_prompt=full_prompt,
+            refined_with=refined_with,
+            history=history,
+            llm_cache_enabled=llm_cache.enabled or semantic_answers.enabled
+        )), session_id)
+
+@app.route("/stream", methods=["POST"])
+def stream():
+    """Verwerk een prompt en stuur het antwoord als Server-Sent Events naar de browser."""
+    selected_model = request.form.get("model")
+    user_prompt = request.form.get("prompt", "")
+    use_cache = not request.form.get("geen_cache")
+    session_id, conversation = load_conversation()
+    follow_up = bool(conversation and conversation["turns"])
+    
+    request_span = current_span()
+    
+    def generate():
+        # Stuur direct iets terug zodat de browser niet op de context hoeft te wachten
+        yield ": verbonden\n\n"
+        
+        # De generator draait buiten de view; hang de spans aan het verzoek
+        with use_span(request_span), deadline_scope(PROMPT_DEADLINE):
+            cached = cached_answer(selected_model, user_prompt, use_cache and not follow_up)
+            if cached is not None:
+                yield sse_event("prompt", {"full_prompt": cached[0]})
+                yield sse_event("token", {"text": cached[1]})
+                record_turn(session_id, conversation, user_prompt, cached[1])
+                yield sse_event("done", {})
+                return
+            
+            with phase("context", "get_tool_context"):
+                full_prompt, pending = question_prompt(conversation, user_prompt, use_cache)
+            yield sse_event("prompt", {"full_prompt": full_prompt})
+            
+            parts = []
+            with phase("llm_stream", "stream_llm", model=selected_model):
+                for text in stream_answer(selected_model, full_prompt, use_cache=use_cache):
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+            
+            # Progressieve modus: vervang het antwoord door een verfijning met de late tools
+            if pending and not any(isinstance(text, LLMError) for text in parts):
+                with phase("refine", "late_context"):
+                    late = late_context(user_prompt, pending)
+                if late is not None:
+                    full_prompt = refine_prompt(user_prompt, late[0], "".join(parts))
+                    yield sse_event("refine", {
+                        "full_prompt": full_prompt, "tools": [MCP_SERVERS[name]["label"] for name in late[1]]
+                    })
+                    parts = []
+                    with phase("llm_stream", "stream_llm", model=selected_model):
+                        for text in stream_answer(selected_model, full_prompt, use_cache=use_cache):
+                            parts.append(text)
+                            yield sse_event("token", {"text": text})
+            if not any(isinstance(text, LLMError) for text in parts):
+                if not follow_up:
+                    remember_answer(selected_model, user_prompt, full_prompt, "".join(parts))
+                record_turn(session_id, conversation, user_prompt, "".join(parts))
+        yield sse_event("done", {})
+    
+    return with_session_cookie(Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    ), session_id)
+
+@app.route("/debug/traces", methods=["GET"])
+def debug_traces():
+    """Toon recente trage verzoeken en de watervalweergave van een trace."""
+    min_ms = 0.0 if request.args.get("alle") else TRACE_SLOW_MS
+    trace_id = request.args.get("trace")
     return render_template(
-        "index.html", 
-        models=MODEL_OPTIONS, 
-        running=running_tools,
-        selected_model=selected_model, 
-        prompt=user_prompt, 
-        answer=answer,
-        full_prompt=full_prompt
+        "traces.html",
+        traces=exporter.recent(min_duration_ms=min_ms),
+        min_ms=min_ms,
+        trace_id=trace_id,
+        spans=waterfall(trace_id) if trace_id else []
     )
 
+def tool_status():
+    """Status van de MCP-tools: draaiende replica's, beschikbaarheid en circuit breakers."""
+    running = running_tools()
+    available = available_tools()
+    breakers = tool_breakers()
+    return {
+        "tools": {
+            name: {
+                "replicas": running.get(name, 0),
+                "available": name in available,
+                "circuit_breaker": breakers[name]
+            }
+            for name in MCP_SERVERS
+        }
+    }
+
+@app.route("/status", methods=["GET"])
+def status():
+    """Status van de MCP-tools en de gesprekken als JSON."""
+    return jsonify({**tool_status(), "sessions": sessions.stats()})
+
+@app.route("/gesprek/nieuw", methods=["POST"])
+def new_conversation():
+    """Beëindig het huidige gesprek; de volgende vraag begint een nieuw gesprek."""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if session_id:
+        sessions.delete(session_id)
+    response = redirect(url_for("index"))
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
 @app.route("/start/<tool>", methods=["POST"])
 def start_tool(tool):
     """Start een MCP-server via de webinterface."""
@@ -336,4 +872,7 @@ if __name__ == "__main__":
     print(f"Actieve Python omgeving: {sys.executable}")
     print(f"Beschikbare modellen: {', '.join(MODEL_OPTIONS.values()) if MODEL_OPTIONS else 'Geen'}")
     print("Open http://localhost:5000 in je browser om de interface te gebruiken.")
-    app.run(debug=True)
+    if production_mode():
+        run_production(app, "127.0.0.1", 5000, "Flask MCP-integratie Applicatie")
+    else:
+        app.run(debug=True)
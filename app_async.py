@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Flask MCP-integratie Applicatie - Async modus
+
+ASGI-variant van app.py op basis van Quart (de async tegenhanger van Flask).
+De volledige verwerking van een prompt is non-blocking: de MCP-servers worden
+bevraagd met httpx.AsyncClient en de LLM-modellen met de async clients van
+OpenAI en Anthropic. Eén worker kan zo honderden prompts tegelijk afhandelen in
+plaats van één per thread.
+
+Configuratie, templates en het beheer van MCP-servers worden gedeeld met app.py.
+Blokkerende onderdelen daarvan (het SQLite-register, de antwoordcache, de
+gesprekken en de semantische cache) worden in de thread pool uitgevoerd, zodat
+ze de event loop niet ophouden.
+
+Gebruik:
+- Ontwikkeling: 'python app_async.py'
+- Productie: 'hypercorn app_async:app --bind 127.0.0.1:5000'
+  of 'uvicorn app_async:app --port 5000'
+"""
+
+import sys
+import asyncio
+import contextvars
+from functools import partial
+
+# Controleer de async afhankelijkheden
+try:
+    from quart import Quart, jsonify, make_response, render_template, request, redirect, url_for
+    import httpx  # noqa: F401 - nodig voor AsyncMCPClient
+except ImportError as e:
+    module_name = str(e).split("'")[-2]
+    print(f"ERROR: De benodigde module '{module_name}' voor de async modus is niet geïnstalleerd.")
+    print("\nInstalleer de async pakketten met:")
+    print("    pip install quart httpx")
+    print("\nOf gebruik de standaard (synchrone) applicatie met 'python app.py'.")
+    sys.exit(1)
+
+import app as sync_app
+from app import LLMError
+from mcp_client import AsyncMCPClient
+from mcp_context import LATE_RESULTS, PROGRESSIVE, gather_context_async, gather_progressive_async
+from mcp_deadline import LLM_TIMEOUT, PROMPT_DEADLINE, deadline_scope, timeout_for
+from mcp_metrics import instrument_app_async
+from mcp_session import SESSION_COOKIE, conversation_prompt, plan_context, update_context
+from mcp_tracing import TRACE_SLOW_MS, current_span, exporter, instrument_tracing_async, span, use_span, waterfall
+
+app = Quart(__name__)
+# Dezelfde verzoekmetrics, /metrics en verzoekspans als app.py
+instrument_app_async(app, "app")
+instrument_tracing_async(app, "app")
+
+# Gedeelde async client met verbindingspool voor de lokale MCP-servers; deelt de
+# circuit breakers met app.py, zodat de webinterface en /status dezelfde toestand tonen
+mcp_client = AsyncMCPClient(
+    sync_app.MCP_SERVERS, replicas=sync_app.replica_ports, breakers=sync_app.mcp_client.breakers
+)
+
+# Async LLM-clients
+openai = sync_app.openai if sync_app.openai_available else None
+claude_client = None
+if sync_app.anthropic_available and getattr(sync_app, "anthropic_api_key", None):
+    try:
+        claude_client = sync_app.anthropic.AsyncAnthropic(api_key=sync_app.anthropic_api_key)
+    except Exception as e:
+        print(f"Fout bij het aanmaken van async Anthropic client: {e}")
+
+async def run_blocking(func, *args, **kwargs):
+    """Voer blokkerende code (SQLite, schijf) uit in de thread pool, met de deadline en trace van het verzoek."""
+    call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+async def query_tool(name, user_prompt, timeout):
+    """Voer de queries van een tool uit zonder te blokkeren (zie app.query_tool)."""
+    payloads = sync_app.tool_payloads(name, user_prompt)
+    if len(payloads) == 1:
+        responses = [await mcp_client.query(name, payloads[0], timeout=timeout)]
+    else:
+        responses = await mcp_client.batch(name, payloads, timeout=timeout) or []
+    return sync_app.tool_passages(name, responses)
+
+def tool_lookups(user_prompt, tools):
+    """Async opvragingen (naam, coroutinefunctie) voor de opgegeven actieve en gezonde tools."""
+    return [
+        (name, partial(query_tool, name, user_prompt))
+        for name in sync_app.context_tools(tools)
+    ]
+
+async def available_tools():
+    """sync_app.available_tools zonder de event loop te blokkeren (het register staat in SQLite)."""
+    return await run_blocking(sync_app.available_tools)
+
+async def get_tool_context(user_prompt, tools=None):
+    """Verzamel context van alle actieve MCP-tools zonder de event loop te blokkeren."""
+    if tools is None:
+        tools = await available_tools()
+    results, _ = await gather_context_async(tool_lookups(user_prompt, tools), timeouts=sync_app.TOOL_TIMEOUTS)
+    return sync_app.build_context(user_prompt, sync_app.result_passages(results))
+
+async def tool_context(user_prompt, use_cache=True):
+    """get_tool_context met de semantische cache ervoor (zie app.tool_context)."""
+    tools = await available_tools()
+    scope = ",".join(sorted(tools))
+    if use_cache:
+        cached = await run_blocking(sync_app.semantic_context.lookup, user_prompt, scope=scope)
+        if cached is not None:
+            return cached
+    context = await get_tool_context(user_prompt, tools)
+    if context:
+        await run_blocking(sync_app.semantic_context.add, user_prompt, context, scope=scope)
+    return context
+
+async def prompt_context(user_prompt, use_cache=True):
+    """Context voor een prompt als (context, vervolg), ook in de progressieve modus (zie app.prompt_context)."""
+    if not PROGRESSIVE:
+        return await tool_context(user_prompt, use_cache), None
+    tools = await available_tools()
+    scope = ",".join(sorted(tools))
+    if use_cache:
+        cached = await run_blocking(sync_app.semantic_context.lookup, user_prompt, scope=scope)
+        if cached is not None:
+            return cached, None
+    results, status, late = await gather_progressive_async(
+        tool_lookups(user_prompt, tools), timeouts=sync_app.TOOL_TIMEOUTS
+    )
+    sync_app.record_cut(status)
+    passages = sync_app.result_passages(results)
+    context = sync_app.build_context(user_prompt, passages)
+    if not late:
+        if context:
+            await run_blocking(sync_app.semantic_context.add, user_prompt, context, scope=scope)
+        return context, None
+    return context, (passages, late) if LATE_RESULTS == "refine" else None
+
+async def late_context(user_prompt, pending):
+    """Wacht op de late tools en geef (context, tools), of None (zie app.late_context)."""
+    passages, late = pending
+    with span("late_context", tools=",".join(late.names)) as current:
+        results, _ = await late.collect()
+        tools = [name for name, _ in results]
+        current.set(tools_used=",".join(tools))
+    if not results:
+        return None
+    context = sync_app.build_context(user_prompt, passages + sync_app.result_passages(results))
+    scope = ",".join(sorted(await available_tools()))
+    await run_blocking(sync_app.semantic_context.add, user_prompt, context, scope=scope)
+    return context, tools
+
+async def load_conversation():
+    """Geef (id, gesprek) voor de cookie van dit verzoek, of (None, None) (zie app.load_conversation)."""
+    if not sync_app.sessions.enabled:
+        return None, None
+    return await run_blocking(sync_app.sessions.load, request.cookies.get(SESSION_COOKIE))
+
+async def session_context(conversation, user_prompt):
+    """Context voor een vraag in een gesprek; alleen de delta wordt opgehaald (zie app.session_context)."""
+    plan, query, ranking = plan_context(conversation, user_prompt)
+    with span("session_context", plan=plan) as current:
+        passages = []
+        if query is not None:
+            lookups = tool_lookups(query, await available_tools())
+            results, _ = await gather_context_async(lookups, timeouts=sync_app.TOOL_TIMEOUTS)
+            passages = sync_app.result_passages(results)
+        update_context(conversation, plan, user_prompt, passages)
+        current.set(fetched=len(passages), kept=len(conversation["passages"]))
+    return sync_app.build_context(ranking, conversation["passages"])
+
+async def question_prompt(conversation, user_prompt, use_cache=True):
+    """Volledige prompt voor een vraag als (volledige prompt, vervolg) (zie app.question_prompt)."""
+    if conversation is not None:
+        context = await session_context(conversation, user_prompt)
+        return conversation_prompt(conversation, context, user_prompt), None
+    context, pending = await prompt_context(user_prompt, use_cache)
+    return (f"{context}\n\nVraag: {user_prompt}" if context else user_prompt), pending
+
+def llm_unavailable(model_choice):
+    """Geef een foutmelding terug als het gekozen model niet bruikbaar is, anders None."""
+    if model_choice == "openai" and openai is not None:
+        if not openai.api_key:
+            return LLMError("OpenAI API-sleutel niet geconfigureerd. Stel de OPENAI_API_KEY omgevingsvariabele in.")
+        return None
+    if model_choice == "anthropic" and sync_app.anthropic_available:
+        if not getattr(sync_app, "anthropic_api_key", None):
+            return LLMError("Anthropic API-sleutel niet geconfigureerd. Stel de ANTHROPIC_API_KEY omgevingsvariabele in.")
+        if not claude_client:
+            return LLMError("Claude client kon niet worden geïnitialiseerd.")
+        return None
+    return LLMError("Ongeldig model of API client niet beschikbaar.")
+
+async def query_llm(model_choice, prompt_text):
+    """Stuurt de prompt naar het gekozen LLM-model via de async clients."""
+    error = llm_unavailable(model_choice)
+    if error:
+        return error
+
+    if model_choice == "openai":
+        try:
+            resp = await openai.ChatCompletion.acreate(
+                model=sync_app.OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt_text}],
+                request_timeout=timeout_for(LLM_TIMEOUT)
+            )
+            return resp["choices"][0]["message"]["content"]
+        except Exception as e:
+            error_msg = f"Fout bij OpenAI API aanroep: {str(e)}"
+            print(error_msg)
+            return LLMError(error_msg)
+
+    try:
+        message = await claude_client.messages.create(
+            model=sync_app.ANTHROPIC_MODEL,
+            max_tokens=sync_app.ANTHROPIC_MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt_text}],
+            timeout=timeout_for(LLM_TIMEOUT)
+        )
+        return message.content[0].text
+    except Exception as e:
+        error_msg = f"Fout bij Anthropic API aanroep: {str(e)}"
+        print(error_msg)
+        return LLMError(error_msg)
+
+async def stream_llm(model_choice, prompt_text):
+    """Async generator die het antwoord van het LLM in stukjes teruggeeft."""
+    error = llm_unavailable(model_choice)
+    if error:
+        yield error
+        return
+
+    try:
+        if model_choice == "openai":
+            chunks = await openai.ChatCompletion.acreate(
+                model=sync_app.OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt_text}],
+                stream=True,
+                request_timeout=timeout_for(LLM_TIMEOUT)
+            )
+            async for chunk in chunks:
+                text = chunk["choices"][0].get("delta", {}).get("content")
+                if text:
+                    yield text
+        else:
+            async with claude_client.messages.stream(
+                model=sync_app.ANTHROPIC_MODEL,
+                max_tokens=sync_app.ANTHROPIC_MAX_TOKENS,
+                messages=[{"role": "user", "content": prompt_text}],
+                timeout=timeout_for(LLM_TIMEOUT)
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+    except Exception as e:
+        error_msg = f"Fout bij {model_choice} API aanroep: {str(e)}"
+        print(error_msg)
+        yield LLMError(error_msg)
+
+async def answer_llm(model_choice, prompt_text, use_cache=True):
+    """query_llm met de antwoordcache ervoor (zie app.answer_llm)."""
+    params = sync_app.llm_params(model_choice)
+    if use_cache:
+        cached = await run_blocking(sync_app.llm_cache.get, model_choice, params, prompt_text)
+        if cached is not None:
+            return cached
+    answer = await query_llm(model_choice, prompt_text)
+    if not isinstance(answer, LLMError):
+        await run_blocking(sync_app.llm_cache.set, model_choice, params, prompt_text, answer)
+    return answer
+
+async def stream_answer(model_choice, prompt_text, use_cache=True):
+    """stream_llm met de antwoordcache ervoor (zie app.stream_answer)."""
+    params = sync_app.llm_params(model_choice)
+    if use_cache:
+        cached = await run_blocking(sync_app.llm_cache.get, model_choice, params, prompt_text)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    async for text in stream_llm(model_choice, prompt_text):
+        parts.append(text)
+        yield text
+    if parts and not any(isinstance(text, LLMError) for text in parts):
+        await run_blocking(sync_app.llm_cache.set, model_choice, params, prompt_text, "".join(parts))
+
+@app.route("/", methods=["GET", "POST"])
+async def index():
+    """Hoofdroute voor de webinterface."""
+    answer = None
+    selected_model = None
+    user_prompt = None
+    full_prompt = None
+    refined_with = None
+    session_id, conversation = await load_conversation()
+    history = sync_app.conversation_history(conversation)
+
+    form = await request.form
+    if request.method == "POST" and "prompt" in form:
+        selected_model = form.get("model")
+        user_prompt = form.get("prompt", "")
+        use_cache = not form.get("geen_cache")
+        follow_up = bool(history and history["turns"])
+
+        cached = await run_blocking(sync_app.cached_answer, selected_model, user_prompt, use_cache and not follow_up)
+        if cached is not None:
+            full_prompt, answer = cached
+        else:
+            with deadline_scope(PROMPT_DEADLINE):
+                with sync_app.phase("context", "get_tool_context"):
+                    full_prompt, pending = await question_prompt(conversation, user_prompt, use_cache)
+                with sync_app.phase("llm", "query_llm", model=selected_model):
+                    answer = await answer_llm(selected_model, full_prompt, use_cache=use_cache)
+                if pending and not isinstance(answer, LLMError):
+                    with sync_app.phase("refine", "refine_answer", model=selected_model):
+                        late = await late_context(user_prompt, pending)
+                        if late is not None:
+                            refine_prompt = sync_app.refine_prompt(user_prompt, late[0], answer)
+                            refined = await answer_llm(selected_model, refine_prompt, use_cache=use_cache)
+                            if not isinstance(refined, LLMError):
+                                full_prompt, answer, refined_with = refine_prompt, refined, late[1]
+            if not follow_up:
+                await run_blocking(sync_app.remember_answer, selected_model, user_prompt, full_prompt, answer)
+        await run_blocking(sync_app.record_turn, session_id, conversation, user_prompt, answer)
+
+    return sync_app.with_session_cookie(await make_response(await render_template(
+        "index.html",
+        models=sync_app.MODEL_OPTIONS,
+        running=await run_blocking(sync_app.running_tools),
+        breakers=sync_app.tool_breakers(),
+        tools={name: cfg["label"] for name, cfg in sync_app.MCP_SERVERS.items()},
+        selected_model=selected_model,
+        prompt=user_prompt,
+        answer=answer,
+        full_prompt=full_prompt,
+        refined_with=refined_with,
+        history=history,
+        llm_cache_enabled=sync_app.llm_cache.enabled or sync_app.semantic_answers.enabled
+    )), session_id)
+
+@app.route("/stream", methods=["POST"])
+async def stream():
+    """Verwerk een prompt en stuur het antwoord als Server-Sent Events naar de browser."""
+    form = await request.form
+    selected_model = form.get("model")
+    user_prompt = form.get("prompt", "")
+    use_cache = not form.get("geen_cache")
+    session_id, conversation = await load_conversation()
+    follow_up = bool(conversation and conversation["turns"])
+    request_span = current_span()
+
+    async def generate():
+        yield ": verbonden\n\n"
+
+        cached = await run_blocking(sync_app.cached_answer, selected_model, user_prompt, use_cache and not follow_up)
+        if cached is not None:
+            yield sync_app.sse_event("prompt", {"full_prompt": cached[0]})
+            yield sync_app.sse_event("token", {"text": cached[1]})
+            await run_blocking(sync_app.record_turn, session_id, conversation, user_prompt, cached[1])
+            yield sync_app.sse_event("done", {})
+            return
+
+        # De generator draait buiten de view; hang de spans aan het verzoek
+        with use_span(request_span), deadline_scope(PROMPT_DEADLINE):
+            with sync_app.phase("context", "get_tool_context"):
+                full_prompt, pending = await question_prompt(conversation, user_prompt, use_cache)
+            yield sync_app.sse_event("prompt", {"full_prompt": full_prompt})
+
+            parts = []
+            with sync_app.phase("llm_stream", "stream_llm", model=selected_model):
+                async for text in stream_answer(selected_model, full_prompt, use_cache=use_cache):
+                    parts.append(text)
+                    yield sync_app.sse_event("token", {"text": text})
+
+            if pending and not any(isinstance(text, LLMError) for text in parts):
+                with sync_app.phase("refine", "late_context"):
+                    late = await late_context(user_prompt, pending)
+                if late is not None:
+                    full_prompt = sync_app.refine_prompt(user_prompt, late[0], "".join(parts))
+                    yield sync_app.sse_event("refine", {
+                        "full_prompt": full_prompt,
+                        "tools": [sync_app.MCP_SERVERS[name]["label"] for name in late[1]]
+                    })
+                    parts = []
+                    with sync_app.phase("llm_stream", "stream_llm", model=selected_model):
+                        async for text in stream_answer(selected_model, full_prompt, use_cache=use_cache):
+                            parts.append(text)
+                            yield sync_app.sse_event("token", {"text": text})
+        if not any(isinstance(text, LLMError) for text in parts):
+            if not follow_up:
+                await run_blocking(sync_app.remember_answer, selected_model, user_prompt, full_prompt, "".join(parts))
+            await run_blocking(sync_app.record_turn, session_id, conversation, user_prompt, "".join(parts))
+        yield sync_app.sse_event("done", {})
+
+    return sync_app.with_session_cookie(await make_response(generate(), 200, {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }), session_id)
+
+@app.route("/debug/traces", methods=["GET"])
+async def debug_traces():
+    """Toon recente trage verzoeken en de watervalweergave van een trace (zie app.debug_traces)."""
+    min_ms = 0.0 if request.args.get("alle") else TRACE_SLOW_MS
+    trace_id = request.args.get("trace")
+    # De watervalweergave leest zo nodig het tracebestand van schijf
+    spans = await run_blocking(waterfall, trace_id) if trace_id else []
+    return await render_template(
+        "traces.html",
+        traces=exporter.recent(min_duration_ms=min_ms),
+        min_ms=min_ms,
+        trace_id=trace_id,
+        spans=spans
+    )
+
+@app.route("/status", methods=["GET"])
+async def status():
+    """Status van de MCP-tools en de gesprekken (zie app.status)."""
+    return jsonify({**await run_blocking(sync_app.tool_status), "sessions": sync_app.sessions.stats()})
+
+@app.route("/gesprek/nieuw", methods=["POST"])
+async def new_conversation():
+    """Beëindig het huidige gesprek (zie app.new_conversation)."""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if session_id:
+        await run_blocking(sync_app.sessions.delete, session_id)
+    response = redirect(url_for("index"))
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
+@app.route("/start/<tool>", methods=["POST"])
+async def start_tool(tool):
+    """Start een MCP-server via de webinterface."""
+    await run_blocking(sync_app.start_mcp_server, tool)
+    return redirect(url_for("index"))
+
+@app.route("/stop/<tool>", methods=["POST"])
+async def stop_tool(tool):
+    """Stop een MCP-server via de webinterface."""
+    # Stoppen wacht op het proces, dus niet op de event loop uitvoeren
+    await run_blocking(sync_app.stop_mcp_server, tool)
+    return redirect(url_for("index"))
+
+@app.before_serving
+async def start_health_monitor():
+    """Start de gezondheidsmonitor bij het opstarten van de server."""
+    sync_app.health_monitor.ensure_started()
+
+@app.after_serving
+async def close_clients():
+    """Sluit gedeelde verbindingen bij het afsluiten van de server."""
+    await mcp_client.aclose()
+
+if __name__ == "__main__":
+    print("Flask MCP-integratie Applicatie (async modus) wordt gestart...")
+    print(f"Beschikbare modellen: {', '.join(sync_app.MODEL_OPTIONS.values()) if sync_app.MODEL_OPTIONS else 'Geen'}")
+    print("Open http://localhost:5000 in je browser om de interface te gebruiken.")
+    app.run(port=5000)
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Benchmark en belastingstest
+
+Meet de prestaties van de applicatie zonder echte API's: alle upstreams (Brave,
+GitHub, OpenAI en Anthropic) worden nagebootst door fake_upstreams.py met
+instelbare latentie, jitter, foutkans en rate limits. Zo zijn metingen
+reproduceerbaar en kunnen regressies vóór een deploy worden gevonden.
+
+Scenario's:
+- opstart: 'manage_mcp_servers.py start all' en 'stop all' (duur per cyclus)
+- mcp:     gelijktijdige verzoeken op /mcp/query van elke MCP-server (per tool)
+- index:   gelijktijdige prompts via de webinterface (POST /), inclusief context
+           ophalen, rangschikken en het LLM; draait in dit proces via de Flask test client
+
+Per scenario worden het aantal verzoeken en fouten, de doorvoer (verzoeken per
+seconde), de p50/p95/p99-latentie en het geheugengebruik (RSS) van de processen
+gerapporteerd. Met --uitvoer worden de resultaten als JSON bewaard; met
+--basislijn wordt vergeleken met een eerder resultaat en stopt het programma met
+een foutcode als een scenario meer dan --marge slechter is.
+
+Gebruik:
+    python benchmark.py [opstart|mcp|index|alles ...] [--verzoeken 200] [--gelijktijdig 8]
+                        [--herhaling 0.0] [--model openai] [--productie] [--latentie 50] [--jitter 20]
+                        [--foutkans 0.0] [--limiet 0] [--uitschieters 0.0] [--llm-latentie 300]
+                        [--uitvoer resultaat.json] [--basislijn basis.json] [--marge 0.2]
+
+De MCP-servers gebruiken de poorten uit mcp_servers.toml; die moeten vrij zijn.
+Het serverregister staat tijdens de benchmark in een tijdelijke map, zodat
+servers die al voor de applicatie draaien niet worden aangeraakt. De eigen rate
+limits van de MCP-servers worden verhoogd zodat ze de meting niet bepalen, tenzij
+BRAVE_RATE_LIMIT, GITHUB_SEARCH_RATE_LIMIT of GITHUB_CODE_RATE_LIMIT al zijn ingesteld.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from mcp_config import load_servers_or_exit, replicas
+
+# psutil is optioneel; zonder psutil wordt het geheugen uit /proc gelezen
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROJECT_DIR = Path(__file__).resolve().parent
+SCENARIOS = ("opstart", "mcp", "index")
+
+WORDS = ("flask", "python", "mcp", "server", "async", "cache", "latency", "search", "github",
+         "api", "model", "stream", "token", "context", "protocol", "benchmark", "database",
+         "docker", "kubernetes", "rust", "javascript", "webserver", "performance", "tutorial")
+
+def percentile(values, fraction):
+    """Percentiel volgens de nearest-rank-methode van een gesorteerde lijst."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+def _children(pid):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", encoding="utf-8") as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return children + [grandchild for child in children for grandchild in _children(child)]
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def rss_mb(pid=None, children=True):
+    """
+    Geheugengebruik (RSS) van een proces en zijn subprocessen in MB.
+
+    De subprocessen tellen mee voor de workers van gunicorn in productiemodus.
+    Geeft None terug als het geheugen niet te bepalen is.
+    """
+    pid = os.getpid() if pid is None else pid
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + (process.children(recursive=True) if children else [])
+            return round(sum(p.memory_info().rss for p in processes) / 1024 / 1024, 1)
+        except psutil.Error:
+            return None
+    own = _rss_kb(pid)
+    if own is None:
+        return None
+    if children:
+        own += sum(_rss_kb(child) or 0 for child in _children(pid))
+    return round(own / 1024, 1)
+
+def port_in_use(port, host="127.0.0.1"):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex((host, port)) == 0
+
+class Prompts:
+    """Deterministische prompts; een deel herhaalt een eerdere prompt (voor cache-effecten)."""
+
+    def __init__(self, repeat=0.0, seed=1):
+        self.repeat = repeat
+        self._random = random.Random(seed)
+        self._used = []
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self._used and self._random.random() < self.repeat:
+                return self._random.choice(self._used)
+            prompt = "Hoe gebruik ik " + " ".join(self._random.choice(WORDS) for _ in range(6)) + "?"
+            self._used.append(prompt)
+            return prompt
+
+def run_load(call, total, concurrency, warmup=0):
+    """
+    Voer call() total keer uit met concurrency gelijktijdige threads.
+
+    call geeft True terug bij succes. Geeft de samenvatting met doorvoer en
+    latentiepercentielen (in ms) terug.
+    """
+    for _ in range(warmup):
+        call()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call()
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def summarize(latencies, errors, seconds):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(latencies) / seconds, 2) if seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 0.50), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 1) if latencies else None,
+        "max_ms": round(latencies[-1], 1) if latencies else None
+    }
+
+class Benchmark:
+    """Start de nep-upstreams en MCP-servers en voert de scenario's uit."""
+
+    def __init__(self, args):
+        self.args = args
+        self.servers = load_servers_or_exit()
+        self.workdir = Path(tempfile.mkdtemp(prefix="mcp-benchmark-"))
+        self.log = open(self.workdir / "processen.log", "ab")
+        self.upstream_url = f"http://127.0.0.1:{args.upstream_poort}"
+        self.upstream = None
+        self.results = {}
+
+    def environment(self):
+        """Omgevingsvariabelen die de applicatie en de MCP-servers naar de nep-upstreams sturen."""
+        url = self.upstream_url
+        env = {
+            "BRAVE_SEARCH_URL": f"{url}/brave/res/v1/search",
+            "GITHUB_API_URL": f"{url}/github",
+            "OPENAI_API_BASE": f"{url}/openai/v1",
+            "ANTHROPIC_BASE_URL": f"{url}/anthropic",
+            "BRAVE_API_KEY": "benchmark",
+            "GITHUB_TOKEN": "benchmark",
+            "OPENAI_API_KEY": "benchmark",
+            "ANTHROPIC_API_KEY": "benchmark",
+            "MCP_REGISTRY_DB": str(self.workdir / "registry.db"),
+            "MCP_LLM_CACHE_DB": str(self.workdir / "llm_cache.db"),
+            "MCP_SEMANTIC_CACHE_DIR": str(self.workdir)
+        }
+        limits = {"BRAVE_RATE_LIMIT": "100000", "GITHUB_SEARCH_RATE_LIMIT": "100000",
+                  "GITHUB_CODE_RATE_LIMIT": "100000"}
+        env.update({name: value for name, value in limits.items() if not os.getenv(name)})
+        return env
+
+    def check_ports(self):
+        busy = [port for port in [self.args.upstream_poort] +
+                [port for cfg in self.servers.values() for port in cfg["ports"]] if port_in_use(port)]
+        if busy:
+            print(f"ERROR: Poort(en) {', '.join(map(str, busy))} zijn bezet. Stop eerst de draaiende servers.")
+            sys.exit(1)
+
+    def start_upstreams(self):
+        args = self.args
+        cmd = [sys.executable, str(PROJECT_DIR / "fake_upstreams.py"), "--poort", str(args.upstream_poort),
+               "--latentie", args.latentie, "--jitter", args.jitter, "--foutkans", args.foutkans,
+               "--limiet", args.limiet, "--uitschieters", args.uitschieters,
+               "--uitschieter-ms", str(args.uitschieter_ms), "--token-ms", str(args.token_ms)]
+        if args.llm_latentie is not None:
+            cmd += ["--llm-latentie", str(args.llm_latentie)]
+        self.upstream = subprocess.Popen(cmd, stdout=self.log, stderr=self.log, cwd=PROJECT_DIR)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(self.upstream_url, timeout=0.5).ok:
+                    return
+            except requests.RequestException:
+                pass
+            if self.upstream.poll() is not None:
+                break
+            time.sleep(0.1)
+        print(f"ERROR: Nep-upstreams konden niet worden gestart, zie {self.log.name}")
+        self.upstream.kill()
+        sys.exit(1)
+
+    def manage(self, action):
+        """Voer manage_mcp_servers.py uit; geeft (geslaagd, duur in seconden) terug."""
+        cmd = [sys.executable, str(PROJECT_DIR / "manage_mcp_servers.py"), action, "all"]
+        if action == "start" and self.args.productie:
+            cmd.append("--productie")
+        start = time.perf_counter()
+        result = subprocess.run(cmd, stdout=self.log, stderr=self.log, cwd=PROJECT_DIR)
+        return result.returncode == 0, time.perf_counter() - start
+
+    def server_memory(self):
+        """RSS per MCP-serverproces, uit het (tijdelijke) serverregister."""
+        from mcp_registry import ServerRegistry
+        registry = ServerRegistry(os.environ["MCP_REGISTRY_DB"])
+        return {key: rss_mb(entry["pid"]) for key, entry in sorted(registry.all(fresh=True).items())}
+
+    def scenario_opstart(self):
+        start_times, stop_times, errors = [], [], 0
+        memory = {}
+        for _ in range(self.args.opstarts):
+            ok, seconds = self.manage("start")
+            start_times.append(seconds * 1000)
+            errors += not ok
+            memory = self.server_memory()
+            ok, seconds = self.manage("stop")
+            stop_times.append(seconds * 1000)
+            errors += not ok
+        result = summarize(start_times, errors, sum(start_times) / 1000)
+        result["stop_p50_ms"] = round(percentile(sorted(stop_times), 0.50), 1)
+        result["rss_mb"] = memory
+        self.results["opstart"] = result
+
+    def scenario_mcp(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.args.gelijktijdig)
+        session.mount("http://", adapter)
+        for name, cfg in self.servers.items():
+            prompts = Prompts(self.args.herhaling)
+            ports = [port for _, port, _ in replicas(name, cfg)]
+            spec = cfg["queries"][0] if cfg["queries"] else {"type": "search", "words": None, "count": None}
+            counter = iter(range(10**9))
+            counter_lock = threading.Lock()
+
+            def call():
+                prompt = prompts.next()
+                query = " ".join(prompt.split()[:spec["words"]]) if spec["words"] else prompt
+                payload = {"type": spec["type"], "query": query}
+                if spec["count"]:
+                    payload["count"] = spec["count"]
+                with counter_lock:
+                    port = ports[next(counter) % len(ports)]
+                response = session.post(f"http://localhost:{port}/mcp/query", json=payload, timeout=30)
+                return response.ok and "error" not in response.json()
+
+            result = run_load(call, self.args.verzoeken, self.args.gelijktijdig, self.args.opwarmen)
+            result["rss_mb"] = {key: mb for key, mb in self.server_memory().items()
+                                if key.split("#", 1)[0] == name}
+            self.results[f"mcp:{name}"] = result
+
+    def scenario_index(self):
+        # Pas importeren nu de omgeving naar de nep-upstreams wijst
+        import app as webapp
+
+        if self.args.model not in webapp.MODEL_OPTIONS:
+            print(f"WAARSCHUWING: model '{self.args.model}' is niet beschikbaar; de LLM-stap wordt niet gemeten.")
+        prompts = Prompts(self.args.herhaling)
+        clients = threading.local()
+        form = {"model": self.args.model}
+        if not self.args.met_cache:
+            form["geen_cache"] = "1"
+
+        def call():
+            if not hasattr(clients, "client"):
+                clients.client = webapp.app.test_client()
+            response = clients.client.post("/", data=dict(form, prompt=prompts.next()))
+            return response.status_code == 200
+
+        result = run_load(call, self.args.verzoeken, self.args.gelijktijdig, self.args.opwarmen)
+        # Zonder subprocessen: de nep-upstreams draaien als subproces van dit proces
+        result["rss_mb"] = {"app": rss_mb(children=False), **self.server_memory()}
+        self.results["index"] = result
+
+    def run(self, scenarios):
+        self.check_ports()
+        os.environ.update(self.environment())
+        self.start_upstreams()
+        servers_running = False
+        try:
+            if "opstart" in scenarios:
+                print("Scenario opstart...")
+                self.scenario_opstart()
+            if "mcp" in scenarios or "index" in scenarios:
+                ok, _ = self.manage("start")
+                servers_running = True
+                if not ok:
+                    print(f"ERROR: MCP-servers konden niet worden gestart, zie {self.log.name}")
+                    return self.results
+            if "mcp" in scenarios:
+                print("Scenario mcp...")
+                self.scenario_mcp()
+            if "index" in scenarios:
+                print("Scenario index...")
+                self.scenario_index()
+        finally:
+            if servers_running:
+                self.manage("stop")
+            self.upstream.terminate()
+            self.upstream.wait(timeout=10)
+            self.log.close()
+        return self.results
+
+def report(results):
+    print(f"\n{'Scenario':<16} {'verzoeken':>9} {'fouten':>7} {'per sec':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9}  RSS MB")
+    for name, result in results.items():
+        memory = ", ".join(f"{key}={mb}" for key, mb in (result.get("rss_mb") or {}).items())
+        print(f"{name:<16} {result['requests']:>9} {result['errors']:>7} {result['throughput'] or 0:>9} "
+              f"{result['p50_ms'] or 0:>9} {result['p95_ms'] or 0:>9} {result['p99_ms'] or 0:>9}  {memory}")
+
+def compare(results, baseline, margin):
+    """Vergelijk met een basislijn; geeft de gevonden regressies als tekst terug."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and result["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + margin):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms, basislijn {base['p95_ms']} ms")
+        if base.get("throughput") and result["throughput"] and result["throughput"] < base["throughput"] * (1 - margin):
+            regressions.append(f"{name}: {result['throughput']} per seconde, basislijn {base['throughput']}")
+        if result["requests"] and base.get("requests"):
+            error_rate = result["errors"] / result["requests"]
+            base_rate = base["errors"] / base["requests"]
+            if error_rate > base_rate + margin / 10:
+                regressions.append(f"{name}: {error_rate:.1%} fouten, basislijn {base_rate:.1%}")
+    return regressions
+
+def main():
+    """Hoofdfunctie voor het verwerken van commandoregelargumenten."""
+    parser = argparse.ArgumentParser(description="Benchmark van de MCP-integratie met nagebootste upstreams")
+    # Geen choices: argparse controleert een lijst als standaardwaarde van nargs="*"
+    # in sommige Python-versies als geheel tegen de keuzes; zie de controle hieronder
+    parser.add_argument("scenario", nargs="*", default=["alles"],
+                        help=f"De uit te voeren scenario's: {', '.join(SCENARIOS)} of alles (standaard alles)")
+    parser.add_argument("--verzoeken", type=int, default=200, help="Aantal verzoeken per scenario")
+    parser.add_argument("--gelijktijdig", type=int, default=8, help="Aantal gelijktijdige verzoeken")
+    parser.add_argument("--opwarmen", type=int, default=5, help="Niet gemeten verzoeken vooraf")
+    parser.add_argument("--opstarts", type=int, default=3, help="Aantal start/stop-cycli in het scenario opstart")
+    parser.add_argument("--herhaling", type=float, default=0.0,
+                        help="Deel van de prompts dat een eerdere prompt herhaalt (0.0 - 1.0)")
+    parser.add_argument("--model", default="openai", help="Het LLM-model voor het scenario index")
+    parser.add_argument("--productie", action="store_true",
+                        help="Start de MCP-servers met een productieserver (gunicorn/waitress)")
+    parser.add_argument("--met-cache", action="store_true",
+                        help="Gebruik de antwoordcaches in het scenario index (standaard uitgeschakeld)")
+    parser.add_argument("--upstream-poort", type=int, default=5900, help="Poort van de nep-upstreams")
+    parser.add_argument("--latentie", default="50", help="Latentie van de upstreams in ms (zie fake_upstreams.py)")
+    parser.add_argument("--jitter", default="20", help="Spreiding van de latentie in ms")
+    parser.add_argument("--foutkans", default="0", help="Kans op een upstream-fout (0.0 - 1.0)")
+    parser.add_argument("--limiet", default="0", help="Rate limit van de upstreams per minuut (0 = geen)")
+    parser.add_argument("--uitschieters", default="0", help="Kans op een trage uitschieter (0.0 - 1.0)")
+    parser.add_argument("--uitschieter-ms", type=float, default=1000.0, help="Extra latentie van een uitschieter in ms")
+    parser.add_argument("--llm-latentie", type=float, default=None, help="Latentie van de LLM-API's in ms")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="Tijd per token bij streaming in ms")
+    parser.add_argument("--uitvoer", help="Bewaar de resultaten als JSON in dit bestand")
+    parser.add_argument("--basislijn", help="Vergelijk met de resultaten in dit JSON-bestand")
+    parser.add_argument("--marge", type=float, default=0.2,
+                        help="Toegestane verslechtering ten opzichte van de basislijn (standaard 0.2 = 20%%)")
+
+    args = parser.parse_args()
+    unknown = [name for name in args.scenario if name not in SCENARIOS + ("alles",)]
+    if unknown:
+        parser.error(f"onbekend scenario: {', '.join(unknown)} (kies uit {', '.join(SCENARIOS)} of alles)")
+    if args.opstarts < 1:
+        parser.error("--opstarts moet minimaal 1 zijn")
+    scenarios = SCENARIOS if "alles" in args.scenario else tuple(args.scenario)
+
+    results = Benchmark(args).run(scenarios)
+    report(results)
+
+    if args.uitvoer:
+        with open(args.uitvoer, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                         "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)},
+                "results": results
+            }, f, indent=2)
+        print(f"\nResultaten opgeslagen in {args.uitvoer}")
+
+    if args.basislijn:
+        with open(args.basislijn, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.marge)
+        if regressions:
+            print("\nREGRESSIE ten opzichte van de basislijn:")
+            for line in regressions:
+                print(f"- {line}")
+            sys.exit(1)
+        print("\nGeen regressies ten opzichte van de basislijn.")
+
+if __name__ == "__main__":
+    main()
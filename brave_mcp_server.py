@@ -12,7 +12,10 @@ Vereisten:
 
 Gebruik:
 - Start de server met 'python brave_mcp_server.py'
-- De server draait standaard op http://localhost:5001
+- De server draait standaard op http://localhost:5001 (instelbaar met MCP_PORT)
+- BRAVE_SEARCH_URL wijst naar een andere API, zoals de nep-upstreams van benchmark.py
+- De upstream-aanroep volgt de deadline van het verzoek (header X-MCP-Deadline-Ms, zie mcp_deadline.py)
+- Faalt de Brave Search API herhaald, dan wordt deze tijdelijk niet aangeroepen (circuit breaker, zie mcp_breaker.py)
 """
 
 import os
@@ -34,6 +37,18 @@ except ImportError as e:
     print("\nZie README.md voor gedetailleerde installatie-instructies.")
     sys.exit(1)
 
+from mcp_batch import batch_response
+from mcp_breaker import CircuitBreaker, CircuitOpenError, breaker_stats, open_response, server_error
+from mcp_cache import ResponseCache, make_key
+from mcp_client import create_session
+from mcp_deadline import DeadlineExceeded, expired, expired_response, instrument_deadline, timeout_for
+from mcp_hedge import UPSTREAM_HEDGE_ENABLED, Hedger
+from mcp_metrics import instrument_app, instrumented_get, register_cache
+from mcp_ratelimit import RateLimiter, limited_response
+from mcp_singleflight import SingleFlight
+from mcp_serve import production_mode, run_production
+from mcp_tracing import instrument_tracing
+
 # Laad .env bestand indien beschikbaar
 try:
     from dotenv import load_dotenv
@@ -45,21 +60,56 @@ except ImportError:
 
 app = Flask(__name__)
 
+# Gedeelde sessie met verbindingspool voor upstream API-verzoeken (keep-alive)
+upstream = create_session()
+
 # Configuratie
-PORT = 5001
+PORT = int(os.getenv("MCP_PORT", "5001"))
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
-BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/search"
+BRAVE_SEARCH_URL = os.getenv("BRAVE_SEARCH_URL", "https://api.search.brave.com/res/v1/search")
+BRAVE_CACHE_TTL = int(os.getenv("BRAVE_CACHE_TTL", os.getenv("MCP_CACHE_TTL", "600")))  # Seconden
+BRAVE_RATE_LIMIT = int(os.getenv("BRAVE_RATE_LIMIT", "60"))  # Verzoeken per minuut (gratis abonnement: 1 per seconde)
+
+# Cache voor zoekresultaten, zodat herhaalde vragen de betaalde API niet raken
+cache = ResponseCache(default_ttl=BRAVE_CACHE_TTL)
+
+# Metrics op /metrics, inclusief de cache-statistieken
+instrument_app(app, "brave")
+instrument_tracing(app, "brave")
+instrument_deadline(app)
+register_cache(cache, "brave")
+
+# Token bucket per API-sleutel, zodat bursts het abonnementsquotum niet overschrijden
+limiter = RateLimiter()
+search_bucket = limiter.bucket("brave_search", BRAVE_API_KEY, per_minute=BRAVE_RATE_LIMIT, burst=1)
+
+# Tweede poging bij een trage upstream-aanroep (alleen met MCP_UPSTREAM_HEDGE=1, kost quotum)
+hedger = Hedger("brave", enabled=UPSTREAM_HEDGE_ENABLED)
+
+# Circuit breaker per upstream-endpoint; bij een storing geen aanroepen en geen quotum verspillen
+search_breaker = CircuitBreaker("brave_search")
+breakers = {"brave_search": search_breaker}
+
+# Identieke gelijktijdige zoekopdrachten delen één upstream-aanroep
+flight = SingleFlight("brave")
 
 if not BRAVE_API_KEY:
     print("WAARSCHUWING: BRAVE_API_KEY is niet ingesteld. De server zal niet correct werken.")
     print("Voeg BRAVE_API_KEY toe aan je omgevingsvariabelen of .env bestand.")
 
-def log_error(message, exception=None):
-    """Centraal punt voor foutregistratie."""
+def log_error(message, exception=None, show_traceback=True):
+    """
+    Centraal punt voor foutregistratie.
+
+    Verwachte fouten van de upstream (verbindingsfouten, time-outs) worden met
+    show_traceback=False op één regel gelogd; de traceback is alleen nuttig bij
+    onverwachte fouten.
+    """
     print(f"ERROR: {message}")
     if exception:
         print(f"Details: {str(exception)}")
-        traceback.print_exc()
+        if show_traceback:
+            traceback.print_exc()
 
 @app.route("/", methods=["GET"])
 def home():
@@ -67,7 +117,10 @@ def home():
     return jsonify({
         "service": "Brave Search MCP Server",
         "status": "running",
-        "api_key_present": bool(BRAVE_API_KEY)
+        "api_key_present": bool(BRAVE_API_KEY),
+        "cache": cache.stats(),
+        "rate_limits": limiter.stats(),
+        "circuit_breakers": breaker_stats(breakers)
     })
 
 @app.route("/search", methods=["POST"])
@@ -83,69 +136,112 @@ def search():
         if not query:
             return jsonify({"error": "Missing query parameter"}), 400
         
-        # Controleer of de API-sleutel aanwezig is
-        if not BRAVE_API_KEY:
-            return jsonify({
-                "error": "BRAVE_API_KEY is not set. Please configure the environment variable."
-            }), 500
-        
-        # Roep de Brave Search API aan
-        try:
-            headers = {"X-Subscription-Token": BRAVE_API_KEY}
-            params = {
-                "q": query,
-                "source": "web",
-                "count": 3  # Aantal resultaten
-            }
-            
-            response = requests.get(BRAVE_SEARCH_URL, headers=headers, params=params)
-            
-            if response.status_code != 200:
-                error_message = f"Brave Search API returned status code {response.status_code}"
-                log_error(error_message)
-                return jsonify({
-                    "error": error_message,
-                    "message": response.text
-                }), response.status_code
-            
-            search_results = response.json()
-            
-            # Formateer de resultaten in een MCP-compatibel antwoord
-            mcp_response = {
-                "results": []
-            }
-            
-            # Verwerk web resultaten
-            if search_results.get("web", {}).get("results"):
-                for result in search_results["web"]["results"][:3]:  # Beperk tot 3 resultaten
-                    mcp_response["results"].append({
-                        "title": result.get("title", ""),
-                        "description": result.get("description") or result.get("text", ""),
-                        "url": result.get("url", ""),
-                        "source": "brave_search"
-                    })
-            
-            return jsonify(mcp_response)
-            
-        except requests.exceptions.ConnectionError as e:
-            log_error("Verbindingsfout bij het aanroepen van Brave Search API", e)
-            return jsonify({
-                "error": "Connection error when calling Brave Search API",
-                "message": "Controleer uw internetverbinding"
-            }), 503
-        except requests.exceptions.Timeout as e:
-            log_error("Time-out bij het aanroepen van Brave Search API", e)
-            return jsonify({
-                "error": "Timeout when calling Brave Search API",
-                "message": "De Brave Search API reageert traag of is niet beschikbaar"
-            }), 504
-        except Exception as e:
-            log_error("Onverwachte fout bij het aanroepen van Brave Search API", e)
-            return jsonify({"error": str(e)}), 500
+        return brave_search(query)
     except Exception as e:
         log_error("Algemene fout in search endpoint", e)
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+def brave_search(query):
+    """
+    Zoek via de cache, of anders via de Brave Search API.
+
+    Identieke gelijktijdige zoekopdrachten delen één upstream-aanroep. Geeft een
+    antwoord als (body, status) of (body, status, headers) terug.
+    """
+    # Geef een eerder resultaat terug als het nog geldig is
+    cache_key = make_key("search", query, count=3)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached, 200
+    
+    # Controleer of de API-sleutel aanwezig is
+    if not BRAVE_API_KEY:
+        return {
+            "error": "BRAVE_API_KEY is not set. Please configure the environment variable."
+        }, 500
+    
+    return flight.do(cache_key, lambda: fetch_search(query, cache_key))
+
+def fetch_search(query, cache_key):
+    """Roep de Brave Search API aan binnen het quotum en bewaar het resultaat in de cache."""
+    # Wacht de applicatie niet meer op het antwoord, dan heeft de aanroep geen zin
+    if expired():
+        return expired_response(cache, cache_key, "brave_search")
+    
+    # Faalt de API de laatste tijd, dan niet aanroepen; een verouderd resultaat of 503
+    if not search_breaker.available():
+        return open_response(cache, cache_key, search_breaker)
+    
+    # Wacht kort op ruimte binnen het quotum; anders een verouderd resultaat of 429
+    if not search_bucket.acquire():
+        return limited_response(cache, cache_key, search_bucket)
+    
+    # Roep de Brave Search API aan
+    try:
+        headers = {"X-Subscription-Token": BRAVE_API_KEY}
+        params = {
+            "q": query,
+            "source": "web",
+            "count": 3  # Aantal resultaten
+        }
+        
+        # Een extra poging moet direct een token uit het quotum kunnen nemen
+        response = search_breaker.call(lambda: hedger.call("brave_search", lambda attempt: instrumented_get(
+            upstream, "brave_search", BRAVE_SEARCH_URL, headers=headers, params=params, timeout=timeout_for()
+        ), allow_hedge=search_bucket.try_acquire), failed=server_error)
+        
+        if search_bucket.update_from_headers(response.headers, response.status_code):
+            log_error("Brave Search API limiet bereikt")
+            return limited_response(cache, cache_key, search_bucket)
+        
+        if response.status_code != 200:
+            error_message = f"Brave Search API returned status code {response.status_code}"
+            log_error(error_message)
+            return {
+                "error": error_message,
+                "message": response.text
+            }, response.status_code
+        
+        search_results = response.json()
+        
+        # Formateer de resultaten in een MCP-compatibel antwoord
+        mcp_response = {
+            "results": []
+        }
+        
+        # Verwerk web resultaten
+        if search_results.get("web", {}).get("results"):
+            for result in search_results["web"]["results"][:3]:  # Beperk tot 3 resultaten
+                mcp_response["results"].append({
+                    "title": result.get("title", ""),
+                    "description": result.get("description") or result.get("text", ""),
+                    "url": result.get("url", ""),
+                    "source": "brave_search"
+                })
+        
+        cache.set(cache_key, mcp_response)
+        return mcp_response, 200
+        
+    except requests.exceptions.ConnectionError as e:
+        log_error("Verbindingsfout bij het aanroepen van Brave Search API", e, show_traceback=False)
+        return {
+            "error": "Connection error when calling Brave Search API",
+            "message": "Controleer uw internetverbinding"
+        }, 503
+    except requests.exceptions.Timeout as e:
+        log_error("Time-out bij het aanroepen van Brave Search API", e, show_traceback=False)
+        return {
+            "error": "Timeout when calling Brave Search API",
+            "message": "De Brave Search API reageert traag of is niet beschikbaar"
+        }, 504
+    except DeadlineExceeded:
+        return expired_response(cache, cache_key, "brave_search")
+    except CircuitOpenError:
+        return open_response(cache, cache_key, search_breaker)
+    except Exception as e:
+        log_error("Onverwachte fout bij het aanroepen van Brave Search API", e)
+        return {"error": str(e)}, 500
+
 @app.route("/mcp/query", methods=["POST"])
 def mcp_query():
     """Standaard MCP query endpoint."""
@@ -162,19 +258,44 @@ def mcp_query():
         log_error("Algemene fout in mcp_query endpoint", e)
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+def dispatch_query(item):
+    """Voer één MCP-query uit een batch uit; geeft (body, status[, headers]) terug."""
+    if not isinstance(item, dict):
+        return {"error": "Invalid request format"}, 400
+    if item.get("type") != "search":
+        return {"error": "Unsupported query type"}, 400
+    query = item.get("query")
+    if not query:
+        return {"error": "Missing query parameter"}, 400
+    return brave_search(query)
+
+@app.route("/mcp/batch", methods=["POST"])
+def mcp_batch():
+    """Voer een lijst van MCP-queries gelijktijdig uit: {"queries": [{"type": "search", "query": ...}, ...]}."""
+    try:
+        body, status = batch_response(request.get_json(silent=True), dispatch_query)
+        return jsonify(body), status
+    except Exception as e:
+        log_error("Algemene fout in mcp_batch endpoint", e)
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
 if __name__ == "__main__":
     print(f"Starting Brave Search MCP Server on port {PORT}")
     print(f"API Key present: {bool(BRAVE_API_KEY)}")
     try:
-        # Gebruik threaded=False om socket gerelateerde problemen te voorkomen
-        # vooral op Windows-systemen met WinError 10038
-        app.run(host="127.0.0.1", port=PORT, threaded=False)
+        if production_mode():
+            # Productieserver met meerdere workers en threads
+            run_production(app, "127.0.0.1", PORT, "Brave Search MCP Server")
+        else:
+            # Gebruik threaded=False om socket gerelateerde problemen te voorkomen
+            # vooral op Windows-systemen met WinError 10038
+            app.run(host="127.0.0.1", port=PORT, threaded=False)
     except OSError as e:
         if "10038" in str(e):
             # Specifieke afhandeling voor socket error 10038 (WinError)
             log_error("Socket error 10038 detected. Probeer af te sluiten en opnieuw te starten.", e)
-            print("\nVoor Windows-gebruikers: Controleer of er geen andere processen draaien op poort 5001.")
-            print("Gebruik 'netstat -ano | findstr 5001' om actieve processen te vinden.")
+            print(f"\nVoor Windows-gebruikers: Controleer of er geen andere processen draaien op poort {PORT}.")
+            print(f"Gebruik 'netstat -ano | findstr {PORT}' om actieve processen te vinden.")
             print("Gebruik daarna 'taskkill /F /PID <pid>' om ze te beëindigen.")
         else:
             log_error(f"OSError bij het starten van de server", e)
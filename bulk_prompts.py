@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Bulkverwerking van prompts
+
+Verwerkt een groot aantal prompts zonder de webinterface: per prompt wordt
+context opgehaald via de actieve MCP-tools (question_prompt) en het gekozen
+LLM-model bevraagd (answer_llm), precies zoals in de webinterface; in de
+progressieve modus wordt het antwoord ook verfijnd met late toolresultaten
+(refine_answer). Meerdere prompts worden tegelijk verwerkt, met een
+instelbare bovengrens.
+
+Invoer is een JSONL-bestand (per regel een object met "prompt" en optioneel "id"
+en "model", of alleen een string) of een CSV-bestand met een kolom "prompt" (en
+optioneel "id" en "model"). Resultaten worden direct na elke prompt als JSONL
+weggeschreven. Het uitvoerbestand dient ook als checkpoint: bij een herstart
+worden prompts die al een resultaat hebben overgeslagen, en mislukte prompts
+opnieuw geprobeerd.
+
+Gebruik:
+    python bulk_prompts.py prompts.jsonl [--uitvoer resultaten.jsonl] [--model openai]
+                           [--gelijktijdig 4] [--opnieuw]
+
+De MCP-servers moeten draaien (python manage_mcp_servers.py start all). Net als
+in de webinterface controleert de gezondheidsmonitor ze tijdens de run, zodat een
+onbereikbare tool wordt overgeslagen en een gecrashte server wordt herstart.
+
+Configuratie via omgevingsvariabelen:
+- MCP_BULK_CONCURRENCY: standaard aantal gelijktijdige prompts (standaard 4)
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import app
+from mcp_deadline import PROMPT_DEADLINE, deadline_scope
+from mcp_tracing import span
+
+BULK_CONCURRENCY = int(os.getenv("MCP_BULK_CONCURRENCY", "4"))
+
+def read_prompts(path):
+    """Lees prompts uit een JSONL- of CSV-bestand als dicts met id, prompt en model."""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows, start=1):
+            if isinstance(row, str):
+                row = {"prompt": row}
+            prompt = (row.get("prompt") or "").strip()
+            if not prompt:
+                print(f"Regel {index} overgeslagen: geen prompt.")
+                continue
+            yield {
+                "id": str(row.get("id") or index),
+                "prompt": prompt,
+                "model": row.get("model") or None
+            }
+
+def completed_ids(path):
+    """Geef de id's terug die al een geslaagd resultaat in het uitvoerbestand hebben."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # Een half geschreven laatste regel na een onderbreking
+                continue
+            if "error" not in result:
+                done.add(str(result.get("id")))
+    return done
+
+def process_prompt(record, default_model):
+    """Verwerk één prompt via de MCP-tools en het LLM; geeft een resultaat-dict terug."""
+    model = record["model"] or default_model
+    start = time.perf_counter()
+    result = {"id": record["id"], "prompt": record["prompt"], "model": model}
+    try:
+        with span("bulk_prompt", service="bulk", prompt_id=record["id"]), deadline_scope(PROMPT_DEADLINE):
+            cached = app.cached_answer(model, record["prompt"])
+            if cached is not None:
+                full_prompt, answer = cached
+            else:
+                # Zelfde verwerking als de webinterface (app.index), zonder gesprek
+                with app.phase("context", "get_tool_context"):
+                    full_prompt, pending = app.question_prompt(None, record["prompt"])
+                with app.phase("llm", "query_llm", model=model):
+                    answer = app.answer_llm(model, full_prompt)
+                if pending and not isinstance(answer, app.LLMError):
+                    with app.phase("refine", "refine_answer", model=model):
+                        refined = app.refine_answer(model, record["prompt"], answer, pending)
+                    if refined is not None:
+                        full_prompt, answer, result["refined_with"] = refined
+                app.remember_answer(model, record["prompt"], full_prompt, answer)
+        result.update(full_prompt=full_prompt, answer=answer)
+        if isinstance(answer, app.LLMError):
+            # Markeer als mislukt, zodat de prompt bij een herstart opnieuw wordt geprobeerd
+            result["error"] = answer
+    except Exception as e:
+        result["error"] = str(e)
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+def run(records, output, default_model, concurrency):
+    """
+    Verwerk alle prompts met hooguit concurrency tegelijk en schrijf elk resultaat direct weg.
+
+    Er worden niet meer prompts ingelezen dan er verwerkt worden, zodat ook zeer
+    grote invoerbestanden weinig geheugen kosten.
+    """
+    processed = failed = 0
+    pending = set()
+    records = iter(records)
+    with open(output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk") as executor:
+        try:
+            while True:
+                while len(pending) < concurrency:
+                    record = next(records, None)
+                    if record is None:
+                        break
+                    pending.add(executor.submit(process_prompt, record, default_model))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    processed += 1
+                    if "error" in result:
+                        failed += 1
+                        print(f"Prompt {result['id']} mislukt: {result['error']}")
+                    elif processed % 10 == 0:
+                        print(f"{processed} prompts verwerkt...")
+        except KeyboardInterrupt:
+            # Lopende prompts nog afmaken zodat hun resultaat in het checkpoint komt
+            print("\nOnderbroken; lopende prompts worden afgerond...")
+            for future in pending:
+                out.write(json.dumps(future.result(), ensure_ascii=False) + "\n")
+            raise
+    return processed, failed
+
+def main():
+    """Hoofdfunctie voor het verwerken van commandoregelargumenten."""
+    parser = argparse.ArgumentParser(description="Bulkverwerking van prompts via MCP-tools en LLM")
+    parser.add_argument("invoer", help="JSONL- of CSV-bestand met prompts")
+    parser.add_argument("--uitvoer", default=None,
+                        help="JSONL-bestand voor de resultaten (standaard <invoer>.resultaten.jsonl)")
+    parser.add_argument("--model", default=None, choices=list(app.MODEL_OPTIONS) or None,
+                        help="Standaardmodel voor prompts zonder eigen model")
+    parser.add_argument("--gelijktijdig", type=int, default=BULK_CONCURRENCY,
+                        help="Aantal prompts dat tegelijk wordt verwerkt")
+    parser.add_argument("--opnieuw", action="store_true",
+                        help="Negeer eerdere resultaten en begin opnieuw")
+
+    args = parser.parse_args()
+
+    if not app.MODEL_OPTIONS:
+        print("ERROR: Geen LLM-modellen beschikbaar. Installeer openai en/of anthropic packages.")
+        return False
+    default_model = args.model or next(iter(app.MODEL_OPTIONS))
+    output = args.uitvoer or str(Path(args.invoer).with_suffix(".resultaten.jsonl"))
+
+    if args.opnieuw and os.path.exists(output):
+        os.remove(output)
+    done = completed_ids(output)
+    if done:
+        print(f"{len(done)} prompts hebben al een resultaat in {output} en worden overgeslagen.")
+
+    # Controleer de servers direct, zodat de eerste prompts alleen bereikbare tools bevragen; daarna
+    # houdt de gezondheidsmonitor dit bij (en herstart gecrashte servers) zolang de run duurt
+    app.health_monitor.check_all()
+    app.health_monitor.ensure_started()
+    tools = app.available_tools()
+    print(f"Actieve MCP-tools: {', '.join(tools) if tools else 'geen (alleen het LLM wordt gebruikt)'}")
+
+    records = (record for record in read_prompts(args.invoer) if record["id"] not in done)
+    start = time.monotonic()
+    try:
+        processed, failed = run(records, output, default_model, max(args.gelijktijdig, 1))
+    finally:
+        app.health_monitor.stop()
+    elapsed = time.monotonic() - start
+
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"\n{processed} prompts verwerkt in {elapsed:.1f} s ({rate:.2f} per seconde), {failed} mislukt.")
+    print(f"Resultaten: {output}")
+    return failed == 0
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\nOperatie onderbroken door gebruiker. Start opnieuw om verder te gaan.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Onverwachte fout: {e}")
+        sys.exit(1)
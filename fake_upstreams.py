@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Nep-upstreams voor benchmarks
+
+Eén lokale server die de API's nabootst waar de applicatie en de MCP-servers van
+afhangen: Brave Search, GitHub Search, OpenAI Chat Completions en Anthropic
+Messages (ook streaming). Latentie, spreiding (jitter), trage uitschieters,
+foutkans en rate limits zijn instelbaar, zodat prestaties reproduceerbaar
+gemeten kunnen worden zonder echte (betaalde) API's. De antwoorden zijn
+deterministisch per zoekopdracht.
+
+Endpoints (onder http://127.0.0.1:<poort>):
+- /brave/res/v1/search             (BRAVE_SEARCH_URL)
+- /github/search/repositories      (GITHUB_API_URL = .../github)
+- /github/search/code
+- /openai/v1/chat/completions      (OPENAI_API_BASE = .../openai/v1)
+- /anthropic/v1/messages           (ANTHROPIC_BASE_URL = .../anthropic)
+- /anthropic/v1/complete           (oudere Anthropic SDK)
+
+Gebruik:
+    python fake_upstreams.py [--poort 5900] [--latentie 50] [--jitter 20]
+                             [--foutkans 0.0] [--limiet 0] [--uitschieters 0.0]
+                             [--uitschieter-ms 1000] [--llm-latentie 300]
+
+Instellingen kunnen per upstream verschillen, bijvoorbeeld
+--latentie brave=80,github=40,standaard=50. Upstreams zijn brave, github,
+openai en anthropic. benchmark.py start deze server zelf.
+"""
+
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+try:
+    from flask import Flask, Response, jsonify, request
+except ImportError:
+    print("ERROR: Flask is niet geïnstalleerd. Installeer met: pip install -r requirements.txt")
+    sys.exit(1)
+
+UPSTREAMS = ("brave", "github", "openai", "anthropic")
+
+app = Flask(__name__)
+
+# Ingesteld door main(); per upstream een waarde
+settings = {
+    "latency_ms": {},
+    "jitter_ms": {},
+    "error_rate": {},
+    "rate_limit": {},
+    "outlier_rate": {},
+    "outlier_ms": 1000.0,
+    "token_ms": 10.0
+}
+
+_windows = {}
+_windows_lock = threading.Lock()
+_random = random.Random(42)
+_random_lock = threading.Lock()
+
+def parse_setting(value, cast=float):
+    """Lees '50' of 'brave=80,github=40,standaard=50' als dict upstream -> waarde."""
+    result = {}
+    default = None
+    for part in str(value).split(","):
+        if "=" in part:
+            name, number = part.split("=", 1)
+            name = name.strip()
+            if name in ("standaard", "default"):
+                default = cast(number)
+            elif name in UPSTREAMS:
+                result[name] = cast(number)
+            else:
+                raise argparse.ArgumentTypeError(f"Onbekende upstream: {name}")
+        elif part.strip():
+            default = cast(part)
+    for name in UPSTREAMS:
+        result.setdefault(name, default if default is not None else cast(0))
+    return result
+
+def _uniform(low, high):
+    with _random_lock:
+        return _random.uniform(low, high)
+
+def simulate(upstream):
+    """
+    Wacht de ingestelde latentie af en bepaal of het verzoek mislukt of gelimiteerd wordt.
+
+    Geeft (fout-antwoord of None, rate-limit headers) terug.
+    """
+    latency = settings["latency_ms"][upstream]
+    jitter = settings["jitter_ms"][upstream]
+    delay = latency + _uniform(-jitter, jitter)
+    if _uniform(0.0, 1.0) < settings["outlier_rate"][upstream]:
+        # Een trage uitschieter, zoals een hangende verbinding of een overbelaste upstream
+        delay += settings["outlier_ms"]
+    time.sleep(max(0.0, delay) / 1000)
+
+    limit = int(settings["rate_limit"][upstream])
+    headers = {}
+    if limit:
+        # Vast venster van een minuut, zoals de echte API's rapporteren
+        now = time.time()
+        window = int(now // 60)
+        with _windows_lock:
+            start, used = _windows.get(upstream, (window, 0))
+            if start != window:
+                start, used = window, 0
+            used += 1
+            _windows[upstream] = (start, used)
+        remaining = max(limit - used, 0)
+        reset = (window + 1) * 60
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset)
+        }
+        if upstream == "brave":
+            # Brave rapporteert per seconde en per maand; de reset is relatief
+            headers["X-RateLimit-Reset"] = f"1, {int(reset - now)}"
+        if used > limit:
+            headers["Retry-After"] = str(max(int(reset - now), 1))
+            status = 403 if upstream == "github" else 429
+            return (jsonify({"message": "API rate limit exceeded"}), status, headers), headers
+
+    if _uniform(0.0, 1.0) < settings["error_rate"][upstream]:
+        return (jsonify({"message": "Gesimuleerde upstream-fout"}), 503, headers), headers
+    return None, headers
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(str(text).encode("utf-8")).digest()[:8], "little")
+
+def _words(text, count):
+    rng = random.Random(_seed(text))
+    vocabulary = ("flask", "mcp", "server", "python", "context", "protocol", "async", "cache",
+                  "latency", "search", "github", "api", "model", "stream", "token", "benchmark")
+    return [rng.choice(vocabulary) for _ in range(count)]
+
+@app.route("/", methods=["GET"])
+def home():
+    return jsonify({"service": "Nep-upstreams voor benchmarks", "settings": settings})
+
+@app.route("/brave/res/v1/search", methods=["GET"])
+def brave_search():
+    error, headers = simulate("brave")
+    if error:
+        return error
+    query = request.args.get("q", "")
+    count = int(request.args.get("count", 3))
+    results = [
+        {
+            "title": f"{query} - resultaat {i + 1}",
+            "description": " ".join(_words(f"{query}/{i}", 20)),
+            "url": f"https://example.com/{_seed(query) % 100000}/{i}"
+        }
+        for i in range(count)
+    ]
+    return jsonify({"web": {"results": results}}), 200, headers
+
+@app.route("/github/search/repositories", methods=["GET"])
+def github_repositories():
+    error, headers = simulate("github")
+    if error:
+        return error
+    query = request.args.get("q", "")
+    count = int(request.args.get("per_page", 3))
+    items = [
+        {
+            "full_name": f"bench/{'-'.join(_words(f'{query}/{i}', 2))}-{i}",
+            "description": " ".join(_words(f"{query}/{i}/d", 12)),
+            "html_url": f"https://github.com/bench/{_seed(query) % 100000}-{i}",
+            "stargazers_count": _seed(f"{query}/{i}") % 5000,
+            "forks_count": _seed(f"{query}/{i}/f") % 500,
+            "language": "Python"
+        }
+        for i in range(count)
+    ]
+    return jsonify({"total_count": count, "items": items}), 200, headers
+
+@app.route("/github/search/code", methods=["GET"])
+def github_code():
+    error, headers = simulate("github")
+    if error:
+        return error
+    query = request.args.get("q", "")
+    count = int(request.args.get("per_page", 3))
+    items = [
+        {
+            "name": f"{_words(f'{query}/{i}', 1)[0]}.py",
+            "path": f"src/{_words(f'{query}/{i}/p', 1)[0]}.py",
+            "repository": {"full_name": f"bench/repo-{i}"},
+            "html_url": f"https://github.com/bench/repo-{i}/blob/main/src/{i}.py"
+        }
+        for i in range(count)
+    ]
+    return jsonify({"total_count": count, "items": items}), 200, headers
+
+def _answer(prompt):
+    return " ".join(_words(prompt, 60)) + "."
+
+def _sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def _stream_tokens(text):
+    for word in text.split(" "):
+        time.sleep(settings["token_ms"] / 1000)
+        yield word + " "
+
+@app.route("/openai/v1/chat/completions", methods=["POST"])
+def openai_chat():
+    error, headers = simulate("openai")
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    prompt = " ".join(str(message.get("content", "")) for message in data.get("messages", []))
+    answer = _answer(prompt)
+    model = data.get("model", "gpt-3.5-turbo")
+
+    if data.get("stream"):
+        def generate():
+            for token in _stream_tokens(answer):
+                yield _sse({"object": "chat.completion.chunk", "model": model,
+                            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+            yield _sse({"object": "chat.completion.chunk", "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            yield "data: [DONE]\n\n"
+        return Response(generate(), mimetype="text/event-stream", headers=headers)
+
+    return jsonify({
+        "id": f"chatcmpl-{_seed(prompt) % 10**8}",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(answer) // 4,
+                  "total_tokens": (len(prompt) + len(answer)) // 4}
+    }), 200, headers
+
+@app.route("/anthropic/v1/messages", methods=["POST"])
+def anthropic_messages():
+    error, headers = simulate("anthropic")
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    prompt = " ".join(str(message.get("content", "")) for message in data.get("messages", []))
+    answer = _answer(prompt)
+    message = {
+        "id": f"msg_{_seed(prompt) % 10**8}",
+        "type": "message",
+        "role": "assistant",
+        "model": data.get("model", "claude-2"),
+        "content": [],
+        "stop_reason": None,
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 0}
+    }
+
+    if data.get("stream"):
+        def generate():
+            yield _sse({"type": "message_start", "message": message}, "message_start")
+            yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                       "content_block_start")
+            for token in _stream_tokens(answer):
+                yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}},
+                           "content_block_delta")
+            yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+            yield _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                        "usage": {"output_tokens": len(answer) // 4}}, "message_delta")
+            yield _sse({"type": "message_stop"}, "message_stop")
+        return Response(generate(), mimetype="text/event-stream", headers=headers)
+
+    message.update(
+        content=[{"type": "text", "text": answer}],
+        stop_reason="end_turn",
+        usage={"input_tokens": len(prompt) // 4, "output_tokens": len(answer) // 4}
+    )
+    return jsonify(message), 200, headers
+
+@app.route("/anthropic/v1/complete", methods=["POST"])
+def anthropic_complete():
+    # Completions API van oudere versies van de Anthropic SDK
+    error, headers = simulate("anthropic")
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    answer = _answer(data.get("prompt", ""))
+    model = data.get("model", "claude-2")
+
+    if data.get("stream"):
+        def generate():
+            for token in _stream_tokens(answer):
+                yield _sse({"type": "completion", "completion": token, "stop_reason": None, "model": model},
+                           "completion")
+            yield _sse({"type": "completion", "completion": "", "stop_reason": "stop_sequence", "model": model},
+                       "completion")
+        return Response(generate(), mimetype="text/event-stream", headers=headers)
+
+    return jsonify({"type": "completion", "completion": answer, "stop_reason": "stop_sequence",
+                    "model": model}), 200, headers
+
+def main():
+    """Hoofdfunctie voor het verwerken van commandoregelargumenten."""
+    parser = argparse.ArgumentParser(description="Nep-upstreams (Brave, GitHub, OpenAI, Anthropic) voor benchmarks")
+    parser.add_argument("--poort", type=int, default=5900, help="Poort van de server")
+    parser.add_argument("--latentie", type=parse_setting, default=parse_setting("50"),
+                        help="Latentie in ms (getal of per upstream, bijvoorbeeld brave=80,standaard=50)")
+    parser.add_argument("--jitter", type=parse_setting, default=parse_setting("20"),
+                        help="Maximale afwijking van de latentie in ms")
+    parser.add_argument("--foutkans", type=parse_setting, default=parse_setting("0"),
+                        help="Kans op een 503-fout per verzoek (0.0 - 1.0)")
+    parser.add_argument("--limiet", type=parse_setting, default=parse_setting("0"),
+                        help="Verzoeken per minuut voordat er een 429/403 volgt (0 = geen limiet)")
+    parser.add_argument("--uitschieters", type=parse_setting, default=parse_setting("0"),
+                        help="Kans op een trage uitschieter per verzoek (0.0 - 1.0)")
+    parser.add_argument("--uitschieter-ms", type=float, default=1000.0,
+                        help="Extra latentie van een uitschieter in ms")
+    parser.add_argument("--llm-latentie", type=float, default=None,
+                        help="Latentie van de LLM-API's in ms (standaard gelijk aan --latentie)")
+    parser.add_argument("--token-ms", type=float, default=10.0,
+                        help="Tijd per token bij streaming in ms")
+
+    args = parser.parse_args()
+    settings["latency_ms"] = args.latentie
+    if args.llm_latentie is not None:
+        settings["latency_ms"].update(openai=args.llm_latentie, anthropic=args.llm_latentie)
+    settings["jitter_ms"] = args.jitter
+    settings["error_rate"] = args.foutkans
+    settings["rate_limit"] = args.limiet
+    settings["outlier_rate"] = args.uitschieters
+    settings["outlier_ms"] = args.uitschieter_ms
+    settings["token_ms"] = args.token_ms
+
+    # Geen verzoeklog per aanroep; dat zou de metingen vertragen
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    print(f"Nep-upstreams op http://127.0.0.1:{args.poort}")
+    app.run(host="127.0.0.1", port=args.poort, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,10 @@ Vereisten:
 
 Gebruik:
 - Start de server met 'python github_mcp_server.py'
-- De server draait standaard op http://localhost:5002
+- De server draait standaard op http://localhost:5002 (instelbaar met MCP_PORT)
+- GITHUB_API_URL wijst naar een andere API, zoals de nep-upstreams van benchmark.py
+- De upstream-aanroepen volgen de deadline van het verzoek (header X-MCP-Deadline-Ms, zie mcp_deadline.py)
+- Faalt een zoek-API van GitHub herhaald, dan wordt deze tijdelijk niet aangeroepen (circuit breaker, zie mcp_breaker.py)
 """
 
 import os
@@ -34,12 +37,57 @@ except ImportError as e:
     print("\nZie README.md voor gedetailleerde installatie-instructies.")
     sys.exit(1)
 
+from mcp_batch import batch_response
+from mcp_breaker import CircuitBreaker, CircuitOpenError, breaker_stats, open_response, server_error
+from mcp_cache import ResponseCache, make_key
+from mcp_client import create_session
+from mcp_deadline import DeadlineExceeded, expired, expired_response, instrument_deadline, timeout_for
+from mcp_hedge import UPSTREAM_HEDGE_ENABLED, Hedger
+from mcp_metrics import instrument_app, instrumented_get, register_cache
+from mcp_ratelimit import RateLimiter, limited_response
+from mcp_singleflight import SingleFlight
+from mcp_serve import production_mode, run_production
+from mcp_tracing import instrument_tracing
+
 app = Flask(__name__)
 
+# Gedeelde sessie met verbindingspool voor upstream API-verzoeken (keep-alive)
+upstream = create_session()
+
 # Configuratie
-PORT = 5002
+PORT = int(os.getenv("MCP_PORT", "5002"))
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")  # Optioneel maar aanbevolen
-GITHUB_API_URL = "https://api.github.com"
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_REPO_CACHE_TTL = int(os.getenv("GITHUB_REPO_CACHE_TTL", os.getenv("MCP_CACHE_TTL", "3600")))  # Seconden
+GITHUB_CODE_CACHE_TTL = int(os.getenv("GITHUB_CODE_CACHE_TTL", os.getenv("MCP_CACHE_TTL", "1800")))  # Seconden
+# Zoeklimieten van GitHub per minuut (30 met token, 10 zonder; code search 10)
+GITHUB_SEARCH_RATE_LIMIT = int(os.getenv("GITHUB_SEARCH_RATE_LIMIT", "30" if GITHUB_TOKEN else "10"))
+GITHUB_CODE_RATE_LIMIT = int(os.getenv("GITHUB_CODE_RATE_LIMIT", "10"))
+
+# Cache voor zoekresultaten, zodat herhaalde vragen de API-limieten sparen
+cache = ResponseCache(default_ttl=GITHUB_REPO_CACHE_TTL)
+
+# Metrics op /metrics, inclusief de cache-statistieken
+instrument_app(app, "github")
+instrument_tracing(app, "github")
+instrument_deadline(app)
+register_cache(cache, "github")
+
+# Token buckets per zoek-API en token, zodat bursts niet tot 403/429 leiden
+limiter = RateLimiter()
+search_bucket = limiter.bucket("github_search", GITHUB_TOKEN, per_minute=GITHUB_SEARCH_RATE_LIMIT)
+code_bucket = limiter.bucket("github_code_search", GITHUB_TOKEN, per_minute=GITHUB_CODE_RATE_LIMIT)
+
+# Tweede poging bij een trage upstream-aanroep (alleen met MCP_UPSTREAM_HEDGE=1, kost quotum)
+hedger = Hedger("github", enabled=UPSTREAM_HEDGE_ENABLED)
+
+# Circuit breaker per zoek-API; bij een storing geen aanroepen en geen quotum verspillen
+search_breaker = CircuitBreaker("github_search_repositories")
+code_breaker = CircuitBreaker("github_search_code")
+breakers = {"github_search_repositories": search_breaker, "github_search_code": code_breaker}
+
+# Identieke gelijktijdige zoekopdrachten delen één upstream-aanroep
+flight = SingleFlight("github")
 
 if not GITHUB_TOKEN:
     print("OPMERKING: GITHUB_TOKEN is niet ingesteld. De API-limieten zullen beperkt zijn.")
@@ -51,7 +99,10 @@ def home():
     return jsonify({
         "service": "GitHub MCP Server",
         "status": "running",
-        "token_present": bool(GITHUB_TOKEN)
+        "token_present": bool(GITHUB_TOKEN),
+        "cache": cache.stats(),
+        "rate_limits": limiter.stats(),
+        "circuit_breakers": breaker_stats(breakers)
     })
 
 def get_github_headers():
@@ -78,6 +129,37 @@ def search_repositories():
     # Stel het aantal resultaten in (maximum 5)
     count = min(int(data.get("count", 3)), 5)
     
+    return repository_search(query, count)
+
+def repository_search(query, count):
+    """
+    Zoek repositories via de cache, of anders via de GitHub API.
+
+    Identieke gelijktijdige zoekopdrachten delen één upstream-aanroep. Geeft een
+    antwoord als (body, status) of (body, status, headers) terug.
+    """
+    # Geef een eerder resultaat terug als het nog geldig is
+    cache_key = make_key("search/repositories", query, count=count)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached, 200
+    
+    return flight.do(cache_key, lambda: fetch_repositories(query, count, cache_key))
+
+def fetch_repositories(query, count, cache_key):
+    """Roep de GitHub API aan binnen de zoeklimiet en bewaar het resultaat in de cache."""
+    # Wacht de applicatie niet meer op het antwoord, dan heeft de aanroep geen zin
+    if expired():
+        return expired_response(cache, cache_key, "github_search_repositories")
+    
+    # Faalt de API de laatste tijd, dan niet aanroepen; een verouderd resultaat of 503
+    if not search_breaker.available():
+        return open_response(cache, cache_key, search_breaker)
+    
+    # Wacht kort op ruimte binnen de zoeklimiet; anders een verouderd resultaat of 429
+    if not search_bucket.acquire():
+        return limited_response(cache, cache_key, search_bucket)
+    
     # Roep de GitHub API aan
     try:
         headers = get_github_headers()
@@ -87,17 +169,24 @@ def search_repositories():
             "per_page": count
         }
         
-        response = requests.get(
+        # Een extra poging moet direct een token uit de zoeklimiet kunnen nemen
+        response = search_breaker.call(lambda: hedger.call("github_search_repositories", lambda attempt: instrumented_get(
+            upstream,
+            "github_search_repositories",
             f"{GITHUB_API_URL}/search/repositories", 
             headers=headers, 
-            params=params
-        )
+            params=params,
+            timeout=timeout_for()
+        ), allow_hedge=search_bucket.try_acquire), failed=server_error)
+        
+        if search_bucket.update_from_headers(response.headers, response.status_code):
+            return limited_response(cache, cache_key, search_bucket)
         
         if response.status_code != 200:
-            return jsonify({
+            return {
                 "error": f"GitHub API returned status code {response.status_code}",
                 "message": response.text
-            }), response.status_code
+            }, response.status_code
         
         search_results = response.json()
         
@@ -118,10 +207,17 @@ def search_repositories():
                     "source": "github_repo"
                 })
         
-        return jsonify(mcp_response)
+        cache.set(cache_key, mcp_response, ttl=GITHUB_REPO_CACHE_TTL)
+        return mcp_response, 200
         
+    except requests.exceptions.Timeout:
+        return {"error": "Timeout when calling GitHub API"}, 504
+    except DeadlineExceeded:
+        return expired_response(cache, cache_key, "github_search_repositories")
+    except CircuitOpenError:
+        return open_response(cache, cache_key, search_breaker)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route("/search/code", methods=["POST"])
 def search_code():
@@ -138,6 +234,37 @@ def search_code():
     # Stel het aantal resultaten in (maximum 5)
     count = min(int(data.get("count", 3)), 5)
     
+    return code_search(query, count)
+
+def code_search(query, count):
+    """
+    Zoek code via de cache, of anders via de GitHub API.
+
+    Identieke gelijktijdige zoekopdrachten delen één upstream-aanroep. Geeft een
+    antwoord als (body, status) of (body, status, headers) terug.
+    """
+    # Geef een eerder resultaat terug als het nog geldig is
+    cache_key = make_key("search/code", query, count=count)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached, 200
+    
+    return flight.do(cache_key, lambda: fetch_code(query, count, cache_key))
+
+def fetch_code(query, count, cache_key):
+    """Roep de GitHub API aan binnen de zoeklimiet en bewaar het resultaat in de cache."""
+    # Wacht de applicatie niet meer op het antwoord, dan heeft de aanroep geen zin
+    if expired():
+        return expired_response(cache, cache_key, "github_search_code")
+    
+    # Faalt de API de laatste tijd, dan niet aanroepen; een verouderd resultaat of 503
+    if not code_breaker.available():
+        return open_response(cache, cache_key, code_breaker)
+    
+    # Wacht kort op ruimte binnen de zoeklimiet; anders een verouderd resultaat of 429
+    if not code_bucket.acquire():
+        return limited_response(cache, cache_key, code_bucket)
+    
     # Roep de GitHub API aan
     try:
         headers = get_github_headers()
@@ -146,17 +273,24 @@ def search_code():
             "per_page": count
         }
         
-        response = requests.get(
+        # Een extra poging moet direct een token uit de zoeklimiet kunnen nemen
+        response = code_breaker.call(lambda: hedger.call("github_search_code", lambda attempt: instrumented_get(
+            upstream,
+            "github_search_code",
             f"{GITHUB_API_URL}/search/code", 
             headers=headers, 
-            params=params
-        )
+            params=params,
+            timeout=timeout_for()
+        ), allow_hedge=code_bucket.try_acquire), failed=server_error)
+        
+        if code_bucket.update_from_headers(response.headers, response.status_code):
+            return limited_response(cache, cache_key, code_bucket)
         
         if response.status_code != 200:
-            return jsonify({
+            return {
                 "error": f"GitHub API returned status code {response.status_code}",
                 "message": response.text
-            }), response.status_code
+            }, response.status_code
         
         search_results = response.json()
         
@@ -175,10 +309,17 @@ def search_code():
                     "source": "github_code"
                 })
         
-        return jsonify(mcp_response)
+        cache.set(cache_key, mcp_response, ttl=GITHUB_CODE_CACHE_TTL)
+        return mcp_response, 200
         
+    except requests.exceptions.Timeout:
+        return {"error": "Timeout when calling GitHub API"}, 504
+    except DeadlineExceeded:
+        return expired_response(cache, cache_key, "github_search_code")
+    except CircuitOpenError:
+        return open_response(cache, cache_key, code_breaker)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route("/mcp/query", methods=["POST"])
 def mcp_query():
@@ -196,11 +337,37 @@ def mcp_query():
     
     return jsonify({"error": "Unsupported query type"}), 400
 
+def dispatch_query(item):
+    """Voer één MCP-query uit een batch uit; geeft (body, status[, headers]) terug."""
+    if not isinstance(item, dict):
+        return {"error": "Invalid request format"}, 400
+    query = item.get("query")
+    if not query:
+        return {"error": "Missing query parameter"}, 400
+    count = min(int(item.get("count", 3)), 5)
+    
+    query_type = item.get("type", "")
+    if query_type == "repository_search":
+        return repository_search(query, count)
+    elif query_type == "code_search":
+        return code_search(query, count)
+    
+    return {"error": "Unsupported query type"}, 400
+
+@app.route("/mcp/batch", methods=["POST"])
+def mcp_batch():
+    """Voer een lijst van MCP-queries gelijktijdig uit: {"queries": [{"type": ..., "query": ...}, ...]}."""
+    body, status = batch_response(request.get_json(silent=True), dispatch_query)
+    return jsonify(body), status
+
 if __name__ == "__main__":
     print(f"Starting GitHub MCP Server on port {PORT}")
     print(f"GitHub Token present: {bool(GITHUB_TOKEN)}")
     try:
-        app.run(host="0.0.0.0", port=PORT)
+        if production_mode():
+            run_production(app, "0.0.0.0", PORT, "GitHub MCP Server")
+        else:
+            app.run(host="0.0.0.0", port=PORT)
     except Exception as e:
         print(f"ERROR: {str(e)}")
         print("\nZie README.md voor installatie- en troubleshooting-instructies.")
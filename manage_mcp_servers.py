@@ -6,10 +6,22 @@ Dit hulpprogramma helpt bij het beheren van de MCP-servers die worden gebruikt
 door de Flask MCP-integratie applicatie.
 
 Gebruik:
-    python manage_mcp_servers.py start [brave|github|all]
-    python manage_mcp_servers.py stop [brave|github|all]
+    python manage_mcp_servers.py start [<server>|all] [--productie] [--workers N]
+    python manage_mcp_servers.py stop [<server>|all]
+    python manage_mcp_servers.py reload [<server>|all]
     python manage_mcp_servers.py status
 
+De servers (standaard brave en github) worden beschreven in mcp_servers.toml,
+zie mcp_config.py. Een server met meerdere replica's wordt als evenveel processen
+gestart, gestopt en herladen.
+
+Bij 'all' worden de servers tegelijk gestart of gestopt. Starten wacht tot elke
+server daadwerkelijk antwoordt (MCP_STARTUP_TIMEOUT), stoppen wacht tot het
+proces is afgesloten (MCP_STOP_TIMEOUT).
+
+Met --productie worden de servers gestart met een productieserver (gunicorn of
+waitress) met meerdere workers en threads, zie mcp_serve.py.
+
 Vereisten:
     - Python 3.7+
     - Dezelfde omgeving als de hoofdapplicatie
@@ -23,116 +35,137 @@ import subprocess
 import signal
 import requests
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-# Definieer de MCP-servers
-MCP_SERVERS = {
-    "brave": {
-        "command": [sys.executable, "brave_mcp_server.py"],
-        "env": {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY", "")},
-        "port": 5001,
-        "url": "http://localhost:5001/"
-    },
-    "github": {
-        "command": [sys.executable, "github_mcp_server.py"],
-        "env": {"GITHUB_TOKEN": os.getenv("GITHUB_TOKEN", "")},
-        "port": 5002,
-        "url": "http://localhost:5002/"
-    }
-}
+from mcp_config import load_servers_or_exit, replicas, tool_name
+from mcp_health import HEALTH_INTERVAL, STARTUP_TIMEOUT, wait_until_ready
+from mcp_registry import ServerRegistry, pid_alive, terminate_pid
+from mcp_serve import serve_mode
 
-# Globale dictionary om processen bij te houden
-processes = {}
-pid_file = Path(".mcp_server_pids.txt")
+# Maximale tijd voor een nette stop voordat een server geforceerd wordt gestopt
+STOP_TIMEOUT = float(os.getenv("MCP_STOP_TIMEOUT", "10"))
 
-def load_pids():
-    """Laad opgeslagen proces-IDs uit het bestand als het bestaat."""
-    if pid_file.exists():
-        try:
-            with open(pid_file, "r") as f:
-                lines = f.read().strip().split("\n")
-                for line in lines:
-                    if line:
-                        name, pid = line.split(":")
-                        processes[name] = int(pid)
-        except Exception as e:
-            print(f"Fout bij het laden van proces-IDs: {e}")
+# De MCP-servers komen uit mcp_servers.toml (of het bestand in MCP_CONFIG)
+MCP_SERVERS = load_servers_or_exit()
+
+# Gedeeld register van draaiende servers (ook gebruikt door app.py)
+registry = ServerRegistry()
+legacy_pid_file = Path(".mcp_server_pids.txt")
 
-def save_pids():
-    """Sla actieve proces-IDs op in een bestand."""
+def migrate_pid_file():
+    """Neem proces-IDs uit het oude .mcp_server_pids.txt bestand over in het register."""
+    if not legacy_pid_file.exists():
+        return
     try:
-        with open(pid_file, "w") as f:
-            for name, pid in processes.items():
-                f.write(f"{name}:{pid}\n")
+        with open(legacy_pid_file, "r") as f:
+            for line in f.read().strip().split("\n"):
+                if line:
+                    name, pid = line.split(":")
+                    if name in MCP_SERVERS and pid_alive(int(pid)) and not registry.get(name, fresh=True):
+                        registry.register(name, int(pid), MCP_SERVERS[name]["port"])
+        legacy_pid_file.unlink()
     except Exception as e:
-        print(f"Fout bij het opslaan van proces-IDs: {e}")
+        print(f"Fout bij het overnemen van proces-IDs: {e}")
 
-def is_server_running(name):
-    """Controleer of een server actief is door een verzoek te sturen."""
-    if name not in MCP_SERVERS:
+def replica_keys(name):
+    """Registernamen van de replica's van een server: geconfigureerd of (nog) geregistreerd."""
+    keys = [key for key, _, _ in replicas(name, MCP_SERVERS[name])]
+    keys += [key for key in registry.all(fresh=True) if tool_name(key) == name and key not in keys]
+    return keys
+
+def is_server_running(key, max_age=0):
+    """
+    Controleer of een server (replica) actief is door een verzoek te sturen.
+    
+    Met max_age > 0 wordt een recente uitkomst van de gezondheidsmonitor (of een
+    eerdere controle) uit het register gebruikt in plaats van een nieuw verzoek.
+    """
+    if tool_name(key) not in MCP_SERVERS:
         return False
         
-    # Controleer eerst of we een PID hebben
-    if name not in processes:
+    # Controleer eerst of het register een PID heeft
+    entry = registry.get(key, fresh=True)
+    if not entry or not entry["pid"]:
         return False
         
+    # Gebruik een recente gezondheidscontrole als die er is
+    if max_age and entry["healthy"] and entry["checked_at"] and time.time() - entry["checked_at"] < max_age:
+        return True
+        
     # Probeer om de status via HTTP te controleren
     try:
-        url = MCP_SERVERS[name]["url"]
+        url = f"http://localhost:{entry['port']}/"
+        start = time.monotonic()
         response = requests.get(url, timeout=1)
-        return response.status_code == 200
-    except:
+        healthy = response.status_code == 200
+        registry.update_health(key, healthy, (time.monotonic() - start) * 1000)
+        return healthy
+    except Exception:
         # Als HTTP niet werkt, controleer dan het proces
-        try:
-            # In Windows moeten we anders controleren
-            if os.name == 'nt':
-                # Gebruik tasklist om te zien of het proces nog draait
-                cmd = f'tasklist /FI "PID eq {processes[name]}" /NH'
-                output = subprocess.check_output(cmd, shell=True).decode()
-                return str(processes[name]) in output
-            else:
-                # In Unix kunnen we een signaal sturen om te controleren
-                os.kill(processes[name], 0)  # Signaal 0 test of proces bestaat
-                return True
-        except:
-            # Proces bestaat niet meer
-            return False
+        registry.update_health(key, False)
+        return pid_alive(entry["pid"])
 
-def start_server(name):
-    """Start een MCP-server."""
+def start_server(name, production=False, workers=None):
+    """Start alle replica's van een MCP-server, optioneel in productiemodus."""
     if name not in MCP_SERVERS:
         print(f"Onbekende server: {name}")
         return False
+    
+    units = replicas(name, MCP_SERVERS[name])
+    if len(units) == 1:
+        return start_replica(name, *units[0], production=production, workers=workers)
+    # Replica's tegelijk starten, net als de servers bij 'all'
+    with ThreadPoolExecutor(max_workers=len(units)) as executor:
+        results = list(executor.map(
+            lambda unit: start_replica(name, *unit, production=production, workers=workers), units
+        ))
+    return all(results)
+
+def start_replica(name, key, port, replica_env, production=False, workers=None):
+    """Start één replica van een MCP-server."""
+    if is_server_running(key, max_age=HEALTH_INTERVAL):
+        print(f"Server '{key}' draait al.")
+        return True
         
-    if is_server_running(name):
-        print(f"Server '{name}' draait al.")
+    # Reserveer de server, zodat de app of een andere beheerder hem niet tegelijk start
+    if not registry.claim(key, port):
+        print(f"Server '{key}' wordt al door een ander proces gestart.")
         return True
         
     try:
         # Verzamel de command en env
         cmd = MCP_SERVERS[name]["command"]
-        env = {**os.environ, **MCP_SERVERS[name]["env"]}
+        env = {**os.environ, **replica_env}
+        if production:
+            env["MCP_SERVE_MODE"] = "production"
+            if workers:
+                env["MCP_WORKERS"] = str(workers)
         
         # Start het proces
-        print(f"Server '{name}' starten met Python: {sys.executable}")
+        mode = "productiemodus" if production else "ontwikkelmodus"
+        print(f"Server '{key}' starten op poort {port} ({mode}) met Python: {sys.executable}")
         proc = subprocess.Popen(cmd, env=env)
         
-        # Sla het PID op
-        processes[name] = proc.pid
-        save_pids()
-        
-        # Geef het proces tijd om te starten
-        time.sleep(1)
+        # Sla het PID op in het gedeelde register
+        registry.register(key, proc.pid, port, server=serve_mode(env))
         
-        # Controleer of het gestart is
-        if is_server_running(name):
-            print(f"Server '{name}' succesvol gestart (PID: {proc.pid}).")
+        # Wacht tot de server antwoordt, of tot het proces onderweg stopt
+        ready, latency_ms = wait_until_ready(f"http://localhost:{port}/", proc=proc)
+        registry.update_health(key, ready, latency_ms)
+        if ready:
+            print(f"Server '{key}' succesvol gestart (PID: {proc.pid}).")
             return True
+        elif proc.poll() is not None:
+            print(f"Server '{key}' is tijdens het starten gestopt (exitcode {proc.returncode}). Controleer de logbestanden.")
+            registry.remove(key)
+            return False
         else:
-            print(f"Server '{name}' lijkt niet te zijn gestart. Controleer de logbestanden.")
+            print(f"Server '{key}' reageerde niet binnen {STARTUP_TIMEOUT:.0f} seconden. Controleer de logbestanden.")
             return False
             
     except Exception as e:
-        print(f"Fout bij het starten van '{name}': {e}")
+        registry.remove(key)
+        print(f"Fout bij het starten van '{key}': {e}")
         
         # Geef extra hulp bij veelvoorkomende fouten
         if "FileNotFoundError" in str(e):
@@ -156,71 +189,102 @@ def start_server(name):
         return False
 
 def stop_server(name):
-    """Stop een MCP-server."""
+    """Stop alle replica's van een MCP-server."""
     if name not in MCP_SERVERS:
         print(f"Onbekende server: {name}")
         return False
-        
-    if not is_server_running(name):
-        print(f"Server '{name}' draait niet.")
+    return all([stop_replica(key) for key in replica_keys(name)])
+
+def stop_replica(key):
+    """Stop één replica van een MCP-server."""
+    if not is_server_running(key):
+        if registry.get(key, fresh=True):
+            print(f"Server '{key}' draait niet.")
         # Verwijder eventuele oude verwijzingen
-        if name in processes:
-            del processes[name]
-            save_pids()
+        registry.remove(key)
         return True
         
     try:
-        pid = processes[name]
+        pid = registry.get(key)["pid"]
         
-        # Probeer het proces te beëindigen
-        if os.name == 'nt':
-            # Windows gebruikt taskkill
-            subprocess.run(["taskkill", "/F", "/PID", str(pid)], check=False)
-        else:
-            # Unix-achtige systemen gebruiken kill
-            os.kill(pid, signal.SIGTERM)
-            # Geef het proces tijd om af te sluiten
-            time.sleep(2)
-            # Als het nog draait, forceer afsluiten
-            if is_server_running(name):
-                os.kill(pid, signal.SIGKILL)
-                
-        # Controleer of het gestopt is
-        if not is_server_running(name):
-            print(f"Server '{name}' succesvol gestopt.")
-            del processes[name]
-            save_pids()
+        # Eerst de status wijzigen, anders ziet de gezondheidsmonitor de stop als crash en herstart hij de server
+        registry.mark_stopping(key)
+        
+        # Stop het proces netjes en wacht tot het echt weg is; daarna geforceerd
+        if terminate_pid(pid, timeout=STOP_TIMEOUT):
+            print(f"Server '{key}' succesvol gestopt.")
+            registry.remove(key, status="stopping")
             return True
         else:
-            print(f"Server '{name}' kon niet worden gestopt.")
+            print(f"Server '{key}' kon niet worden gestopt.")
+            registry.set_status(key, "running", expected="stopping")
             return False
             
     except Exception as e:
-        print(f"Fout bij het stoppen van '{name}': {e}")
+        print(f"Fout bij het stoppen van '{key}': {e}")
         # Als het proces niet meer bestaat, verwijder de verwijzing
         if "No such process" in str(e) or "process no longer exists" in str(e):
-            print(f"Proces voor '{name}' bestaat niet meer. Verwijzing opgeschoond.")
-            if name in processes:
-                del processes[name]
-                save_pids()
+            print(f"Proces voor '{key}' bestaat niet meer. Verwijzing opgeschoond.")
+            registry.remove(key, status="stopping")
             return True
+        registry.set_status(key, "running", expected="stopping")
         return False
 
+def reload_server(name):
+    """Herlaad de workers van alle replica's van een server in productiemodus zonder onderbreking."""
+    if name not in MCP_SERVERS:
+        print(f"Onbekende server: {name}")
+        return False
+        
+    running = [key for key in replica_keys(name) if is_server_running(key)]
+    if not running:
+        print(f"Server '{name}' draait niet.")
+        return False
+        
+    if os.name == 'nt':
+        print("Herladen zonder onderbreking wordt niet ondersteund op Windows. Gebruik stop en start.")
+        return False
+        
+    success = True
+    for key in running:
+        entry = registry.get(key, fresh=True)
+        # Alleen een gunicorn-master herlaadt bij SIGHUP; de ontwikkelserver en waitress stoppen erdoor
+        if entry["server"] != "gunicorn":
+            server = entry["server"] or "onbekende server"
+            print(f"Server '{key}' draait niet onder gunicorn ({server}) en wordt overgeslagen. "
+                  f"Herstart deze met 'stop {name}' en 'start {name} --productie'.")
+            success = False
+            continue
+        try:
+            # gunicorn start bij SIGHUP nieuwe workers en laat de oude netjes afronden
+            os.kill(entry["pid"], signal.SIGHUP)
+            print(f"Server '{key}' wordt herladen.")
+        except Exception as e:
+            print(f"Fout bij het herladen van '{key}': {e}")
+            success = False
+    return success
+
 def show_status():
-    """Toon de status van alle MCP-servers."""
+    """Toon de status van alle MCP-servers en hun replica's."""
     print("MCP-Server Status:")
     print("-----------------")
     
-    for name in MCP_SERVERS:
-        running = is_server_running(name)
-        status = "ACTIEF" if running else "GESTOPT"
-        pid = processes.get(name, "N/A")
-        port = MCP_SERVERS[name]["port"]
+    for name, cfg in MCP_SERVERS.items():
+        keys = replica_keys(name)
+        running_keys = [key for key in keys if is_server_running(key, max_age=HEALTH_INTERVAL)]
+        status = "ACTIEF" if running_keys else "GESTOPT"
+        ports = cfg["ports"]
+        port_text = f"poort {ports[0]}" if len(ports) == 1 else f"poorten {ports[0]}-{ports[-1]}"
+        replica_text = f", {len(running_keys)}/{len(ports)} replica's" if len(ports) > 1 else ""
         
-        print(f"{name.upper()} Server (poort {port}): {status}")
-        if running:
-            print(f"  - PID: {pid}")
-            print(f"  - URL: {MCP_SERVERS[name]['url']}")
+        print(f"{name.upper()} Server ({port_text}): {status}{replica_text}")
+        for key in running_keys:
+            entry = registry.get(key)
+            prefix = f"  [{key}]" if len(keys) > 1 else " "
+            print(f"{prefix} - PID: {entry['pid'] if entry else 'N/A'}")
+            print(f"{prefix} - URL: http://localhost:{entry['port']}/")
+            if entry and entry["latency_ms"] is not None:
+                print(f"{prefix} - Latency: {entry['latency_ms']:.0f} ms")
         print()
         
     return True
@@ -228,15 +292,19 @@ def show_status():
 def main():
     """Hoofdfunctie voor het verwerken van commandoregelargumenten."""
     parser = argparse.ArgumentParser(description="MCP-Server beheerder")
-    parser.add_argument("actie", choices=["start", "stop", "status"], 
+    parser.add_argument("actie", choices=["start", "stop", "reload", "status"], 
                         help="De actie die moet worden uitgevoerd")
     parser.add_argument("server", nargs="?", default="all",
-                        help="De te beheren server (brave, github, of all)")
+                        help=f"De te beheren server ({', '.join(MCP_SERVERS)}, of all)")
+    parser.add_argument("--productie", action="store_true",
+                        help="Start de servers met een productieserver (gunicorn/waitress)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Aantal worker-processen in productiemodus")
     
     args = parser.parse_args()
     
-    # Laad bestaande proces-IDs
-    load_pids()
+    # Neem proces-IDs uit een oud PID-bestand over
+    migrate_pid_file()
     
     if args.actie == "status":
         return show_status()
@@ -246,17 +314,23 @@ def main():
     
     # Voer de gekozen actie uit
     success = True
-    for server in servers:
-        if server not in MCP_SERVERS:
-            print(f"Onbekende server: {server}")
-            success = False
-            continue
-            
-        if args.actie == "start":
-            if not start_server(server):
-                success = False
-        elif args.actie == "stop":
-            if not stop_server(server):
+    unknown = [server for server in servers if server not in MCP_SERVERS]
+    for server in unknown:
+        print(f"Onbekende server: {server}")
+        success = False
+    servers = [server for server in servers if server in MCP_SERVERS]
+    
+    if args.actie == "start":
+        action = lambda server: start_server(server, production=args.productie, workers=args.workers)
+    elif args.actie == "stop":
+        action = stop_server
+    else:
+        action = reload_server
+    
+    # Alle servers tegelijk, zodat het geheel maar zo lang duurt als de traagste server
+    if servers:
+        with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+            if not all(executor.map(action, servers)):
                 success = False
     
     # Toon de status na de actie
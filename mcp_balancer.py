@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+MCP Load Balancer
+
+Verdeelt de verzoeken van de MCP-client over de replica's van een MCP-server.
+Per replica wordt het aantal openstaande verzoeken van dit proces bijgehouden.
+Standaard wordt power-of-two-choices gebruikt: kies twee willekeurige replica's
+en stuur het verzoek naar de minst belaste. Dat verdeelt de last bijna even goed
+als altijd de minst belaste kiezen, maar zonder dat alle gelijktijdige verzoeken
+op dezelfde replica terechtkomen.
+
+Welke replica's er zijn en of ze gezond zijn komt uit het serverregister (de
+gezondheidsmonitor). Daarnaast wordt een replica waarbij verbindingen herhaald
+mislukken tijdelijk uitgesloten, zodat verzoeken niet op de volgende controle
+hoeven te wachten. Zijn alle replica's uitgesloten, dan worden ze toch allemaal
+gebruikt, want dat is beter dan geen enkele poging.
+
+Configuratie via omgevingsvariabelen:
+- MCP_LB_STRATEGY: p2c (power-of-two-choices, standaard) of least (altijd de minst belaste)
+- MCP_LB_EJECT_FAILURES: aantal opeenvolgende mislukte verbindingen voor uitsluiting (standaard 2)
+- MCP_LB_EJECT_SECONDS: duur van een uitsluiting in seconden (standaard 10)
+"""
+
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+from mcp_metrics import Counter
+
+LB_STRATEGY = os.getenv("MCP_LB_STRATEGY", "p2c")
+LB_EJECT_FAILURES = int(os.getenv("MCP_LB_EJECT_FAILURES", "2"))
+LB_EJECT_SECONDS = float(os.getenv("MCP_LB_EJECT_SECONDS", "10"))
+
+REPLICA_REQUESTS = Counter(
+    "mcp_replica_requests_total", "Verzoeken per replica van een MCP-server",
+    ("tool", "port")
+)
+REPLICA_EJECTIONS = Counter(
+    "mcp_replica_ejections_total", "Aantal keren dat een replica tijdelijk is uitgesloten",
+    ("tool",)
+)
+
+class Balancer:
+    """Kiest per verzoek een replica (poort) van één MCP-server."""
+
+    def __init__(self, name, strategy=LB_STRATEGY, eject_failures=LB_EJECT_FAILURES,
+                 eject_seconds=LB_EJECT_SECONDS):
+        self.name = name
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self._outstanding = {}
+        self._failures = {}
+        self._ejected_until = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def _pick(self, ports, exclude=()):
+        now = time.monotonic()
+        usable = [port for port in ports if self._ejected_until.get(port, 0.0) <= now] or list(ports)
+        # Liefst een andere replica dan exclude (bijvoorbeeld voor een tweede poging)
+        usable = [port for port in usable if port not in exclude] or usable
+        if len(usable) == 1:
+            return usable[0]
+        if self.strategy == "least":
+            fewest = min(self._outstanding.get(port, 0) for port in usable)
+            return self._random.choice([port for port in usable if self._outstanding.get(port, 0) == fewest])
+        first, second = self._random.sample(usable, 2)
+        return first if self._outstanding.get(first, 0) <= self._outstanding.get(second, 0) else second
+
+    @contextmanager
+    def choose(self, ports, exclude=()):
+        """
+        Kies een replica uit ports en houd deze bezet zolang het codeblok loopt.
+
+        Replica's in exclude worden alleen gekozen als er geen andere is.
+
+        Een verbindingsfout of time-out in het codeblok telt als mislukte poging
+        voor die replica; na eject_failures opeenvolgende mislukkingen wordt de
+        replica eject_seconds overgeslagen.
+        """
+        with self._lock:
+            port = self._pick(ports, exclude)
+            self._outstanding[port] = self._outstanding.get(port, 0) + 1
+        REPLICA_REQUESTS.inc(tool=self.name, port=port)
+        try:
+            yield port
+        except Exception:
+            self._record(port, failed=True)
+            raise
+        else:
+            self._record(port, failed=False)
+        finally:
+            with self._lock:
+                self._outstanding[port] -= 1
+
+    def _record(self, port, failed):
+        with self._lock:
+            if not failed:
+                self._failures.pop(port, None)
+                return
+            failures = self._failures.get(port, 0) + 1
+            self._failures[port] = failures
+            if failures < self.eject_failures:
+                return
+            self._failures[port] = 0
+            self._ejected_until[port] = time.monotonic() + self.eject_seconds
+        REPLICA_EJECTIONS.inc(tool=self.name)
+        print(f"Replica van MCP-server '{self.name}' op poort {port} wordt {self.eject_seconds:.0f}s overgeslagen.")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                port: {
+                    "outstanding": self._outstanding.get(port, 0),
+                    "ejected": self._ejected_until.get(port, 0.0) > now
+                }
+                for port in sorted(set(self._outstanding) | set(self._ejected_until))
+            }
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+MCP Batch-verwerking
+
+Gedeelde logica voor het batch-endpoint (/mcp/batch) van de MCP-servers. Een
+batch bevat een lijst van MCP-queries (ook van verschillende types); deze worden
+op de server gelijktijdig uitgevoerd via dezelfde paden als losse queries, dus
+met cache, samenvoegen van identieke zoekopdrachten en rate limiting. De
+resultaten komen terug in dezelfde volgorde, met per item een status en zo nodig
+een foutmelding.
+
+Configuratie via omgevingsvariabelen:
+- MCP_BATCH_WORKERS: aantal gelijktijdige queries per batch (standaard 8)
+- MCP_BATCH_MAX: maximaal aantal queries per batch (standaard 100)
+"""
+
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_WORKERS = int(os.getenv("MCP_BATCH_WORKERS", "8"))
+BATCH_MAX = int(os.getenv("MCP_BATCH_MAX", "100"))
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="mcp-batch")
+
+def _run_item(dispatch, item):
+    try:
+        result = dispatch(item)
+    except Exception as e:
+        return {"status": 500, "error": str(e)}
+    body, status = result[0], result[1]
+    # De HTTP-status gaat voor een eventueel "status"-veld in de body
+    return {**body, "status": status}
+
+def run_batch(queries, dispatch):
+    """
+    Voer een lijst van queries gelijktijdig uit met dispatch(item).
+
+    dispatch geeft per item een antwoord als (body, status) of (body, status,
+    headers) terug, net als de zoekfuncties van de servers. Het resultaat is een
+    lijst met per query de body aangevuld met "status", in de oorspronkelijke
+    volgorde.
+    """
+    # Elke taak krijgt een kopie van de context, zodat trace-spans bij het verzoek horen
+    futures = [
+        _executor.submit(contextvars.copy_context().run, _run_item, dispatch, item)
+        for item in queries
+    ]
+    return [future.result() for future in futures]
+
+def batch_response(data, dispatch):
+    """
+    Verwerk de JSON-body van een batch-verzoek: {"queries": [...]}.
+
+    Geeft een antwoord als (body, status) terug.
+    """
+    if not data or not isinstance(data, dict) or not isinstance(data.get("queries"), list):
+        return {"error": "Invalid request format, expected {\"queries\": [...]}"}, 400
+    queries = data["queries"]
+    if len(queries) > BATCH_MAX:
+        return {"error": f"Too many queries in batch (maximum {BATCH_MAX})"}, 413
+    return {"results": run_batch(queries, dispatch)}, 200
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+MCP Circuit breakers
+
+Een circuit breaker houdt bij hoe de recente aanroepen naar een tool of upstream
+verliepen. Mislukt een groot deel (fouten, 5xx) of duurt een groot deel te lang,
+dan gaat de breaker open: aanroepen worden dan direct afgewezen in plaats van op
+een upstream te wachten die toch faalt. Na een wachttijd gaat de breaker
+half-open en mag er één proefaanroep door; slaagt die, dan sluit de breaker
+weer, anders gaat hij opnieuw open.
+
+De MCP-client heeft een breaker per MCP-tool: een prompt slaat een tool met een
+open breaker over en gaat verder met de context van de andere tools. De
+MCP-servers hebben een breaker per upstream-endpoint (Brave, GitHub) en geven
+bij een open breaker een verouderd cacheresultaat terug, of een 503 met
+Retry-After, zonder quotum te verbruiken.
+
+Een verstreken deadline (zie mcp_deadline.py) of een geannuleerde async aanroep
+telt niet als fout van de tool. Dat geldt ook voor een 504 waarmee een
+MCP-server meldt dat de deadline al verstreken was (header
+X-MCP-Deadline-Exceeded); een 504 door een time-out van de upstream telt wel.
+
+Configuratie via omgevingsvariabelen:
+- MCP_BREAKER: 1 (standaard) of 0 om de circuit breakers uit te schakelen
+- MCP_BREAKER_ERROR_RATE: aandeel mislukte aanroepen waarbij de breaker opengaat (standaard 0.5)
+- MCP_BREAKER_SLOW_MS: aanroepen die langer duren tellen als traag (standaard 2000)
+- MCP_BREAKER_SLOW_RATE: aandeel trage aanroepen waarbij de breaker opengaat (standaard 0.8)
+- MCP_BREAKER_MIN_CALLS: minimaal aantal aanroepen in het venster voordat de breaker kan openen (standaard 10)
+- MCP_BREAKER_WINDOW: venster in seconden waarover de aanroepen geteld worden (standaard 60)
+- MCP_BREAKER_OPEN_SECONDS: tijd dat de breaker open blijft voor een proefaanroep (standaard 30)
+- MCP_BREAKER_PROBES: aantal geslaagde proefaanroepen waarna de breaker sluit (standaard 1)
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+
+from mcp_deadline import EXPIRED_HEADER, DeadlineExceeded
+from mcp_metrics import Counter, Gauge
+
+BREAKER_ENABLED = os.getenv("MCP_BREAKER", "1") == "1"
+BREAKER_ERROR_RATE = float(os.getenv("MCP_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW = float(os.getenv("MCP_BREAKER_SLOW_MS", "2000")) / 1000
+BREAKER_SLOW_RATE = float(os.getenv("MCP_BREAKER_SLOW_RATE", "0.8"))
+BREAKER_MIN_CALLS = int(os.getenv("MCP_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("MCP_BREAKER_WINDOW", "60"))
+BREAKER_OPEN_SECONDS = float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_PROBES = max(int(os.getenv("MCP_BREAKER_PROBES", "1")), 1)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Waarde van de gauge en omschrijving in de log per toestand
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+_STATE_LABELS = {CLOSED: "gesloten", HALF_OPEN: "half-open", OPEN: "open"}
+
+BREAKER_STATE = Gauge(
+    "mcp_circuit_breaker_state", "Toestand van de circuit breaker (0 gesloten, 1 half-open, 2 open)",
+    ("name",)
+)
+BREAKER_TRANSITIONS = Counter(
+    "mcp_circuit_breaker_transitions_total", "Overgangen van de circuit breaker naar een toestand",
+    ("name", "state")
+)
+BREAKER_REJECTED = Counter(
+    "mcp_circuit_breaker_rejected_total", "Aanroepen die door een open circuit breaker zijn afgewezen",
+    ("name",)
+)
+
+class CircuitOpenError(RuntimeError):
+    """De circuit breaker staat open; de aanroep is niet gedaan."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit breaker '{name}' staat open (nieuwe poging over {retry_after:.0f}s).")
+        self.name = name
+        self.retry_after = retry_after
+
+def server_error(response):
+    """Een antwoord met een 5xx-status telt als mislukte aanroep."""
+    return response is not None and response.status_code >= 500
+
+def deadline_expired(response):
+    """Een 504 omdat de deadline van het verzoek al verstreken was (zie mcp_deadline.expired_response)."""
+    return response is not None and response.status_code == 504 and EXPIRED_HEADER in response.headers
+
+class CircuitBreaker:
+    """Circuit breaker met de toestanden gesloten, open en half-open voor één tool of upstream."""
+
+    def __init__(self, name, enabled=BREAKER_ENABLED, error_rate=BREAKER_ERROR_RATE, slow=BREAKER_SLOW,
+                 slow_rate=BREAKER_SLOW_RATE, min_calls=BREAKER_MIN_CALLS, window=BREAKER_WINDOW,
+                 open_seconds=BREAKER_OPEN_SECONDS, probes=BREAKER_PROBES):
+        self.name = name
+        self.enabled = enabled
+        self.error_rate = error_rate
+        self.slow = slow
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.rejected = 0
+        self._calls = deque()  # (tijd, mislukt, traag)
+        self._opened_at = 0.0
+        self._probe_started = None  # tijd waarop de lopende proefaanroep begon
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, name=name)
+
+    def _transition(self, state, now, reason=""):
+        # Aanroeper moet de lock vasthouden
+        self.state = state
+        if state == OPEN:
+            self._opened_at = now
+        if state != HALF_OPEN:
+            self._probe_started = None
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._calls.clear()
+        BREAKER_STATE.set(_STATE_VALUES[state], name=self.name)
+        BREAKER_TRANSITIONS.inc(name=self.name, state=state)
+        print(f"Circuit breaker '{self.name}' is nu {_STATE_LABELS[state]}{reason}.")
+
+    def _prune(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _counts(self):
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return len(self._calls), failures, slow
+
+    def _probe_free(self, now):
+        # Een proefaanroep die nooit is afgerond houdt de breaker niet eeuwig half-open
+        return self._probe_started is None or now - self._probe_started > self.open_seconds
+
+    def available(self):
+        """True als een aanroep nu door zou mogen, zonder een proefaanroep te reserveren."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                return now - self._opened_at >= self.open_seconds
+            if self.state == HALF_OPEN:
+                return self._probe_free(now)
+            return True
+
+    def allow(self):
+        """
+        Bepaal of een aanroep door mag, en reserveer in de half-open toestand de proefaanroep.
+
+        Na een True moet de uitkomst met record worden gemeld.
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probe_free(now):
+                self._probe_started = now
+                return True
+            self.rejected += 1
+        BREAKER_REJECTED.inc(name=self.name)
+        return False
+
+    def record(self, failed, seconds=0.0):
+        """Meld de uitkomst van een toegestane aanroep."""
+        if not self.enabled:
+            return
+        slow = seconds >= self.slow
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+                if failed or slow:
+                    self._transition(OPEN, now, " (proefaanroep mislukt)" if failed else " (proefaanroep traag)")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._transition(CLOSED, now)
+                return
+            if self.state == OPEN:
+                # Aanroep die al liep voordat de breaker openging
+                return
+            self._calls.append((now, failed, slow))
+            self._prune(now)
+            total, failures, slow_calls = self._counts()
+            if total < self.min_calls:
+                return
+            if failures / total >= self.error_rate:
+                self._transition(OPEN, now, f" ({failures} van {total} aanroepen mislukt)")
+            elif slow_calls / total >= self.slow_rate:
+                self._transition(OPEN, now, f" ({slow_calls} van {total} aanroepen trager dan {self.slow * 1000:.0f} ms)")
+
+    def release(self):
+        """Geef een gereserveerde proefaanroep vrij zonder uitkomst (bijvoorbeeld na een verstreken deadline)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+
+    def retry_after(self):
+        """Aantal seconden tot de breaker weer een (proef)aanroep toelaat."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def _finish(self, result, failed, ignored, seconds):
+        if ignored and ignored(result):
+            self.release()
+        else:
+            self.record(bool(failed and failed(result)), seconds)
+
+    def call(self, func, failed=None, ignored=None):
+        """
+        Voer func() uit via de breaker.
+
+        Gooit CircuitOpenError als de breaker de aanroep afwijst. Een exceptie
+        telt als mislukte aanroep, net als een resultaat waarvoor failed(result)
+        True is. Een resultaat waarvoor ignored(result) True is telt niet mee;
+        een eventuele proefaanroep wordt dan vrijgegeven.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        start = time.perf_counter()
+        try:
+            result = func()
+        except DeadlineExceeded:
+            self.release()
+            raise
+        except Exception:
+            self.record(True, time.perf_counter() - start)
+            raise
+        self._finish(result, failed, ignored, time.perf_counter() - start)
+        return result
+
+    async def call_async(self, func, failed=None, ignored=None):
+        """Asyncio-variant van call voor een coroutinefunctie func."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        start = time.perf_counter()
+        try:
+            result = await func()
+        except (DeadlineExceeded, asyncio.CancelledError):
+            # Een geannuleerde aanroep (de fan-out is klaar of de client is weg) zegt niets over de tool
+            self.release()
+            raise
+        except Exception:
+            self.record(True, time.perf_counter() - start)
+            raise
+        self._finish(result, failed, ignored, time.perf_counter() - start)
+        return result
+
+    def stats(self):
+        """Geef de toestand en de tellingen voor de statusroutes."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            total, failures, slow = self._counts()
+            retry = max(self.open_seconds - (now - self._opened_at), 0.0) if self.state == OPEN else 0.0
+            return {
+                "state": self.state if self.enabled else "disabled",
+                "calls": total,
+                "failures": failures,
+                "slow": slow,
+                "error_rate": round(failures / total, 2) if total else 0.0,
+                "slow_rate": round(slow / total, 2) if total else 0.0,
+                "retry_after": round(retry, 1),
+                "rejected": self.rejected
+            }
+
+def breaker_stats(breakers):
+    """Statistieken van een dict met breakers, voor de statusroutes."""
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+def open_response(cache, key, breaker):
+    """
+    Antwoord (body, status[, headers]) als de breaker van de upstream openstaat.
+
+    Geeft een verouderd resultaat uit de cache terug (gemarkeerd met "stale"),
+    of een 503 met Retry-After als er niets in de cache staat.
+    """
+    stale = cache.get_stale(key)
+    if stale is not None:
+        return {**stale, "stale": True}, 200, {"Warning": '110 - "Response is Stale"'}
+    retry_after = max(1, math.ceil(breaker.retry_after()))
+    return {
+        "error": "Upstream circuit breaker open",
+        "retry_after": retry_after
+    }, 503, {"Retry-After": str(retry_after)}
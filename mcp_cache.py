@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+MCP Response Cache
+
+Begrensde cache voor zoekresultaten van de MCP-servers. Resultaten worden
+opgeslagen onder een sleutel van endpoint, genormaliseerde zoekopdracht en
+parameters, met een TTL per endpoint en LRU-verwijdering wanneer de cache vol is.
+Verlopen items blijven nog een tijd bewaard, zodat een server een verouderd
+resultaat kan teruggeven wanneer het upstream-budget (rate limit) op is.
+
+Optioneel kan een SQLite-bestand als gedeelde opslag worden gebruikt. De cache
+overleeft dan een herstart en wordt gedeeld tussen meerdere workers of servers.
+
+Configuratie via omgevingsvariabelen:
+- MCP_CACHE_SIZE: maximaal aantal items in het geheugen (standaard 512)
+- MCP_CACHE_DB: pad naar een SQLite-bestand voor gedeelde opslag (optioneel)
+- MCP_CACHE_DB_SIZE: maximaal aantal items in het SQLite-bestand (standaard 10000)
+- MCP_CACHE_STALE_TTL: hoe lang verlopen items nog als noodantwoord bewaard blijven (standaard 86400)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.getenv("MCP_CACHE_SIZE", "512"))
+CACHE_DB = os.getenv("MCP_CACHE_DB") or None
+CACHE_DB_SIZE = int(os.getenv("MCP_CACHE_DB_SIZE", "10000"))
+CACHE_STALE_TTL = int(os.getenv("MCP_CACHE_STALE_TTL", "86400"))
+
+def normalize_query(query):
+    """Normaliseer een zoekopdracht zodat kleine verschillen dezelfde sleutel opleveren."""
+    return " ".join(str(query).lower().split())
+
+def make_key(endpoint, query, **params):
+    """Bouw een cachesleutel uit endpoint, genormaliseerde zoekopdracht en parameters."""
+    return json.dumps(
+        [endpoint, normalize_query(query), params],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+
+class SQLiteBackend:
+    """Gedeelde cache-opslag in een SQLite-bestand, bruikbaar vanuit meerdere processen."""
+
+    def __init__(self, path, max_entries=CACHE_DB_SIZE, stale_ttl=CACHE_STALE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self):
+        # Eén verbinding per thread; sqlite3-verbindingen zijn niet thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Geef (value, expires_at) terug, of None als de sleutel ontbreekt."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, time.time())
+            )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """Verwijder items die ook als noodantwoord te oud zijn en de minst recent gebruikte items boven de limiet."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time() - self.stale_ttl,))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+class ResponseCache:
+    """Thread-safe TTL- en LRU-cache met hit/miss tellers en optionele SQLite-opslag."""
+
+    def __init__(self, max_entries=CACHE_SIZE, default_ttl=300, db_path=CACHE_DB, stale_ttl=CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.backend = None
+        if db_path:
+            try:
+                self.backend = SQLiteBackend(db_path, stale_ttl=stale_ttl)
+            except sqlite3.Error as e:
+                print(f"Fout bij het openen van cachebestand {db_path}: {e}. Alleen geheugencache wordt gebruikt.")
+
+    def get(self, key):
+        """Geef de gecachte waarde terug, of None bij een miss of verlopen item."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if expires_at + self.stale_ttl <= now:
+                    del self._entries[key]
+
+        if self.backend:
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error as e:
+                print(f"Fout bij het lezen uit cachebestand: {e}")
+                stored = None
+            if stored is not None and stored[1] > now:
+                value, expires_at = stored
+                with self._lock:
+                    self._store(key, value, expires_at)
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_stale(self, key):
+        """
+        Geef een verlopen (maar nog niet te oud) resultaat terug, of None.
+
+        Bedoeld als noodantwoord wanneer de upstream-API niet bevraagd mag worden.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] + self.stale_ttl > now:
+                self.stale_hits += 1
+                return entry[1]
+
+        if self.backend:
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error as e:
+                print(f"Fout bij het lezen uit cachebestand: {e}")
+                stored = None
+            if stored is not None and stored[1] + self.stale_ttl > now:
+                with self._lock:
+                    self.stale_hits += 1
+                return stored[0]
+        return None
+
+    def set(self, key, value, ttl=None):
+        """Sla een waarde op met de opgegeven TTL in seconden."""
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend:
+            try:
+                self.backend.set(key, value, expires_at)
+            except sqlite3.Error as e:
+                print(f"Fout bij het schrijven naar cachebestand: {e}")
+
+    def _store(self, key, value, expires_at):
+        # Aanroeper moet de lock vasthouden
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """Geef statistieken voor de statusroute van de server."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "backend": "sqlite" if self.backend else "memory"
+            }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+MCP Client
+
+Gedeelde clientlaag voor communicatie met de lokale MCP-servers en upstream API's.
+Alle verbindingen lopen via een requests.Session met een verbindingspool, zodat
+TCP- en TLS-verbindingen hergebruikt worden (keep-alive) in plaats van bij elk
+verzoek opnieuw te worden opgezet. Voor de async applicatie is er een
+AsyncMCPClient op basis van httpx (optioneel).
+
+Identieke gelijktijdige queries naar dezelfde server worden samengevoegd
+(singleflight): alleen de eerste gaat naar de server, de rest deelt het antwoord.
+Draait een server als meerdere replica's, dan worden de verzoeken daarover
+verdeeld (zie mcp_balancer.py).
+
+Elk verzoek heeft een time-out en geeft de resterende tijd door aan de server
+(zie mcp_deadline.py). Duurt een verzoek langer dan gewoonlijk, dan volgt een
+tweede poging, bij voorkeur naar een andere replica (zie mcp_hedge.py).
+Per server houdt een circuit breaker de recente fouten en trage antwoorden bij;
+staat die open, dan wordt de server niet aangeroepen (zie mcp_breaker.py).
+
+Configuratie via omgevingsvariabelen:
+- MCP_HOST: host waarop de MCP-servers luisteren (standaard 127.0.0.1)
+- MCP_POOL_SIZE: maximaal aantal open verbindingen per host (standaard 20)
+"""
+
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mcp_balancer import Balancer
+from mcp_breaker import CircuitBreaker, deadline_expired, server_error
+from mcp_cache import make_key
+from mcp_deadline import deadline_headers, deadline_scope, timeout_for
+from mcp_hedge import Hedger
+from mcp_metrics import TOOL_LATENCY, UPSTREAM_RESPONSES
+from mcp_singleflight import AsyncSingleFlight, SingleFlight
+from mcp_tracing import span, trace_headers
+
+# httpx is alleen nodig voor de async applicatie
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "20"))
+
+def create_session(pool_size=POOL_SIZE):
+    """Maak een requests.Session met een verbindingspool voor http en https."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def query_key(name, payload):
+    """Sleutel voor het samenvoegen van identieke queries naar dezelfde server."""
+    params = {key: value for key, value in payload.items() if key != "query"}
+    return make_key(name, payload.get("query", ""), **params)
+
+def tool_breakers(servers):
+    """Een circuit breaker per MCP-server."""
+    return {name: CircuitBreaker(f"mcp_{name}") for name in servers}
+
+def replica_candidates(servers, replicas, name):
+    """Poorten waarover de verzoeken voor een server verdeeld worden."""
+    ports = replicas(name) if replicas else None
+    return ports or servers[name].get("ports") or [servers[name]["port"]]
+
+class MCPClient:
+    """Client die MCP-verzoeken naar de lokale servers stuurt via gedeelde verbindingen."""
+
+    def __init__(self, servers, host=MCP_HOST, replicas=None, breakers=None):
+        """
+        replicas is een optionele functie die voor een servernaam de poorten van
+        de gezonde replica's teruggeeft; zonder replicas worden alle poorten uit
+        de configuratie gebruikt. Met breakers kunnen clients dezelfde circuit
+        breakers delen.
+        """
+        self.servers = servers
+        self.host = host
+        self.replicas = replicas
+        self.session = create_session()
+        self.flight = SingleFlight("mcp_client")
+        self.balancers = {name: Balancer(name) for name in servers}
+        self.hedger = Hedger("mcp_client")
+        self.breakers = breakers if breakers is not None else tool_breakers(servers)
+
+    def url(self, name, path="/mcp/query", port=None):
+        """Geef de URL van een endpoint op de opgegeven MCP-server (of een specifieke replica)."""
+        return f"http://{self.host}:{port or self.servers[name]['port']}{path}"
+
+    def query(self, name, payload, timeout=None):
+        """
+        Stuur een MCP-query naar de server met de opgegeven naam.
+
+        Geeft het JSON-antwoord terug bij succes, of None als de server een
+        foutstatus teruggeeft. Verbindingsfouten en time-outs worden doorgegeven
+        aan de aanroeper, net als CircuitOpenError als de breaker van de server
+        openstaat.
+        """
+        if name not in self.servers:
+            raise KeyError(f"Onbekende MCP-server: {name}")
+        return self.flight.do(query_key(name, payload), lambda: self._query(name, payload, timeout))
+
+    def batch(self, name, queries, timeout=None):
+        """
+        Stuur een lijst van MCP-queries in één verzoek naar /mcp/batch.
+
+        Geeft per query een resultaat terug (in dezelfde volgorde, met "status"
+        en bij fouten "error"), of None als de server een foutstatus teruggeeft.
+        """
+        if name not in self.servers:
+            raise KeyError(f"Onbekende MCP-server: {name}")
+        data = self._query(name, {"queries": queries}, timeout, path="/mcp/batch")
+        return data["results"] if data is not None else None
+
+    def _query(self, name, payload, timeout, path="/mcp/query"):
+        res = self.breakers[name].call(
+            lambda: self._send(name, payload, timeout, path), failed=server_error, ignored=deadline_expired
+        )
+        if res.status_code != 200:
+            print(f"MCP-server '{name}' fout: {res.status_code} - {res.text}")
+            return None
+        return res.json()
+
+    def _send(self, name, payload, timeout, path):
+        start = time.perf_counter()
+        used = []
+        try:
+            with deadline_scope(timeout):
+                return self.hedger.call(
+                    f"{name}{path}", lambda attempt: self._post(name, payload, path, used, attempt)
+                )
+        finally:
+            TOOL_LATENCY.observe(time.perf_counter() - start, tool=name)
+
+    def _post(self, name, payload, path, used, attempt):
+        # Eén poging; een tweede poging gaat bij voorkeur naar een andere replica dan de eerste
+        with span(f"mcp.{name}", tool=name, query_type=payload.get("type", "batch")) as current:
+            try:
+                with self.balancers[name].choose(replica_candidates(self.servers, self.replicas, name), used) as port:
+                    used.append(port)
+                    current.set(port=port, attempt=attempt)
+                    res = self.session.post(
+                        self.url(name, path, port), json=payload, timeout=timeout_for(),
+                        headers={**trace_headers(), **deadline_headers()}
+                    )
+            except Exception:
+                UPSTREAM_RESPONSES.inc(upstream=f"mcp_{name}", status="error")
+                raise
+            current.set(status_code=res.status_code)
+        UPSTREAM_RESPONSES.inc(upstream=f"mcp_{name}", status=res.status_code)
+        return res
+
+class AsyncMCPClient:
+    """Async variant van MCPClient op basis van een gedeelde httpx.AsyncClient."""
+
+    def __init__(self, servers, host=MCP_HOST, replicas=None, breakers=None):
+        if httpx is None:
+            raise RuntimeError("httpx is niet geïnstalleerd. Installeer met: pip install httpx")
+        self.servers = servers
+        self.host = host
+        self.replicas = replicas
+        self._client = None
+        self.flight = AsyncSingleFlight("mcp_client")
+        self.balancers = {name: Balancer(name) for name in servers}
+        self.hedger = Hedger("mcp_client")
+        self.breakers = breakers if breakers is not None else tool_breakers(servers)
+
+    @property
+    def client(self):
+        # Pas aanmaken bij het eerste gebruik, binnen de draaiende event loop
+        if self._client is None:
+            replica_count = sum(len(cfg.get("ports") or [cfg["port"]]) for cfg in self.servers.values())
+            limits = httpx.Limits(max_connections=POOL_SIZE * replica_count, max_keepalive_connections=POOL_SIZE)
+            self._client = httpx.AsyncClient(limits=limits)
+        return self._client
+
+    def url(self, name, path="/mcp/query", port=None):
+        """Geef de URL van een endpoint op de opgegeven MCP-server (of een specifieke replica)."""
+        return f"http://{self.host}:{port or self.servers[name]['port']}{path}"
+
+    async def query(self, name, payload, timeout=None):
+        """Stuur een MCP-query naar de server met de opgegeven naam (zie MCPClient.query)."""
+        if name not in self.servers:
+            raise KeyError(f"Onbekende MCP-server: {name}")
+        return await self.flight.do(query_key(name, payload), lambda: self._query(name, payload, timeout))
+
+    async def batch(self, name, queries, timeout=None):
+        """Stuur een lijst van MCP-queries in één verzoek naar /mcp/batch (zie MCPClient.batch)."""
+        if name not in self.servers:
+            raise KeyError(f"Onbekende MCP-server: {name}")
+        data = await self._query(name, {"queries": queries}, timeout, path="/mcp/batch")
+        return data["results"] if data is not None else None
+
+    async def _query(self, name, payload, timeout, path="/mcp/query"):
+        res = await self.breakers[name].call_async(
+            lambda: self._send(name, payload, timeout, path), failed=server_error, ignored=deadline_expired
+        )
+        if res.status_code != 200:
+            print(f"MCP-server '{name}' fout: {res.status_code} - {res.text}")
+            return None
+        return res.json()
+
+    async def _send(self, name, payload, timeout, path):
+        start = time.perf_counter()
+        used = []
+        try:
+            with deadline_scope(timeout):
+                return await self.hedger.call_async(
+                    f"{name}{path}", lambda attempt: self._post(name, payload, path, used, attempt)
+                )
+        finally:
+            TOOL_LATENCY.observe(time.perf_counter() - start, tool=name)
+
+    async def _post(self, name, payload, path, used, attempt):
+        with span(f"mcp.{name}", tool=name, query_type=payload.get("type", "batch")) as current:
+            try:
+                with self.balancers[name].choose(replica_candidates(self.servers, self.replicas, name), used) as port:
+                    used.append(port)
+                    current.set(port=port, attempt=attempt)
+                    res = await self.client.post(
+                        self.url(name, path, port), json=payload, timeout=timeout_for(),
+                        headers={**trace_headers(), **deadline_headers()}
+                    )
+            except Exception:
+                UPSTREAM_RESPONSES.inc(upstream=f"mcp_{name}", status="error")
+                raise
+            current.set(status_code=res.status_code)
+        UPSTREAM_RESPONSES.inc(upstream=f"mcp_{name}", status=res.status_code)
+        return res
+
+    async def aclose(self):
+        """Sluit de onderliggende verbindingen."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
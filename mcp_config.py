@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+MCP Serverconfiguratie
+
+Laadt de beschrijving van de MCP-servers uit een configuratiebestand
+(mcp_servers.toml, of YAML als PyYAML is geïnstalleerd). De applicatie,
+app_async.py en manage_mcp_servers.py gebruiken dezelfde configuratie, zodat een
+tool toevoegen of verplaatsen geen codewijziging vraagt.
+
+Per server bevat de configuratie het startcommando, de poort en het aantal
+replica's, extra omgevingsvariabelen, de MCP-queries die per prompt worden uitgevoerd (met
+sjablonen om resultaten om te zetten in context), een time-out, een gewicht voor
+het rangschikken en de standaard cacheduur. Zie mcp_servers.toml voor een
+toelichting op alle velden.
+
+Een server met replicas = K draait als K processen op de poorten port tot en met
+port + K - 1. In het serverregister heet de eerste replica zoals de server, de
+volgende naam#2, naam#3, enzovoort.
+
+Configuratie via omgevingsvariabelen:
+- MCP_CONFIG: pad naar het configuratiebestand (standaard mcp_servers.toml in de projectmap)
+"""
+
+import os
+import sys
+import string
+from pathlib import Path
+
+# tomllib is onderdeel van de standaardbibliotheek vanaf Python 3.11
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# PyYAML is alleen nodig voor een YAML-configuratie
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+PROJECT_DIR = Path(__file__).resolve().parent
+CONFIG_PATH = os.getenv("MCP_CONFIG", str(PROJECT_DIR / "mcp_servers.toml"))
+
+TEMPLATE_FIELDS = ("title", "snippet", "url", "context")
+
+class ConfigError(ValueError):
+    """Ongeldig of onleesbaar configuratiebestand."""
+
+class _Fields(dict):
+    # Ontbrekende velden in een resultaat worden leeg in plaats van een KeyError
+    def __missing__(self, key):
+        return ""
+
+def render(template, values):
+    """Vul een sjabloon als '{title} - {url}' in met de velden van een resultaat."""
+    return string.Formatter().vformat(template, (), _Fields(values))
+
+def _read(path):
+    path = Path(path)
+    if not path.exists():
+        raise ConfigError(f"Configuratiebestand {path} bestaat niet.")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise ConfigError("PyYAML is niet geïnstalleerd. Installeer met: pip install pyyaml")
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    if tomllib is None:
+        raise ConfigError("tomli is niet geïnstalleerd (nodig voor Python < 3.11). Installeer met: pip install tomli")
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def _query(name, index, spec):
+    if not isinstance(spec, dict) or not spec.get("type"):
+        raise ConfigError(f"Query {index + 1} van server '{name}' heeft geen type.")
+    query = {
+        "type": spec["type"],
+        "words": int(spec["words"]) if spec.get("words") else None,
+        "count": int(spec["count"]) if spec.get("count") else None
+    }
+    for field in TEMPLATE_FIELDS:
+        query[field] = str(spec.get(field, ""))
+    if not query["context"]:
+        raise ConfigError(f"Query '{query['type']}' van server '{name}' heeft geen context-sjabloon.")
+    return query
+
+def _server(name, spec, base_dir):
+    if not isinstance(spec, dict):
+        raise ConfigError(f"Server '{name}' moet een tabel zijn.")
+    if "port" not in spec:
+        raise ConfigError(f"Server '{name}' heeft geen poort.")
+    port = int(spec["port"])
+    count = int(spec.get("replicas", 1))
+    if count < 1:
+        raise ConfigError(f"Server '{name}' moet ten minste één replica hebben.")
+
+    if spec.get("command"):
+        command = [str(part) for part in spec["command"]]
+    elif spec.get("script"):
+        script = Path(spec["script"])
+        if not script.is_absolute():
+            script = base_dir / script
+        command = [sys.executable, str(script)]
+    else:
+        raise ConfigError(f"Server '{name}' heeft geen script of command.")
+
+    env = {key: str(value) for key, value in (spec.get("env") or {}).items()}
+    # Het aantal replica's, zodat elke replica een evenredig deel van het upstream-quotum neemt
+    env["MCP_REPLICAS"] = str(count)
+    if spec.get("cache_ttl") is not None:
+        env["MCP_CACHE_TTL"] = str(int(spec["cache_ttl"]))
+
+    queries = [_query(name, i, query) for i, query in enumerate(spec.get("queries") or [])]
+    return {
+        "label": spec.get("label", name),
+        "command": command,
+        "env": env,
+        "port": port,
+        "ports": [port + i for i in range(count)],
+        "url": f"http://localhost:{port}/",
+        "timeout": float(spec["timeout"]) if spec.get("timeout") is not None else None,
+        "weight": float(spec.get("weight", 1.0)),
+        "queries": queries
+    }
+
+def load_servers(path=CONFIG_PATH):
+    """
+    Lees de MCP-servers uit het configuratiebestand.
+
+    Geeft een dict naam -> instellingen terug, in de volgorde van het bestand.
+    Gooit ConfigError bij een ontbrekend of ongeldig bestand.
+    """
+    try:
+        data = _read(path)
+    except ConfigError:
+        raise
+    except Exception as e:
+        raise ConfigError(f"Configuratiebestand {path} kon niet worden gelezen: {e}") from e
+
+    servers = data.get("servers")
+    if not isinstance(servers, dict) or not servers:
+        raise ConfigError(f"Configuratiebestand {path} bevat geen [servers].")
+    base_dir = Path(path).resolve().parent
+    result = {}
+    ports = {}
+    for name, spec in servers.items():
+        try:
+            server = _server(name, spec, base_dir)
+        except ConfigError:
+            raise
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"Ongeldige instelling voor server '{name}': {e}") from e
+        for port in server["ports"]:
+            if port in ports:
+                raise ConfigError(f"Servers '{ports[port]}' en '{name}' gebruiken dezelfde poort {port}.")
+            ports[port] = name
+        result[name] = server
+    return result
+
+def replica_key(name, index):
+    """Registernaam van een replica: de servernaam voor de eerste, daarna naam#2, naam#3, ..."""
+    return name if index == 0 else f"{name}#{index + 1}"
+
+def tool_name(key):
+    """Servernaam bij de registernaam van een replica."""
+    return key.split("#", 1)[0]
+
+def replicas(name, cfg):
+    """Geef per replica van een server (registernaam, poort, omgevingsvariabelen) terug."""
+    return [
+        (replica_key(name, index), port, {**cfg["env"], "MCP_PORT": str(port)})
+        for index, port in enumerate(cfg["ports"])
+    ]
+
+def load_servers_or_exit(path=CONFIG_PATH):
+    """load_servers voor programma's: toont een duidelijke melding en stopt bij een fout."""
+    try:
+        return load_servers(path)
+    except ConfigError as e:
+        print(f"ERROR: {e}")
+        print("Zie mcp_servers.toml en README.md voor het formaat van de serverconfiguratie.")
+        sys.exit(1)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+MCP Context Fan-out
+
+Deze module voert de contextopvragingen van alle actieve MCP-tools gelijktijdig
+uit in een gedeelde thread pool. Elke tool heeft een eigen deadline en het geheel
+valt binnen een totaal contextbudget. Resultaten die op tijd binnen zijn worden in
+een vaste volgorde (de volgorde van aanmelden) teruggegeven. Voor de async
+applicatie (app_async.py) is er een asyncio-variant met dezelfde semantiek.
+Geldt er een deadline voor de prompt (zie mcp_deadline.py), dan valt het
+contextbudget daarbinnen.
+
+In de progressieve modus (gather_progressive) wordt niet op alle tools gewacht:
+de verzameling stopt zodra de snelste tool resultaten heeft (plus een korte
+gratieperiode voor de andere) of de zachte deadline verstrijkt. De tools die dan
+nog bezig zijn lopen door tot hun eigen deadline; hun resultaten kunnen later
+worden opgehaald (LateResults.collect) voor een verfijning, of vervallen.
+
+Configuratie via omgevingsvariabelen:
+- MCP_TOOL_TIMEOUT: maximale tijd per tool in seconden (standaard 3.0)
+- MCP_CONTEXT_BUDGET: maximale totale tijd voor contextverzameling (standaard 4.0)
+- MCP_FANOUT_WORKERS: aantal threads in de pool (standaard 8)
+- MCP_PROGRESSIVE: 1 om de progressieve modus te gebruiken (standaard 0)
+- MCP_SOFT_DEADLINE: tijd in seconden waarna het LLM in de progressieve modus
+  hoe dan ook start (standaard 1.0)
+- MCP_PROGRESSIVE_GRACE_MS: extra wachttijd voor de andere tools nadat de
+  snelste tool resultaten heeft (standaard 100; 0 = direct starten)
+- MCP_LATE_RESULTS: drop (standaard) om late resultaten te laten vervallen, of
+  refine om het antwoord ermee te verfijnen
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+
+from mcp_deadline import remaining as deadline_remaining
+from mcp_metrics import Counter
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "3.0"))
+DEFAULT_CONTEXT_BUDGET = float(os.getenv("MCP_CONTEXT_BUDGET", "4.0"))
+FANOUT_WORKERS = int(os.getenv("MCP_FANOUT_WORKERS", "8"))
+PROGRESSIVE = os.getenv("MCP_PROGRESSIVE", "0") == "1"
+SOFT_DEADLINE = float(os.getenv("MCP_SOFT_DEADLINE", "1.0"))
+PROGRESSIVE_GRACE = float(os.getenv("MCP_PROGRESSIVE_GRACE_MS", "100")) / 1000
+LATE_RESULTS = os.getenv("MCP_LATE_RESULTS", "drop")
+
+CONTEXT_CUT = Counter(
+    "mcp_context_tools_total", "Uitkomst per tool bij het verzamelen van context in de progressieve modus",
+    ("tool", "outcome")
+)
+
+# Eén gedeelde pool voor alle verzoeken, zodat threads hergebruikt worden
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="mcp-fanout")
+
+def _limits(lookups, tool_timeout, budget, timeouts):
+    # Tijdsbudget van de hele verzameling en de tijd per tool, ingekort tot de deadline van het verzoek
+    tool_timeout = DEFAULT_TOOL_TIMEOUT if tool_timeout is None else tool_timeout
+    budget = DEFAULT_CONTEXT_BUDGET if budget is None else budget
+    budget = min(budget, deadline_remaining(budget))
+    timeouts = timeouts or {}
+    return budget, [(name, func, min(timeouts.get(name, tool_timeout), budget)) for name, func in lookups]
+
+def gather_context(lookups, tool_timeout=None, budget=None, timeouts=None):
+    """
+    Voer alle tool-opvragingen parallel uit en verzamel wat op tijd binnenkomt.
+
+    lookups is een lijst van (naam, functie) tuples. Elke functie krijgt de voor
+    die tool beschikbare tijd in seconden mee, zodat deze als timeout voor
+    upstream-aanroepen gebruikt kan worden. Met timeouts kan per tool een
+    afwijkende deadline worden opgegeven.
+
+    Geeft een tuple (resultaten, status) terug: resultaten is een lijst van
+    (naam, waarde) in de volgorde van lookups, status een dict met per tool
+    "ok", "leeg", "timeout" of "fout".
+    """
+    _, limits = _limits(lookups, tool_timeout, budget, timeouts)
+
+    start = time.monotonic()
+    pending = []
+    for name, func, limit in limits:
+        # Geef de context (zoals de actieve trace-span) door aan de worker-thread
+        future = _executor.submit(contextvars.copy_context().run, func, limit)
+        pending.append((name, future, start + limit))
+
+    results = []
+    status = {}
+    for name, future, deadline in pending:
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            value = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # Laat de thread uitlopen, maar wacht er niet langer op
+            future.cancel()
+            status[name] = "timeout"
+            print(f"MCP-tool '{name}' haalde de deadline van {deadline - start:.1f}s niet.")
+            continue
+        except Exception as e:
+            status[name] = "fout"
+            print(f"Fout bij het ophalen van context via '{name}': {e}")
+            continue
+
+        if value:
+            results.append((name, value))
+            status[name] = "ok"
+        else:
+            status[name] = "leeg"
+
+    return results, status
+
+async def gather_context_async(lookups, tool_timeout=None, budget=None, timeouts=None):
+    """
+    Asyncio-variant van gather_context voor coroutine-functies.
+
+    Werkt als gather_context, maar lookups bevat coroutine-functies. Opvragingen
+    die hun deadline missen worden geannuleerd in plaats van uit te lopen.
+    """
+    _, limits = _limits(lookups, tool_timeout, budget, timeouts)
+
+    start = time.monotonic()
+    pending = []
+    for name, func, limit in limits:
+        task = asyncio.ensure_future(func(limit))
+        pending.append((name, task, start + limit))
+
+    results = []
+    status = {}
+    for name, task, deadline in pending:
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            value = await asyncio.wait_for(task, timeout=remaining)
+        except asyncio.TimeoutError:
+            status[name] = "timeout"
+            print(f"MCP-tool '{name}' haalde de deadline van {deadline - start:.1f}s niet.")
+            continue
+        except Exception as e:
+            status[name] = "fout"
+            print(f"Fout bij het ophalen van context via '{name}': {e}")
+            continue
+
+        if value:
+            results.append((name, value))
+            status[name] = "ok"
+        else:
+            status[name] = "leeg"
+
+    return results, status
+
+def _outcome(name, value, results, status):
+    # Verwerk het resultaat van een afgeronde tool zoals gather_context dat doet
+    if value:
+        results[name] = value
+        status[name] = "ok"
+    else:
+        status[name] = "leeg"
+
+def _ordered(lookups, results):
+    return [(name, results[name]) for name, _ in lookups if name in results]
+
+def _count_cut(status):
+    for name, outcome in status.items():
+        CONTEXT_CUT.inc(tool=name, outcome=outcome)
+
+class LateResults:
+    """Tools die nog bezig waren toen de progressieve contextverzameling stopte."""
+
+    def __init__(self, pending):
+        self._pending = pending  # lijst van (naam, future, deadline)
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self._pending]
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def collect(self):
+        """
+        Wacht op de late tools, elk hooguit tot de eigen deadline.
+
+        Geeft (resultaten, status) terug zoals gather_context; status is per
+        tool "ok", "leeg", "timeout" of "fout".
+        """
+        values = {}
+        status = {}
+        for name, future, deadline in self._pending:
+            try:
+                value = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                status[name] = "timeout"
+                continue
+            except Exception as e:
+                status[name] = "fout"
+                print(f"Fout bij het ophalen van late context via '{name}': {e}")
+                continue
+            _outcome(name, value, values, status)
+        self._pending = []
+        return [(name, values[name]) for name in status if name in values], status
+
+def gather_progressive(lookups, tool_timeout=None, budget=None, timeouts=None,
+                       soft_deadline=None, grace=None):
+    """
+    Progressieve variant van gather_context: stop zodra de context goed genoeg is.
+
+    Wacht tot alle tools klaar zijn, tot grace seconden nadat de eerste tool
+    resultaten had, of tot de zachte deadline, wat het eerst komt. Geeft
+    (resultaten, status, late) terug: resultaten en status als bij
+    gather_context (status "te laat" voor tools die nog bezig zijn) en late een
+    LateResults voor die tools.
+    """
+    soft_deadline = SOFT_DEADLINE if soft_deadline is None else soft_deadline
+    grace = PROGRESSIVE_GRACE if grace is None else grace
+    budget, limits = _limits(lookups, tool_timeout, budget, timeouts)
+
+    start = time.monotonic()
+    futures = {}
+    for name, func, limit in limits:
+        # Geef de context (zoals de actieve trace-span) door aan de worker-thread
+        future = _executor.submit(contextvars.copy_context().run, func, limit)
+        futures[future] = (name, start + limit)
+
+    values = {}
+    status = {}
+    cutoff = start + min(soft_deadline, budget)
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        if now >= cutoff:
+            break
+        first_deadline = min(futures[future][1] for future in pending)
+        done, pending = wait(pending, timeout=max(0.0, min(cutoff, first_deadline) - now),
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future][0]
+            try:
+                _outcome(name, future.result(), values, status)
+            except Exception as e:
+                status[name] = "fout"
+                print(f"Fout bij het ophalen van context via '{name}': {e}")
+                continue
+            if status[name] == "ok":
+                # De snelste tool met resultaten bepaalt hoe lang er nog gewacht wordt
+                cutoff = min(cutoff, time.monotonic() + grace)
+        now = time.monotonic()
+        for future in [future for future in pending if futures[future][1] <= now]:
+            # Laat de thread uitlopen, maar wacht er niet langer op
+            pending.discard(future)
+            status[futures[future][0]] = "timeout"
+            print(f"MCP-tool '{futures[future][0]}' haalde de deadline van {futures[future][1] - start:.1f}s niet.")
+
+    late = [(futures[future][0], future, futures[future][1]) for future in futures if future in pending]
+    for name, _, _ in late:
+        status[name] = "te laat"
+    _count_cut(status)
+    return _ordered(lookups, values), status, LateResults(late)
+
+class AsyncLateResults:
+    """Asyncio-variant van LateResults."""
+
+    def __init__(self, pending):
+        self._pending = pending  # lijst van (naam, taak, deadline)
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self._pending]
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    async def collect(self):
+        """Wacht op de late tools, elk hooguit tot de eigen deadline (zie LateResults.collect)."""
+        values = {}
+        status = {}
+        for name, task, deadline in self._pending:
+            try:
+                value = await asyncio.wait_for(task, timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                status[name] = "timeout"
+                continue
+            except Exception as e:
+                status[name] = "fout"
+                print(f"Fout bij het ophalen van late context via '{name}': {e}")
+                continue
+            _outcome(name, value, values, status)
+        self._pending = []
+        return [(name, values[name]) for name in status if name in values], status
+
+def _consume(task):
+    # Een late taak waarvan niemand het resultaat ophaalt mag geen waarschuwing in de log geven
+    if not task.cancelled():
+        task.exception()
+
+async def gather_progressive_async(lookups, tool_timeout=None, budget=None, timeouts=None,
+                                   soft_deadline=None, grace=None):
+    """
+    Asyncio-variant van gather_progressive voor coroutine-functies.
+
+    Late taken lopen door tot hun eigen deadline (zie AsyncLateResults.collect);
+    taken die hun deadline missen worden geannuleerd.
+    """
+    soft_deadline = SOFT_DEADLINE if soft_deadline is None else soft_deadline
+    grace = PROGRESSIVE_GRACE if grace is None else grace
+    budget, limits = _limits(lookups, tool_timeout, budget, timeouts)
+
+    start = time.monotonic()
+    tasks = {}
+    for name, func, limit in limits:
+        task = asyncio.ensure_future(func(limit))
+        task.add_done_callback(_consume)
+        tasks[task] = (name, start + limit)
+
+    values = {}
+    status = {}
+    cutoff = start + min(soft_deadline, budget)
+    pending = set(tasks)
+    while pending:
+        now = time.monotonic()
+        if now >= cutoff:
+            break
+        first_deadline = min(tasks[task][1] for task in pending)
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, min(cutoff, first_deadline) - now),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name = tasks[task][0]
+            if task.exception() is not None:
+                status[name] = "fout"
+                print(f"Fout bij het ophalen van context via '{name}': {task.exception()}")
+                continue
+            _outcome(name, task.result(), values, status)
+            if status[name] == "ok":
+                cutoff = min(cutoff, time.monotonic() + grace)
+        now = time.monotonic()
+        for task in [task for task in pending if tasks[task][1] <= now]:
+            pending.discard(task)
+            task.cancel()
+            status[tasks[task][0]] = "timeout"
+            print(f"MCP-tool '{tasks[task][0]}' haalde de deadline van {tasks[task][1] - start:.1f}s niet.")
+
+    late = [(tasks[task][0], task, tasks[task][1]) for task in tasks if task in pending]
+    for name, _, _ in late:
+        status[name] = "te laat"
+    _count_cut(status)
+    return _ordered(lookups, values), status, AsyncLateResults(late)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+MCP Deadlines
+
+Eind-tot-eind deadlines voor de verwerking van een prompt. De applicatie geeft
+elke prompt een tijdsbudget (deadline_scope); de resterende tijd gaat in de
+header X-MCP-Deadline-Ms mee naar de MCP-servers, die daar de time-outs van hun
+upstream-aanroepen (Brave, GitHub) en het wachten op het rate-limitbudget op
+afstemmen. Zo blijft een worker nooit hangen op een upstream die niet meer
+antwoordt, en doet een server geen werk meer voor een antwoord waar de
+applicatie niet meer op wacht.
+
+De header bevat de resterende tijd in milliseconden en geen tijdstip, zodat
+klokverschillen tussen machines niet uitmaken. De deadline staat in een
+contextvar en gaat dus mee naar worker-threads die met een kopie van de context
+draaien (de fan-out en de batch-verwerking) en naar asyncio-taken.
+
+Elke uitgaande aanroep krijgt een time-out, ook zonder deadline: dan geldt
+MCP_UPSTREAM_TIMEOUT (of MCP_LLM_TIMEOUT voor de LLM-API's).
+
+Configuratie via omgevingsvariabelen:
+- MCP_PROMPT_DEADLINE: tijdsbudget per prompt in seconden, inclusief het LLM (standaard 60)
+- MCP_UPSTREAM_TIMEOUT: maximale time-out van een upstream-aanroep in seconden (standaard 10)
+- MCP_LLM_TIMEOUT: maximale time-out van een LLM-aanroep in seconden (standaard 60)
+- MCP_DEADLINE_MARGIN_MS: marge voor netwerk en verwerking die van de doorgegeven tijd af gaat (standaard 50)
+"""
+
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+
+from mcp_metrics import Counter
+
+PROMPT_DEADLINE = float(os.getenv("MCP_PROMPT_DEADLINE", "60"))
+UPSTREAM_TIMEOUT = float(os.getenv("MCP_UPSTREAM_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("MCP_LLM_TIMEOUT", "60"))
+DEADLINE_MARGIN_MS = int(os.getenv("MCP_DEADLINE_MARGIN_MS", "50"))
+
+DEADLINE_HEADER = "X-MCP-Deadline-Ms"
+# Markeert een 504 omdat de deadline verstreken was, niet omdat de upstream faalde
+EXPIRED_HEADER = "X-MCP-Deadline-Exceeded"
+
+DEADLINE_EXCEEDED = Counter(
+    "mcp_deadline_exceeded_total", "Aanroepen die niet meer zijn gedaan omdat de deadline verstreken was",
+    ("upstream",)
+)
+
+# Monotone tijd waarop de huidige verwerking klaar moet zijn, of None
+_deadline = contextvars.ContextVar("mcp_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """De deadline van het verzoek is verstreken."""
+
+@contextmanager
+def deadline_scope(seconds):
+    """
+    Beperk de code in het blok tot seconds seconden.
+
+    Een strengere deadline die al geldt blijft van kracht; met seconds=None
+    verandert er niets.
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def remaining(default=None):
+    """Resterende tijd tot de deadline in seconden (minimaal 0), of default zonder deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.monotonic())
+
+def expired():
+    """True als er een deadline geldt en die verstreken is."""
+    left = remaining()
+    return left is not None and left <= 0
+
+def timeout_for(limit=None):
+    """
+    Time-out voor een uitgaande aanroep: limit (standaard MCP_UPSTREAM_TIMEOUT),
+    of korter als de deadline eerder valt.
+
+    Gooit DeadlineExceeded als de deadline al verstreken is.
+    """
+    limit = UPSTREAM_TIMEOUT if limit is None else limit
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded("De deadline van het verzoek is verstreken.")
+    return min(limit, left)
+
+def deadline_headers():
+    """Header met de resterende tijd, om de deadline door te geven aan een MCP-server."""
+    left = remaining()
+    if left is None:
+        return {}
+    return {DEADLINE_HEADER: str(max(int(left * 1000) - DEADLINE_MARGIN_MS, 0))}
+
+def parse_deadline(value):
+    """Lees de resterende tijd in seconden uit de header, of None als die ontbreekt of ongeldig is."""
+    try:
+        milliseconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return max(milliseconds, 0.0) / 1000
+
+def instrument_deadline(app):
+    """Neem voor elk Flask-verzoek de deadline uit de header X-MCP-Deadline-Ms over."""
+    from flask import g, request
+
+    @app.before_request
+    def _deadline_start():
+        seconds = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        if seconds is not None:
+            g._deadline_token = _deadline.set(time.monotonic() + seconds)
+
+    @app.teardown_request
+    def _deadline_end(exc):
+        token = g.pop("_deadline_token", None)
+        if token is None:
+            return
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            _deadline.set(None)
+
+def expired_response(cache, key, upstream):
+    """
+    Antwoord (body, status[, headers]) als de deadline verstreken is voor de upstream-aanroep.
+
+    Geeft een verouderd resultaat uit de cache terug (gemarkeerd met "stale"),
+    of een 504 met de header X-MCP-Deadline-Exceeded als er niets in de cache
+    staat; de circuit breaker van de client telt die niet als fout van de tool.
+    """
+    DEADLINE_EXCEEDED.inc(upstream=upstream)
+    stale = cache.get_stale(key)
+    if stale is not None:
+        return {**stale, "stale": True}, 200, {"Warning": '110 - "Response is Stale"'}
+    return {"error": "Deadline exceeded before calling upstream"}, 504, {EXPIRED_HEADER: "1"}
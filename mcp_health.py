@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+MCP Gezondheidsmonitor
+
+Achtergrondthread die alle geregistreerde MCP-servers (elke replica afzonderlijk)
+periodiek controleert. De uitkomst (gezond of niet, en de latency) wordt in het
+gedeelde register opgeslagen, zodat get_tool_context een ongezonde tool direct
+kan overslaan in plaats van op een time-out te wachten. Servers waarvan het
+proces is gestopt worden met exponentiële backoff opnieuw gestart.
+
+Configuratie via omgevingsvariabelen:
+- MCP_HEALTH_INTERVAL: tijd tussen controles in seconden (standaard 5)
+- MCP_HEALTH_TIMEOUT: time-out per controle in seconden (standaard 1)
+- MCP_AUTO_RESTART: herstart gecrashte servers automatisch (standaard 1, uitzetten met 0)
+- MCP_RESTART_BACKOFF_MAX: maximale wachttijd tussen herstartpogingen in seconden (standaard 60)
+- MCP_STARTUP_TIMEOUT: maximale tijd om op een startende server te wachten (standaard 15)
+"""
+
+import os
+import time
+import threading
+
+import requests
+
+from mcp_client import MCP_HOST, create_session
+from mcp_config import tool_name
+from mcp_registry import pid_alive
+
+HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "5"))
+HEALTH_TIMEOUT = float(os.getenv("MCP_HEALTH_TIMEOUT", "1"))
+AUTO_RESTART = os.getenv("MCP_AUTO_RESTART", "1") != "0"
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = float(os.getenv("MCP_RESTART_BACKOFF_MAX", "60"))
+STARTUP_TIMEOUT = float(os.getenv("MCP_STARTUP_TIMEOUT", "15"))
+
+def wait_until_ready(url, timeout=STARTUP_TIMEOUT, proc=None, session=None):
+    """
+    Wacht tot een server op de opgegeven URL antwoordt.
+
+    Peilt met exponentieel oplopende tussenpozen (50 ms tot 500 ms) tot de
+    server een 200 teruggeeft of de deadline verstrijkt. Als proc is opgegeven
+    en het proces eerder stopt, wordt direct opgegeven. Geeft (gereed, latency in
+    ms van de laatste controle) terug.
+    """
+    session = session or requests
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    latency_ms = None
+    while True:
+        start = time.monotonic()
+        try:
+            res = session.get(url, timeout=min(HEALTH_TIMEOUT, max(deadline - start, 0.05)))
+            latency_ms = (time.monotonic() - start) * 1000
+            if res.status_code == 200:
+                return True, latency_ms
+        except requests.exceptions.RequestException:
+            pass
+        if proc is not None and proc.poll() is not None:
+            return False, latency_ms
+        if time.monotonic() + delay > deadline:
+            return False, latency_ms
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+class HealthMonitor:
+    """Controleert MCP-servers op de achtergrond en herstart gecrashte servers."""
+
+    def __init__(self, registry, servers, restart=None, interval=HEALTH_INTERVAL,
+                 timeout=HEALTH_TIMEOUT, host=MCP_HOST):
+        self.registry = registry
+        self.servers = servers
+        self.restart = restart if AUTO_RESTART else None
+        self.interval = interval
+        self.timeout = timeout
+        self.host = host
+        self.session = create_session(pool_size=max(len(servers), 1))
+        self._backoff = {}  # naam -> (pogingen, volgende poging, laatste herstart)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        """Start de monitorthread als deze (in dit proces) nog niet draait."""
+        # Na een fork (gunicorn workers) bestaat het thread-object nog, maar draait het niet
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mcp-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop de monitorthread."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                print(f"Fout in de gezondheidsmonitor: {e}")
+            self._stop.wait(self.interval)
+
+    def probe(self, port):
+        """Controleer één server via de statusroute; geeft (gezond, latency in ms) terug."""
+        start = time.monotonic()
+        try:
+            res = self.session.get(f"http://{self.host}:{port}/", timeout=self.timeout)
+            healthy = res.status_code == 200
+        except Exception:
+            healthy = False
+        return healthy, (time.monotonic() - start) * 1000
+
+    def check_all(self):
+        """Controleer alle servers in het register één keer."""
+        # Servers die starten of worden gestopt ('starting', 'stopping') worden met rust gelaten
+        for name, entry in self.registry.all(fresh=True).items():
+            status = entry["status"]
+            if status == "running":
+                healthy, latency_ms = self.probe(entry["port"])
+                self.registry.update_health(name, healthy, latency_ms)
+                if healthy:
+                    self._reset_backoff(name)
+                    continue
+                if pid_alive(entry["pid"]):
+                    # Proces leeft nog maar reageert niet; overslaan tot het herstelt
+                    continue
+                # Alleen als de status nog 'running' is; een stopper kan hem intussen op 'stopping' hebben gezet
+                if not self.registry.set_status(name, "crashed", expected="running"):
+                    continue
+                print(f"MCP-server '{name}' (PID {entry['pid']}) is onverwacht gestopt.")
+                status = "crashed"
+            if status == "crashed":
+                self._maybe_restart(name)
+
+    def _reset_backoff(self, name):
+        state = self._backoff.get(name)
+        # Pas na een periode van stabiel draaien opnieuw beginnen met tellen
+        if state and time.monotonic() - state[2] > RESTART_BACKOFF_MAX:
+            del self._backoff[name]
+
+    def _maybe_restart(self, name):
+        if not self.restart or tool_name(name) not in self.servers:
+            self.registry.remove(name, status="crashed")
+            return
+        attempts, next_attempt, _ = self._backoff.get(name, (0, 0.0, 0.0))
+        now = time.monotonic()
+        if now < next_attempt:
+            return
+        delay = min(RESTART_BACKOFF_BASE * 2 ** attempts, RESTART_BACKOFF_MAX)
+        # Opnieuw controleren vlak voor de herstart: de server kan intussen gestopt of gestart zijn
+        entry = self.registry.get(name, fresh=True)
+        if not entry or entry["status"] != "crashed":
+            return
+        self._backoff[name] = (attempts + 1, now + delay, now)
+        print(f"MCP-server '{name}' wordt herstart (poging {attempts + 1}).")
+        self.restart(name)
+
+    def is_available(self, name, entry=None):
+        """
+        Geef aan of een tool bevraagd kan worden.
+
+        Gebruikt alleen de opgeslagen uitkomst van de laatste controle, zodat dit
+        op het hete pad geen netwerkverkeer kost. Een server die nog niet is
+        gecontroleerd geldt als beschikbaar.
+        """
+        entry = entry or self.registry.get(name)
+        if not entry or entry["status"] != "running":
+            return False
+        return entry["healthy"] is None or bool(entry["healthy"])
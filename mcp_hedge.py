@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+MCP Hedged requests
+
+Verkort de staart van de latentie met een tweede poging: duurt een aanroep
+langer dan gewoonlijk (de p95 van de recente latenties van die aanroep), dan
+wordt dezelfde aanroep nog eens gestart en telt het antwoord dat het eerst
+binnenkomt. Een enkele trage verbinding of replica bepaalt dan niet meer de
+wachttijd van de prompt, terwijl er gemiddeld maar ongeveer 5% extra aanroepen
+bij komen.
+
+Er wordt pas gehedged als er genoeg metingen zijn, niet meer na de deadline
+(zie mcp_deadline.py) en alleen als de aanroeper het toestaat (allow_hedge),
+bijvoorbeeld omdat er nog quotum is. De verliezende synchrone poging loopt uit
+tot haar eigen time-out; een verliezende asyncio-poging wordt geannuleerd.
+
+De MCP-client hedget de aanroepen naar de MCP-servers (bij replica's naar een
+andere replica). De MCP-servers hedgen hun upstream-aanroepen alleen als
+MCP_UPSTREAM_HEDGE=1, omdat elke extra aanroep quotum van de API kost.
+
+Configuratie via omgevingsvariabelen:
+- MCP_HEDGE: 1 (standaard) om de aanroepen van de MCP-client te hedgen, 0 om dit uit te schakelen
+- MCP_UPSTREAM_HEDGE: 1 om ook de upstream-aanroepen van de MCP-servers te hedgen (standaard 0)
+- MCP_HEDGE_PERCENTILE: percentiel van de recente latenties waarna de tweede poging start (standaard 0.95)
+- MCP_HEDGE_MIN_SAMPLES: aantal metingen voordat er gehedged wordt (standaard 20)
+- MCP_HEDGE_MIN_DELAY_MS: minimale wachttijd voor de tweede poging in ms (standaard 20)
+- MCP_HEDGE_WORKERS: aantal threads voor pogingen (standaard 32)
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from mcp_deadline import expired
+from mcp_metrics import Counter
+
+HEDGE_ENABLED = os.getenv("MCP_HEDGE", "1") == "1"
+UPSTREAM_HEDGE_ENABLED = os.getenv("MCP_UPSTREAM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("MCP_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("MCP_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("MCP_HEDGE_MIN_DELAY_MS", "20")) / 1000
+HEDGE_WORKERS = int(os.getenv("MCP_HEDGE_WORKERS", "32"))
+
+# Aantal recente latenties per aanroep waarover het percentiel wordt bepaald
+HEDGE_WINDOW = 200
+
+HEDGES = Counter(
+    "mcp_hedged_requests_total", "Tweede pogingen (sent) en hoe vaak die als eerste antwoordde (won)",
+    ("name", "outcome")
+)
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="mcp-hedge")
+
+class LatencyTracker:
+    """Recente latenties van één soort aanroep, voor het bepalen van een percentiel."""
+
+    def __init__(self, size=HEDGE_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, fraction, min_samples=HEDGE_MIN_SAMPLES):
+        """Percentiel van de recente latenties, of None bij te weinig metingen."""
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+class Hedger:
+    """Voert aanroepen uit met een tweede poging na de p95-latentie van die aanroep."""
+
+    def __init__(self, name, enabled=HEDGE_ENABLED, percentile=HEDGE_PERCENTILE,
+                 min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._trackers = {}
+        self._lock = threading.Lock()
+
+    def _tracker(self, key):
+        with self._lock:
+            tracker = self._trackers.get(key)
+            if tracker is None:
+                tracker = self._trackers[key] = LatencyTracker()
+            return tracker
+
+    def delay(self, key):
+        """Wachttijd voor de tweede poging in seconden, of None als er niet gehedged wordt."""
+        if not self.enabled:
+            return None
+        value = self._tracker(key).quantile(self.percentile, self.min_samples)
+        return None if value is None else max(value, self.min_delay)
+
+    def _timed(self, key, attempt, index):
+        start = time.perf_counter()
+        result = attempt(index)
+        self._tracker(key).observe(time.perf_counter() - start)
+        return result
+
+    def _may_hedge(self, allow_hedge):
+        return not expired() and (allow_hedge is None or allow_hedge())
+
+    def call(self, key, attempt, allow_hedge=None):
+        """
+        Voer attempt(0) uit en start attempt(1) als die langer duurt dan de p95 van key.
+
+        attempt krijgt het nummer van de poging mee. Geeft het eerste geslaagde
+        resultaat terug; mislukken beide pogingen, dan wordt de laatste fout
+        doorgegeven. allow_hedge is een optionele functie die bepaalt of de
+        tweede poging nog mag (bijvoorbeeld als er quotum voor is).
+        """
+        delay = self.delay(key)
+        if delay is None:
+            return self._timed(key, attempt, 0)
+
+        first = _executor.submit(contextvars.copy_context().run, self._timed, key, attempt, 0)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        if not self._may_hedge(allow_hedge):
+            return first.result()
+
+        HEDGES.inc(name=self.name, outcome="sent")
+        second = _executor.submit(contextvars.copy_context().run, self._timed, key, attempt, 1)
+        error = None
+        for future in as_completed((first, second)):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if future is second:
+                HEDGES.inc(name=self.name, outcome="won")
+            return result
+        raise error
+
+    async def call_async(self, key, attempt, allow_hedge=None):
+        """Asyncio-variant van call voor een coroutinefunctie attempt; de verliezer wordt geannuleerd."""
+        async def timed(index):
+            start = time.perf_counter()
+            result = await attempt(index)
+            self._tracker(key).observe(time.perf_counter() - start)
+            return result
+
+        delay = self.delay(key)
+        if delay is None:
+            return await timed(0)
+
+        first = asyncio.ensure_future(timed(0))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not self._may_hedge(allow_hedge):
+            return await first
+
+        HEDGES.inc(name=self.name, outcome="sent")
+        second = asyncio.ensure_future(timed(1))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is second:
+                        HEDGES.inc(name=self.name, outcome="won")
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
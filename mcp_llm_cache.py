@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+LLM Antwoordcache
+
+Optionele cache voor antwoorden van de LLM-modellen. Een identieke volledige
+prompt (dezelfde context en vraag) voor hetzelfde model met dezelfde parameters
+levert dan binnen enkele milliseconden het eerder gegenereerde antwoord op, in
+plaats van een nieuwe (betaalde) API-aanroep.
+
+De sleutel bestaat uit de modelkeuze, de modelparameters en een SHA-256 hash van
+de volledige prompt. Opslag gebeurt met ResponseCache (TTL en LRU in het
+geheugen) met een SQLite-bestand op schijf, zodat antwoorden een herstart
+overleven en gedeeld worden tussen workers.
+
+Configuratie via omgevingsvariabelen:
+- MCP_LLM_CACHE: zet de cache aan met 1 (standaard uit)
+- MCP_LLM_CACHE_TTL: geldigheid van een antwoord in seconden (standaard 86400)
+- MCP_LLM_CACHE_SIZE: maximaal aantal antwoorden in het geheugen (standaard 256)
+- MCP_LLM_CACHE_DB: pad naar het SQLite-bestand (standaard .mcp_llm_cache.db in de projectmap; leeg = alleen geheugen)
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+from mcp_cache import ResponseCache
+from mcp_metrics import register_cache
+
+LLM_CACHE_ENABLED = os.getenv("MCP_LLM_CACHE", "0") == "1"
+LLM_CACHE_TTL = int(os.getenv("MCP_LLM_CACHE_TTL", "86400"))
+LLM_CACHE_SIZE = int(os.getenv("MCP_LLM_CACHE_SIZE", "256"))
+LLM_CACHE_DB = os.getenv("MCP_LLM_CACHE_DB", str(Path(__file__).resolve().parent / ".mcp_llm_cache.db")) or None
+
+def prompt_key(model_choice, params, prompt_text):
+    """Bouw de cachesleutel uit model, parameters en een hash van de volledige prompt."""
+    digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+    return json.dumps(["llm", model_choice, params, digest], sort_keys=True)
+
+class LLMCache:
+    """Cache voor LLM-antwoorden; doet niets als de cache niet is ingeschakeld."""
+
+    def __init__(self, enabled=LLM_CACHE_ENABLED, ttl=LLM_CACHE_TTL,
+                 max_entries=LLM_CACHE_SIZE, db_path=LLM_CACHE_DB):
+        self.enabled = enabled
+        self.cache = None
+        if enabled:
+            # Verlopen antwoorden zijn geen bruikbaar noodantwoord; direct opruimen
+            self.cache = ResponseCache(max_entries=max_entries, default_ttl=ttl, db_path=db_path, stale_ttl=0)
+            register_cache(self.cache, "llm")
+
+    def get(self, model_choice, params, prompt_text):
+        """Geef een eerder antwoord terug, of None."""
+        if self.cache is None:
+            return None
+        return self.cache.get(prompt_key(model_choice, params, prompt_text))
+
+    def set(self, model_choice, params, prompt_text, answer):
+        """Bewaar een (geslaagd) antwoord."""
+        if self.cache is not None:
+            self.cache.set(prompt_key(model_choice, params, prompt_text), answer)
+
+    def stats(self):
+        return self.cache.stats() if self.cache is not None else {"enabled": False}
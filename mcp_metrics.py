@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+MCP Metrics
+
+Eenvoudige metrics in het Prometheus-tekstformaat voor de hoofdapplicatie en de
+MCP-servers, zonder externe afhankelijkheden. Elke service biedt een /metrics
+endpoint met onder meer:
+
+- aantallen verzoeken en latency per endpoint, en het aantal lopende verzoeken
+- latency per fase van de promptverwerking (context, tools, LLM, render)
+- latency en statuscodes van upstream-aanroepen
+- hit/miss tellers van de caches
+
+Metrics worden per proces bijgehouden en niet tussen processen opgeteld. Onder
+gunicorn met meerdere workers komt elke scrape van /metrics bij een willekeurige
+worker terecht: tellers lijken dan te verspringen en zijn geen totaal. Gebruik
+voor betrouwbare metrics één worker per replica (MCP_WORKERS=1, en meer
+replica's in mcp_servers.toml voor meer capaciteit) en scrape elke replica
+afzonderlijk.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+from mcp_tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    """Verzameling van metrics en collectors die samen als tekst worden weergegeven."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """
+        Registreer een functie die bij elke scrape wordt aangeroepen.
+
+        De functie geeft een lijst van (naam, type, helptekst, samples) terug,
+        waarbij samples een lijst van (labels-dict, waarde) is.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Geef alle metrics terug in het Prometheus-tekstformaat."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Fout in metrics-collector: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_str = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+class Metric:
+    """Basisklasse voor metrics met labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    """Teller die alleen kan oplopen."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Waarde die kan stijgen en dalen."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Histogram met cumulatieve buckets, som en aantal."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, help_text, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Meet de duur van een codeblok in seconden."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = ("le", _format_value(bound) if bound != float("inf") else "+Inf")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+# Gedeelde metrics voor alle services
+HTTP_REQUESTS = Counter(
+    "mcp_http_requests_total", "Aantal afgehandelde HTTP-verzoeken",
+    ("service", "endpoint", "method", "status")
+)
+HTTP_LATENCY = Histogram(
+    "mcp_http_request_duration_seconds", "Duur van HTTP-verzoeken in seconden",
+    ("service", "endpoint")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "mcp_http_requests_in_flight", "Aantal verzoeken dat op dit moment wordt verwerkt",
+    ("service",)
+)
+PHASE_LATENCY = Histogram(
+    "mcp_phase_duration_seconds", "Duur per fase van de promptverwerking in seconden",
+    ("phase",)
+)
+TOOL_LATENCY = Histogram(
+    "mcp_tool_duration_seconds", "Duur van contextopvragingen per MCP-tool in seconden",
+    ("tool",)
+)
+UPSTREAM_LATENCY = Histogram(
+    "mcp_upstream_duration_seconds", "Duur van upstream-aanroepen in seconden",
+    ("upstream",)
+)
+UPSTREAM_RESPONSES = Counter(
+    "mcp_upstream_responses_total", "Upstream-antwoorden per statuscode",
+    ("upstream", "status")
+)
+
+def record_upstream(upstream, start, status):
+    """Leg duur en statuscode (of 'error') van een upstream-aanroep vast."""
+    UPSTREAM_LATENCY.observe(time.perf_counter() - start, upstream=upstream)
+    UPSTREAM_RESPONSES.inc(upstream=upstream, status=status)
+
+def instrumented_get(session, upstream, url, **kwargs):
+    """Voer session.get uit en leg duur en statuscode vast als metric en als trace-span."""
+    start = time.perf_counter()
+    with span(f"upstream.{upstream}", upstream=upstream) as current:
+        try:
+            response = session.get(url, **kwargs)
+        except Exception:
+            record_upstream(upstream, start, "error")
+            raise
+        current.set(status_code=response.status_code)
+    record_upstream(upstream, start, response.status_code)
+    return response
+
+def register_cache(cache, name, registry=REGISTRY):
+    """Maak de statistieken van een ResponseCache zichtbaar als metrics."""
+    def collect():
+        stats = cache.stats()
+        labels = {"cache": name}
+        return [
+            ("mcp_cache_hits_total", "counter", "Aantal cache-hits", [(labels, stats["hits"])]),
+            ("mcp_cache_misses_total", "counter", "Aantal cache-misses", [(labels, stats["misses"])]),
+            ("mcp_cache_stale_hits_total", "counter", "Aantal verouderde resultaten uitgeleverd als noodantwoord", [(labels, stats["stale_hits"])]),
+            ("mcp_cache_entries", "gauge", "Aantal items in de cache", [(labels, stats["entries"])]),
+            ("mcp_cache_hit_ratio", "gauge", "Aandeel hits van alle cache-opvragingen", [(labels, stats["hit_rate"])]),
+        ]
+    registry.register_collector(collect)
+
+def _start_request(g, service):
+    # Gedeeld door de Flask- en de Quart-variant
+    g._metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(service=service)
+
+def _end_request(g, request, service, exc):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return
+    HTTP_IN_FLIGHT.dec(service=service)
+    endpoint = request.endpoint or "onbekend"
+    HTTP_LATENCY.observe(time.perf_counter() - start, service=service, endpoint=endpoint)
+    status = getattr(g, "_metrics_status", 500 if exc else 200)
+    HTTP_REQUESTS.inc(service=service, endpoint=endpoint, method=request.method, status=status)
+
+def instrument_app(app, service):
+    """Voeg verzoekmetrics en een /metrics endpoint toe aan een Flask-app."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_start():
+        _start_request(g, service)
+
+    @app.teardown_request
+    def _metrics_end(exc):
+        _end_request(g, request, service, exc)
+
+    @app.after_request
+    def _metrics_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Metrics in het Prometheus-tekstformaat."""
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def instrument_app_async(app, service):
+    """Quart-variant van instrument_app: dezelfde verzoekmetrics en een /metrics endpoint."""
+    from quart import g, request
+
+    @app.before_request
+    async def _metrics_start():
+        _start_request(g, service)
+
+    @app.teardown_request
+    async def _metrics_end(exc):
+        _end_request(g, request, service, exc)
+
+    @app.after_request
+    async def _metrics_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    async def metrics():
+        """Metrics in het Prometheus-tekstformaat."""
+        return REGISTRY.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+MCP Rate Limiting
+
+Token-bucket planner voor upstream-aanroepen van de MCP-servers (GitHub en Brave).
+Per upstream en per credential (API-sleutel of token) is er één bucket. Een
+verzoek wacht kort op een token; is het budget langer op, dan wordt het verzoek
+afgewezen in plaats van de upstream-API te belasten. De servers geven in dat geval
+een verouderd cacheresultaat terug, of een 429 met Retry-After.
+
+Na elke upstream-aanroep wordt de bucket bijgesteld op basis van de headers
+'X-RateLimit-Remaining', 'X-RateLimit-Reset' en 'Retry-After', zodat ook limieten
+die door andere processen of workers zijn verbruikt worden gerespecteerd.
+
+Er wordt nooit langer op een token gewacht dan de deadline van het verzoek
+toelaat (zie mcp_deadline.py).
+
+Configuratie via omgevingsvariabelen:
+- MCP_RATE_LIMIT_WAIT: maximale wachttijd op een token in seconden (standaard 1.0)
+- MCP_RATE_LIMIT_BACKOFF: pauze na een 429/403 zonder reset-informatie in seconden (standaard 60)
+- MCP_REPLICAS: aantal replica's van deze server; elke replica krijgt een evenredig
+  deel van het minuutbudget (standaard 1, wordt gezet door de serverconfiguratie)
+
+In de productiemodus met gunicorn wordt het budget van een replica verder
+gedeeld door het aantal worker-processen (MCP_WORKERS, zie mcp_serve.py), omdat
+elke worker zijn eigen buckets heeft.
+"""
+
+import os
+import math
+import time
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+from mcp_deadline import remaining
+from mcp_metrics import Counter
+from mcp_serve import worker_processes
+
+RATE_LIMIT_WAIT = float(os.getenv("MCP_RATE_LIMIT_WAIT", "1.0"))
+RATE_LIMIT_BACKOFF = float(os.getenv("MCP_RATE_LIMIT_BACKOFF", "60"))
+REPLICAS = max(int(os.getenv("MCP_REPLICAS", "1")), 1)
+
+RATE_LIMIT_EVENTS = Counter(
+    "mcp_rate_limit_total", "Uitkomsten van de upstream rate limiter",
+    ("upstream", "outcome")
+)
+
+def _header_values(value):
+    """Lees één of meer getallen uit een header als '30' of '1, 15000' (Brave)."""
+    values = []
+    for part in str(value or "").split(","):
+        try:
+            values.append(float(part.strip()))
+        except ValueError:
+            pass
+    return values
+
+def _retry_after_seconds(value):
+    """Retry-After als aantal seconden; de header mag ook een HTTP-datum zijn."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Token bucket voor één upstream en credential."""
+
+    def __init__(self, name, rate, capacity=None, default_backoff=RATE_LIMIT_BACKOFF):
+        self.name = name
+        self.rate = rate  # tokens per seconde
+        self.capacity = capacity or max(rate, 1.0)
+        self.default_backoff = default_backoff
+        self.tokens = self.capacity
+        self.blocked_until = 0.0  # monotonic tijd tot waarop de upstream het budget op heeft gemeld
+        self.updated = time.monotonic()
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # Aanroeper moet de lock vasthouden
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def retry_after(self):
+        """Aantal seconden tot er weer een token beschikbaar is."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait_time(now)
+
+    def _wait_time(self, now):
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def acquire(self, timeout=RATE_LIMIT_WAIT):
+        """
+        Neem een token, en wacht daarvoor hooguit timeout seconden.
+
+        Geeft False terug (het verzoek wordt afgewezen) als er binnen de timeout
+        geen token vrijkomt. De timeout wordt ingekort tot de deadline van het verzoek.
+        """
+        deadline = time.monotonic() + min(timeout, remaining(timeout))
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    self.tokens -= 1
+                    RATE_LIMIT_EVENTS.inc(upstream=self.name, outcome="queued" if waited else "allowed")
+                    return True
+                if now + wait > deadline:
+                    self.shed += 1
+                    RATE_LIMIT_EVENTS.inc(upstream=self.name, outcome="shed")
+                    return False
+            waited = True
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Neem een token als er direct een beschikbaar is, zonder te wachten (voor extra pogingen)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._wait_time(now) > 0:
+                return False
+            self.tokens -= 1
+        RATE_LIMIT_EVENTS.inc(upstream=self.name, outcome="allowed")
+        return True
+
+    def update_from_headers(self, headers, status_code):
+        """
+        Stel de bucket bij op basis van de rate-limit headers van een upstream-antwoord.
+
+        Geeft True terug als het antwoord aangeeft dat de limiet is bereikt.
+        """
+        now = time.monotonic()
+        remaining = _header_values(headers.get("X-RateLimit-Remaining"))
+        reset = _header_values(headers.get("X-RateLimit-Reset"))
+        retry_after = _retry_after_seconds(headers.get("Retry-After"))
+
+        block = None
+        for i, left in enumerate(remaining):
+            if left >= 1 or i >= len(reset):
+                continue
+            # GitHub geeft een Unix-tijdstip, Brave het aantal seconden tot de reset
+            seconds = reset[i] - time.time() if reset[i] > 1e9 else reset[i]
+            block = max(block or 0.0, seconds)
+
+        limited = status_code == 429 or (status_code == 403 and (retry_after is not None or block is not None))
+        if retry_after is not None and (limited or block is not None):
+            block = max(block or 0.0, retry_after)
+        if limited and block is None:
+            block = self.default_backoff
+
+        with self._lock:
+            self._refill(now)
+            if remaining:
+                # Nooit meer tokens aannemen dan de upstream nog toestaat
+                self.tokens = min(self.tokens, min(remaining))
+            if block is not None:
+                self.blocked_until = max(self.blocked_until, now + block)
+        if limited:
+            RATE_LIMIT_EVENTS.inc(upstream=self.name, outcome="limited")
+        return limited
+
+    def stats(self):
+        """Geef statistieken voor de statusroute van de server."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacity": self.capacity,
+                "rate_per_second": self.rate,
+                "blocked_for": round(max(self.blocked_until - now, 0.0), 1),
+                "shed": self.shed
+            }
+
+class RateLimiter:
+    """Verzameling van token buckets per upstream en credential."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, upstream, credential=None, per_minute=60, burst=None):
+        """Geef de bucket voor deze upstream en credential, en maak deze zo nodig aan."""
+        # Bewaar nooit de credential zelf, alleen een korte vingerafdruk
+        credential_id = hashlib.sha256(credential.encode()).hexdigest()[:8] if credential else "anoniem"
+        key = (upstream, credential_id)
+        # Replica's van dezelfde server, en de worker-processen van elke replica, delen het quotum van de upstream-API
+        per_minute = per_minute / (REPLICAS * worker_processes())
+        with self._lock:
+            if key not in self._buckets:
+                # Zonder opgegeven burst mag een tiende van het minuutbudget direct achter elkaar
+                capacity = burst or max(per_minute / 10.0, 1.0)
+                self._buckets[key] = TokenBucket(upstream, per_minute / 60.0, capacity=capacity)
+            return self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {f"{upstream}:{credential_id}": bucket.stats()
+                    for (upstream, credential_id), bucket in self._buckets.items()}
+
+def limited_response(cache, key, bucket):
+    """
+    Antwoord (body, status, headers) wanneer het upstream-budget op is.
+
+    Geeft een verouderd resultaat uit de cache terug (gemarkeerd met "stale"),
+    of een 429 met Retry-After als er niets in de cache staat.
+    """
+    stale = cache.get_stale(key)
+    if stale is not None:
+        RATE_LIMIT_EVENTS.inc(upstream=bucket.name, outcome="stale")
+        return {**stale, "stale": True}, 200, {"Warning": '110 - "Response is Stale"'}
+
+    retry_after = max(1, math.ceil(bucket.retry_after()))
+    return {
+        "error": "Upstream rate limit reached",
+        "retry_after": retry_after
+    }, 429, {"Retry-After": str(retry_after)}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+MCP-Server Register
+
+Gedeeld register van draaiende MCP-servers, opgeslagen in een SQLite-bestand.
+De hoofdapplicatie (ook met meerdere workers) en manage_mcp_servers.py gebruiken
+hetzelfde register, zodat iedereen dezelfde servers ziet en een server niet
+dubbel wordt gestart.
+
+Per server worden PID, poort, status (starting, running, stopping of crashed),
+de server waarmee het proces draait (gunicorn, waitress of flask) en gezondheid
+(laatste controle en latency) bijgehouden. Leesacties op het hete
+pad (zoals running()) gebruiken een korte in-memory momentopname in plaats van
+bij elk verzoek het bestand te lezen.
+
+Configuratie via omgevingsvariabelen:
+- MCP_REGISTRY_DB: pad naar het registerbestand (standaard .mcp_registry.db in de projectmap)
+- MCP_REGISTRY_CACHE_TTL: geldigheid van de momentopname in seconden (standaard 1.0)
+"""
+
+import os
+import time
+import signal
+import sqlite3
+import threading
+import subprocess
+from pathlib import Path
+
+REGISTRY_DB = os.getenv("MCP_REGISTRY_DB", str(Path(__file__).resolve().parent / ".mcp_registry.db"))
+REGISTRY_CACHE_TTL = float(os.getenv("MCP_REGISTRY_CACHE_TTL", "1.0"))
+
+# Een start of stop die niet binnen deze tijd is afgerond, vervalt
+STALE_CLAIM_SECONDS = 30
+
+COLUMNS = ("name", "pid", "port", "status", "healthy", "latency_ms", "checked_at", "started_at", "server")
+
+def pid_alive(pid):
+    """Controleer of een proces met dit PID nog bestaat (zombies tellen als gestopt)."""
+    if not pid:
+        return False
+    if os.name == 'nt':
+        try:
+            cmd = f'tasklist /FI "PID eq {pid}" /NH'
+            output = subprocess.check_output(cmd, shell=True).decode()
+            return str(pid) in output
+        except Exception:
+            return False
+    try:
+        os.kill(pid, 0)  # Signaal 0 test of proces bestaat
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # Een beëindigd maar nog niet opgeruimd proces (zombie) draait niet meer
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+def terminate_pid(pid, timeout=5):
+    """
+    Beëindig een proces dat niet (per se) door dit proces is gestart.
+
+    Stuurt eerst een nette stop (SIGTERM) en wacht tot het proces weg is; na de
+    timeout wordt het proces geforceerd gestopt. Geeft True terug als het proces
+    niet meer draait.
+    """
+    if not pid_alive(pid):
+        return True
+    if os.name == 'nt':
+        subprocess.run(["taskkill", "/F", "/PID", str(pid)], check=False)
+    else:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return True
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if not pid_alive(pid):
+            return True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    if os.name != 'nt':
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.1)
+    return not pid_alive(pid)
+
+class ServerRegistry:
+    """Procesoverschrijdend register van MCP-servers op basis van SQLite."""
+
+    def __init__(self, path=REGISTRY_DB, cache_ttl=REGISTRY_CACHE_TTL):
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self._local = threading.local()
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS servers ("
+                "name TEXT PRIMARY KEY, pid INTEGER, port INTEGER, "
+                "status TEXT NOT NULL, healthy INTEGER, latency_ms REAL, "
+                "checked_at REAL, started_at REAL, server TEXT)"
+            )
+            # Registers van een eerdere versie hebben nog geen kolom 'server'
+            if "server" not in {row[1] for row in conn.execute("PRAGMA table_info(servers)")}:
+                conn.execute("ALTER TABLE servers ADD COLUMN server TEXT")
+
+    def _connect(self):
+        # Eén verbinding per thread; sqlite3-verbindingen zijn niet thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def claim(self, name, port):
+        """
+        Reserveer een server voor het starten.
+
+        Geeft True terug als de aanroeper de server mag starten, of False als
+        een ander proces deze al draait of aan het starten is.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT pid, status, started_at FROM servers WHERE name = ?", (name,)
+            ).fetchone()
+            if row is not None:
+                pid, status, started_at = row
+                # Een lopende start of stop van een ander proces gaat voor
+                if status in ("starting", "stopping") and now - (started_at or 0) < STALE_CLAIM_SECONDS:
+                    conn.execute("ROLLBACK")
+                    return False
+                if status != "starting" and pid_alive(pid):
+                    conn.execute("ROLLBACK")
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO servers (name, pid, port, status, healthy, latency_ms, checked_at, started_at) "
+                "VALUES (?, NULL, ?, 'starting', NULL, NULL, NULL, ?)",
+                (name, port, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._invalidate()
+        return True
+
+    def register(self, name, pid, port, status="running", server=None):
+        """
+        Leg vast dat een server met dit PID op deze poort draait.
+
+        server is de server waarmee het proces draait ('gunicorn', 'waitress' of
+        'flask', zie mcp_serve.serve_mode), of None als dat onbekend is.
+        """
+        self._connect().execute(
+            "INSERT OR REPLACE INTO servers "
+            "(name, pid, port, status, healthy, latency_ms, checked_at, started_at, server) "
+            "VALUES (?, ?, ?, ?, NULL, NULL, NULL, ?, ?)",
+            (name, pid, port, status, time.time(), server)
+        )
+        self._invalidate()
+
+    def remove(self, name, status=None):
+        """
+        Verwijder een server uit het register.
+
+        Met status alleen als de server nog die status heeft, zodat een stopper
+        niet de registratie van een inmiddels opnieuw gestarte replica wist.
+        """
+        if status is None:
+            self._connect().execute("DELETE FROM servers WHERE name = ?", (name,))
+        else:
+            self._connect().execute("DELETE FROM servers WHERE name = ? AND status = ?", (name, status))
+        self._invalidate()
+
+    def set_status(self, name, status, expected=None):
+        """
+        Wijzig de status van een server (bijvoorbeeld 'running' of 'crashed').
+
+        Met expected alleen als de huidige status die waarde heeft; geeft True
+        terug als de status is gewijzigd.
+        """
+        if expected is None:
+            cursor = self._connect().execute("UPDATE servers SET status = ? WHERE name = ?", (status, name))
+        else:
+            cursor = self._connect().execute(
+                "UPDATE servers SET status = ? WHERE name = ? AND status = ?", (status, name, expected)
+            )
+        self._invalidate()
+        return cursor.rowcount > 0
+
+    def mark_stopping(self, name):
+        """
+        Leg vast dat een server wordt gestopt, vóórdat het proces een signaal krijgt.
+
+        De gezondheidsmonitor ziet de server dan niet als gecrasht, en een claim
+        wordt geweigerd tot de stop is afgerond (of vervalt).
+        """
+        self._connect().execute(
+            "UPDATE servers SET status = 'stopping', started_at = ? WHERE name = ?", (time.time(), name)
+        )
+        self._invalidate()
+
+    def update_health(self, name, healthy, latency_ms=None):
+        """Sla het resultaat van een gezondheidscontrole op."""
+        self._connect().execute(
+            "UPDATE servers SET healthy = ?, latency_ms = ?, checked_at = ? WHERE name = ?",
+            (int(bool(healthy)), latency_ms, time.time(), name)
+        )
+        self._invalidate()
+
+    def all(self, fresh=False):
+        """Geef alle geregistreerde servers terug als dict naam -> gegevens."""
+        with self._lock:
+            if not fresh and self._snapshot is not None and time.monotonic() - self._snapshot_at < self.cache_ttl:
+                return self._snapshot
+        rows = self._connect().execute(f"SELECT {', '.join(COLUMNS)} FROM servers").fetchall()
+        snapshot = {row[0]: dict(zip(COLUMNS, row)) for row in rows}
+        with self._lock:
+            self._snapshot = snapshot
+            self._snapshot_at = time.monotonic()
+        return snapshot
+
+    def get(self, name, fresh=False):
+        """Geef de gegevens van één server terug, of None."""
+        return self.all(fresh=fresh).get(name)
+
+    def running(self):
+        """Namen van servers die volgens het register draaien (goedkoop, voor het hete pad)."""
+        return [name for name, entry in self.all().items() if entry["status"] == "running"]
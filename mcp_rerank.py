@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+MCP Context-samenstelling
+
+Stelt de context voor het LLM samen uit alle resultaten van alle MCP-tools. De
+resultaten (passages) worden ontdubbeld op URL, met BM25 gerangschikt tegen de
+prompt en in volgorde van relevantie in een tokenbudget gepakt. Zo bevat de
+context per prompttoken zo veel mogelijk relevante informatie, wat de latentie
+en kosten van het LLM beperkt.
+
+Het scoren is gevectoriseerd met NumPy (één matrix voor alle passages en
+zoektermen); zonder numpy wordt een pure-Python implementatie met dezelfde
+uitkomst gebruikt. Het aantal tokens wordt geschat op vier tekens per token.
+
+Configuratie via omgevingsvariabelen:
+- MCP_CONTEXT_TOKENS: tokenbudget voor de context van de MCP-tools (standaard 800)
+- MCP_CONTEXT_MAX_RESULTS: maximaal aantal passages in de context (standaard 8)
+"""
+
+import os
+import re
+import math
+import unicodedata
+from urllib.parse import urlsplit
+
+# numpy is optioneel; zonder numpy wordt er in pure Python gescoord
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mcp_metrics import Histogram
+
+CONTEXT_TOKENS = int(os.getenv("MCP_CONTEXT_TOKENS", "800"))
+CONTEXT_MAX_RESULTS = int(os.getenv("MCP_CONTEXT_MAX_RESULTS", "8"))
+
+# Standaardparameters van BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+CHARS_PER_TOKEN = 4
+
+CONTEXT_SIZE = Histogram(
+    "mcp_context_tokens", "Geschat aantal tokens in de samengestelde MCP-context",
+    buckets=(50, 100, 200, 400, 800, 1600, 3200)
+)
+
+def tokenize(text):
+    """Splits tekst in kleine letters zonder accenten."""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"\w+", text)
+
+def estimate_tokens(text):
+    """Schat het aantal LLM-tokens van een tekst."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+def passage(tool, url, title, snippet, context, weight=1.0):
+    """
+    Maak een passage voor de contextsamenstelling.
+
+    title en snippet worden gebruikt voor het rangschikken, context is de regel
+    die in de prompt terechtkomt. De score wordt vermenigvuldigd met weight.
+    """
+    return {
+        "tool": tool, "url": url or "", "title": title or "", "snippet": snippet or "",
+        "context": context, "weight": weight
+    }
+
+def _url_key(url):
+    parts = urlsplit(url.strip().lower())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    return host + parts.path.rstrip("/")
+
+def dedupe(passages):
+    """Verwijder passages met dezelfde URL; de eerste (best gerangschikte door de tool) blijft."""
+    seen = set()
+    unique = []
+    for item in passages:
+        key = _url_key(item["url"]) if item["url"] else None
+        if key:
+            if key in seen:
+                continue
+            seen.add(key)
+        unique.append(item)
+    return unique
+
+def _bm25_numpy(terms, documents, k1, b):
+    vocabulary = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float64)
+    lengths = np.empty(len(documents), dtype=np.float64)
+    for row, document in enumerate(documents):
+        lengths[row] = len(document)
+        for token in document:
+            column = vocabulary.get(token)
+            if column is not None:
+                tf[row, column] += 1
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None])) @ idf
+
+def _bm25_python(terms, documents, k1, b):
+    counts = [{term: document.count(term) for term in terms} for document in documents]
+    idf = {}
+    for term in terms:
+        df = sum(1 for count in counts if count[term])
+        idf[term] = math.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    average = max(sum(len(document) for document in documents) / len(documents), 1.0)
+    scores = []
+    for document, count in zip(documents, counts):
+        norm = k1 * (1 - b + b * len(document) / average)
+        scores.append(sum(
+            idf[term] * count[term] * (k1 + 1) / (count[term] + norm)
+            for term in terms
+        ))
+    return scores
+
+def bm25_scores(query, texts, k1=BM25_K1, b=BM25_B):
+    """Geef de BM25-score van elke tekst ten opzichte van de zoekvraag."""
+    if not texts:
+        return []
+    terms = list(dict.fromkeys(tokenize(query)))
+    documents = [tokenize(text) for text in texts]
+    if not terms:
+        return [0.0] * len(texts)
+    if np is not None:
+        return _bm25_numpy(terms, documents, k1, b).tolist()
+    return _bm25_python(terms, documents, k1, b)
+
+def rank(query, passages):
+    """Sorteer passages op relevantie; bij gelijke score blijft de volgorde van de tools behouden."""
+    scores = bm25_scores(query, [f"{item['title']} {item['snippet']}" for item in passages])
+    scores = [score * item.get("weight", 1.0) for score, item in zip(scores, passages)]
+    order = sorted(range(len(passages)), key=lambda i: -scores[i])
+    return [(passages[i], scores[i]) for i in order]
+
+def assemble_context(query, passages, token_budget=None, max_results=None):
+    """
+    Stel de context samen: ontdubbelen, rangschikken en inpakken in het tokenbudget.
+
+    Passages die niet meer passen worden overgeslagen, zodat een kortere maar
+    minder relevante passage de resterende ruimte nog kan vullen. Passages zonder
+    enige overeenkomst met de prompt vallen af, tenzij geen enkele passage
+    overeenkomt (bijvoorbeeld bij een prompt in een andere taal dan de resultaten).
+    Geeft de gekozen passages in volgorde van relevantie terug.
+    """
+    token_budget = CONTEXT_TOKENS if token_budget is None else token_budget
+    max_results = CONTEXT_MAX_RESULTS if max_results is None else max_results
+
+    ranked = rank(query, dedupe(passages))
+    relevant_only = bool(ranked) and ranked[0][1] > 0
+
+    selected = []
+    used = 0
+    for item, score in ranked:
+        if len(selected) >= max_results or (relevant_only and score <= 0):
+            break
+        cost = estimate_tokens(item["context"])
+        if used + cost > token_budget:
+            continue
+        selected.append(dict(item, score=round(score, 3)))
+        used += cost
+    CONTEXT_SIZE.observe(used)
+    return selected
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Semantische cache
+
+Cache voor bijna-identieke prompts. Waar de antwoordcache (mcp_llm_cache.py)
+alleen exact dezelfde prompt herkent, vergelijkt deze cache prompts op betekenis:
+elke prompt wordt omgezet in een vector, en een nieuwe prompt die sterk genoeg
+lijkt op een eerdere (cosinusgelijkenis boven de drempel) krijgt het bewaarde
+resultaat terug. Zo levert "what is flask mcp" hetzelfde antwoord als
+"Explain Flask-MCP?". Prompts met andere getallen of versienummers ("python
+3.11" tegenover "python 3.12") zijn nooit een hit.
+
+Vectoren komen van een lokaal embeddingmodel (sentence-transformers, optioneel)
+of van een gehashte n-gram vectorizer zonder extra afhankelijkheden (woorden
+zonder vraagwoorden, woordparen voor de volgorde en letter-trigrammen). Alle
+vectoren staan in één genormaliseerde NumPy-matrix, zodat zoeken naar de
+dichtstbijzijnde buur één matrix-vectorvermenigvuldiging is. De cache is
+begrensd (minst recent gebruikte items worden vervangen), items verlopen na een
+TTL en de inhoud wordt periodiek en bij afsluiten in een .npz-bestand bewaard.
+
+Vereist numpy; zonder numpy is de semantische cache uitgeschakeld.
+
+Configuratie via omgevingsvariabelen:
+- MCP_SEMANTIC_CACHE: zet de cache aan met 1 (standaard uit)
+- MCP_SEMANTIC_THRESHOLD: minimale cosinusgelijkenis voor een hit (standaard 0.85)
+- MCP_SEMANTIC_CACHE_SIZE: maximaal aantal prompts per cache (standaard 2000)
+- MCP_SEMANTIC_CACHE_TTL: geldigheid van een item in seconden (standaard 3600)
+- MCP_SEMANTIC_CACHE_DIR: map voor de .npz-bestanden (standaard de projectmap; leeg = niet bewaren)
+- MCP_EMBEDDING_MODEL: naam van een sentence-transformers model (optioneel, anders n-gram vectorizer)
+- MCP_SEMANTIC_DIM: dimensie van de n-gram vectoren (standaard 1024)
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+
+# numpy is alleen nodig voor de semantische cache
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mcp_metrics import Counter
+
+SEMANTIC_CACHE_ENABLED = os.getenv("MCP_SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_THRESHOLD = float(os.getenv("MCP_SEMANTIC_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("MCP_SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_TTL = int(os.getenv("MCP_SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_DIR = os.getenv("MCP_SEMANTIC_CACHE_DIR", str(Path(__file__).resolve().parent)) or None
+EMBEDDING_MODEL = os.getenv("MCP_EMBEDDING_MODEL") or None
+SEMANTIC_DIM = int(os.getenv("MCP_SEMANTIC_DIM", "1024"))
+
+# Na zoveel nieuwe items wordt de cache tussentijds naar schijf geschreven
+SAVE_EVERY = 50
+
+SEMANTIC_LOOKUPS = Counter(
+    "mcp_semantic_cache_total", "Opvragingen van de semantische cache",
+    ("cache", "result")
+)
+
+# Vraagwoorden en opvulling die de betekenis van een vraag niet veranderen
+# ("what is flask mcp" en "explain Flask MCP" gaan allebei over "flask mcp").
+# Ontkenningen als "not" en "niet" staan hier bewust niet in.
+FILLER_WORDS = frozenset("""
+a an and about are can could describe do does explain for give how i in is it me of on please show
+tell that the this to what whats which why with you
+aan als bij de een en geef hoe ik in is je kun kunt leg me mij naar op over te uit uitleg van
+vertel voor wat welke
+""".split())
+
+# Gewicht van elke groep kenmerken; de kwadraten tellen op tot 1, zodat dezelfde
+# tekst gelijkenis 1 heeft. Woordparen maken de volgorde van belang: "celsius to
+# fahrenheit" en "fahrenheit to celsius" delen alle woorden maar geen woordpaar.
+FEATURE_WEIGHTS = {"word": 0.5, "bigram": 0.6, "trigram": 0.62}
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+def number_key(text):
+    """
+    Getallen en versienummers in een tekst, als sleutel.
+
+    Prompts met andere getallen ("python 3.11" tegenover "python 3.12") lijken
+    als vector sterk op elkaar maar vragen om een ander antwoord; de cache geeft
+    alleen een hit bij dezelfde getallen.
+    """
+    numbers = sorted(set(_NUMBER.findall(str(text).replace(",", "."))))
+    if not numbers:
+        return 0
+    return int.from_bytes(hashlib.blake2b(" ".join(numbers).encode("utf-8"), digest_size=7).digest(), "little")
+
+class HashingVectorizer:
+    """Zet tekst om in een vector van gehashte woorden, woordparen en letter-trigrammen."""
+
+    def __init__(self, dim=SEMANTIC_DIM):
+        self.dim = dim
+        # De naam hoort bij de kenmerken; een opgeslagen cache met andere kenmerken wordt genegeerd
+        self.name = f"hashing-v2-{dim}"
+
+    def _features(self, text):
+        words = _normalize(text).split()
+        # Zonder inhoudswoorden (bijvoorbeeld "what is it") de hele vraag gebruiken
+        words = [word for word in words if word not in FILLER_WORDS] or words
+        trigrams = []
+        for word in words:
+            padded = f" {word} "
+            trigrams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return {
+            "word": words,
+            "bigram": [f"{first} {second}" for first, second in zip(words, words[1:])],
+            "trigram": trigrams
+        }
+
+    def encode(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for group, features in self._features(text).items():
+            part = np.zeros(self.dim, dtype=np.float32)
+            for feature in features:
+                digest = hashlib.blake2b(f"{group}:{feature}".encode("utf-8"), digest_size=8).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                part[index] += sign
+            norm = np.linalg.norm(part)
+            if norm:
+                vector += FEATURE_WEIGHTS[group] * part / norm
+        return vector
+
+class SentenceTransformerEmbedder:
+    """Lokaal embeddingmodel via sentence-transformers (op de CPU)."""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def encode(self, text):
+        return np.asarray(self.model.encode(_normalize(text)), dtype=np.float32)
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """Het gedeelde embeddingmodel; valt terug op de n-gram vectorizer."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            if EMBEDDING_MODEL:
+                try:
+                    _embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+                except Exception as e:
+                    print(f"Embeddingmodel '{EMBEDDING_MODEL}' kon niet worden geladen ({e}); n-gram vectorizer wordt gebruikt.")
+            if _embedder is None:
+                _embedder = HashingVectorizer()
+        return _embedder
+
+class SemanticCache:
+    """Begrensde cache op basis van vectorgelijkenis, met TTL, LRU-vervanging en opslag op schijf."""
+
+    def __init__(self, name, enabled=SEMANTIC_CACHE_ENABLED, threshold=SEMANTIC_THRESHOLD,
+                 max_entries=SEMANTIC_CACHE_SIZE, ttl=SEMANTIC_CACHE_TTL, directory=SEMANTIC_CACHE_DIR):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled and np is not None
+        if enabled and np is None:
+            print("numpy is niet geïnstalleerd; de semantische cache is uitgeschakeld. Installeer met: pip install numpy")
+        self.path = Path(directory) / f".mcp_semantic_{name}.npz" if directory else None
+        self._lock = threading.Lock()
+        self._dirty = 0
+        if not self.enabled:
+            return
+
+        self.embedder = get_embedder()
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._numbers = np.zeros(max_entries, dtype=np.int64)
+        self._expires = np.zeros(max_entries, dtype=np.float64)  # 0 = leeg
+        self._used = np.zeros(max_entries, dtype=np.float64)
+        self._values = [None] * max_entries
+        self._load()
+        if self.path:
+            atexit.register(self.save)
+
+    @staticmethod
+    def _scope_id(scope):
+        return int.from_bytes(hashlib.blake2b(str(scope).encode("utf-8"), digest_size=7).digest(), "little")
+
+    def _embed(self, text):
+        vector = self.embedder.encode(text)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, text, scope=""):
+        """Geef het resultaat van de meest gelijkende eerdere prompt terug, of None."""
+        if not self.enabled:
+            return None
+        vector = self._embed(text)
+        numbers = number_key(text)
+        now = time.time()
+        with self._lock:
+            valid = (self._expires > now) & (self._scopes == self._scope_id(scope)) & (self._numbers == numbers)
+            if not valid.any():
+                SEMANTIC_LOOKUPS.inc(cache=self.name, result="miss")
+                return None
+            scores = self._vectors @ vector
+            scores[~valid] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                SEMANTIC_LOOKUPS.inc(cache=self.name, result="miss")
+                return None
+            self._used[best] = now
+            SEMANTIC_LOOKUPS.inc(cache=self.name, result="hit")
+            return self._values[best]
+
+    def add(self, text, value, scope=""):
+        """Bewaar een resultaat voor deze prompt; vervangt zo nodig het minst recent gebruikte item."""
+        if not self.enabled:
+            return
+        vector = self._embed(text)
+        now = time.time()
+        with self._lock:
+            # Een leeg of verlopen slot heeft voorrang, anders het minst recent gebruikte
+            free = np.flatnonzero(self._expires <= now)
+            slot = int(free[0]) if free.size else int(np.argmin(self._used))
+            self._vectors[slot] = vector
+            self._scopes[slot] = self._scope_id(scope)
+            self._numbers[slot] = number_key(text)
+            self._expires[slot] = now + self.ttl
+            self._used[slot] = now
+            self._values[slot] = value
+            self._dirty += 1
+            save = self._dirty >= SAVE_EVERY
+        if save:
+            self.save()
+
+    def save(self):
+        """Schrijf de cache naar het .npz-bestand (indien ingesteld)."""
+        if not self.enabled or not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            used = np.flatnonzero(self._expires > time.time())
+            meta = json.dumps({
+                "embedder": self.embedder.name,
+                "values": [self._values[i] for i in used]
+            }, ensure_ascii=False)
+            arrays = {
+                "vectors": self._vectors[used],
+                "scopes": self._scopes[used],
+                "numbers": self._numbers[used],
+                "expires": self._expires[used],
+                "used": self._used[used],
+                "meta": np.frombuffer(meta.encode("utf-8"), dtype=np.uint8)
+            }
+            self._dirty = 0
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Fout bij het opslaan van de semantische cache {self.path}: {e}")
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                if meta["embedder"] != self.embedder.name:
+                    print(f"Semantische cache {self.path} hoort bij een ander embeddingmodel en wordt genegeerd.")
+                    return
+                # Bij een kleinere cache de meest recent gebruikte items houden
+                order = np.argsort(-data["used"])[:self.max_entries]
+                count = len(order)
+                self._vectors[:count] = data["vectors"][order]
+                self._scopes[:count] = data["scopes"][order]
+                self._numbers[:count] = data["numbers"][order]
+                self._expires[:count] = data["expires"][order]
+                self._used[:count] = data["used"][order]
+                for slot, index in enumerate(order):
+                    self._values[slot] = meta["values"][int(index)]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Fout bij het laden van de semantische cache {self.path}: {e}")
+
+    def stats(self):
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            return {
+                "entries": int((self._expires > time.time()).sum()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "embedder": self.embedder.name
+            }
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Productie-serveermodus
+
+Start een Flask-app (de hoofdapplicatie of een MCP-server) met een productieserver
+in plaats van de ontwikkelserver van Flask. Op Linux/macOS wordt gunicorn gebruikt
+met meerdere workers en threads per worker; op Windows (of zonder gunicorn) wordt
+teruggevallen op waitress met een thread pool.
+
+De productiemodus wordt gekozen met de vlag '--production' of de
+omgevingsvariabele MCP_SERVE_MODE=production.
+
+Configuratie via omgevingsvariabelen:
+- MCP_WORKERS: aantal worker-processen (standaard: aantal CPU's, maximaal 4)
+- MCP_THREADS: aantal threads per worker (standaard 8)
+- MCP_KEEPALIVE: keep-alive tijd voor verbindingen in seconden (standaard 5)
+- MCP_GRACEFUL_TIMEOUT: tijd voor lopende verzoeken bij herstart/stop (standaard 30)
+- MCP_MAX_REQUESTS: herstart een worker na dit aantal verzoeken (standaard 0 = nooit)
+
+Een gunicorn-server herlaadt de workers zonder onderbreking bij een SIGHUP:
+    kill -HUP <pid van de hoofdprocess>
+"""
+
+import os
+import sys
+
+def production_mode():
+    """Geef aan of de productiemodus is gevraagd via vlag of omgevingsvariabele."""
+    return "--production" in sys.argv or os.getenv("MCP_SERVE_MODE", "").lower() == "production"
+
+def serve_settings():
+    """Lees de serverinstellingen uit de omgeving."""
+    return {
+        "workers": int(os.getenv("MCP_WORKERS", str(min(os.cpu_count() or 1, 4)))),
+        "threads": int(os.getenv("MCP_THREADS", "8")),
+        "keepalive": int(os.getenv("MCP_KEEPALIVE", "5")),
+        "graceful_timeout": int(os.getenv("MCP_GRACEFUL_TIMEOUT", "30")),
+        "max_requests": int(os.getenv("MCP_MAX_REQUESTS", "0"))
+    }
+
+def _gunicorn_available():
+    if os.name == "nt":
+        return False
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def serve_mode(env=None):
+    """
+    Server waarmee een proces draait: 'gunicorn', 'waitress' of 'flask' (de ontwikkelserver).
+
+    Zonder env geldt dit proces; met env een MCP-server die met die omgeving
+    wordt gestart (de productiemodus komt dan uit MCP_SERVE_MODE).
+    """
+    if env is None:
+        production = production_mode()
+    else:
+        production = env.get("MCP_SERVE_MODE", "").lower() == "production"
+    if not production:
+        return "flask"
+    return "gunicorn" if _gunicorn_available() else "waitress"
+
+def worker_processes():
+    """
+    Aantal worker-processen dat run_production voor dit proces start.
+
+    Alleen gunicorn start meerdere processen; in de ontwikkelmodus en met
+    waitress is het er één. Processen delen geen geheugen, dus elk proces
+    neemt een evenredig deel van gedeelde budgetten (zie mcp_ratelimit.py).
+    """
+    if serve_mode() != "gunicorn":
+        return 1
+    return max(serve_settings()["workers"], 1)
+
+def run_gunicorn(app, host, port, settings):
+    """Start de app met gunicorn (gthread workers)."""
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": settings["workers"],
+        "threads": settings["threads"],
+        "worker_class": "gthread",
+        "keepalive": settings["keepalive"],
+        "graceful_timeout": settings["graceful_timeout"],
+        "max_requests": settings["max_requests"],
+        "max_requests_jitter": settings["max_requests"] // 10,
+    }
+    StandaloneApplication(app, options).run()
+
+def run_waitress(app, host, port, settings):
+    """Start de app met waitress (één proces, meerdere threads)."""
+    from waitress import serve
+
+    # waitress kent geen worker-processen; gebruik het totaal aantal threads
+    threads = settings["workers"] * settings["threads"]
+    serve(app, host=host, port=port, threads=threads, channel_timeout=settings["graceful_timeout"])
+
+def run_production(app, host, port, name):
+    """Start de opgegeven app met de beschikbare productieserver."""
+    settings = serve_settings()
+
+    if _gunicorn_available():
+        print(f"{name} wordt gestart met gunicorn op {host}:{port} "
+              f"({settings['workers']} workers x {settings['threads']} threads)")
+        run_gunicorn(app, host, port, settings)
+        return
+
+    try:
+        import waitress  # noqa: F401
+    except ImportError:
+        print("ERROR: Geen productieserver geïnstalleerd.")
+        print("\nInstalleer met:")
+        print("    pip install gunicorn    (Linux/macOS)")
+        print("    pip install waitress    (Windows)")
+        sys.exit(1)
+
+    print(f"{name} wordt gestart met waitress op {host}:{port} "
+          f"({settings['workers'] * settings['threads']} threads)")
+    run_waitress(app, host, port, settings)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+MCP Gesprekssessies
+
+Server-side gesprekken voor de webinterface. Per gesprek (cookie mcp_sessie)
+worden de eerdere vragen en antwoorden en de toolresultaten (passages) bewaard.
+Een vervolgvraag over hetzelfde onderwerp hergebruikt de bewaarde resultaten en
+bevraagt de MCP-tools alleen voor termen die daar nog niet in voorkomen (de
+delta), gevolgd door het onderwerp van het gesprek zodat de zoekopdracht
+zinvol blijft. Bevat de vraag geen nieuwe termen, dan worden de tools niet
+bevraagd. Een langere vraag zonder enige overeenkomst met het gesprek is een
+nieuw onderwerp: dan wordt alles opnieuw opgehaald.
+
+Oude beurten worden samengevat: de laatste MCP_SESSION_TURNS beurten gaan
+letterlijk mee in de prompt, oudere als één regel per beurt (de vraag en het
+begin van het antwoord) binnen MCP_SESSION_SUMMARY_TOKENS. Zo groeien de prompt
+en de latentie van het LLM niet mee met de lengte van het gesprek.
+
+De opslag is begrensd: hooguit MCP_SESSION_MAX gesprekken (de minst recent
+gebruikte vallen eerst weg) en een gesprek vervalt na MCP_SESSION_TTL seconden
+zonder activiteit. Met een SQLite-bestand delen alle workers de gesprekken; het
+bestand wordt net als de caches periodiek opgeruimd.
+Twee gelijktijdige vragen in hetzelfde gesprek worden niet op elkaar
+afgestemd; de laatst opgeslagen beurt wint.
+
+Configuratie via omgevingsvariabelen:
+- MCP_SESSIONS: 1 om gesprekken te gebruiken (standaard 0; elke prompt staat dan los)
+- MCP_SESSION_MAX: maximaal aantal bewaarde gesprekken (standaard 500)
+- MCP_SESSION_TTL: seconden zonder activiteit waarna een gesprek vervalt (standaard 3600)
+- MCP_SESSION_TURNS: aantal recente beurten dat letterlijk in de prompt komt (standaard 3)
+- MCP_SESSION_SUMMARY_TOKENS: tokenbudget voor de samenvatting van oudere beurten (standaard 300)
+- MCP_SESSION_PASSAGES: maximaal aantal bewaarde toolresultaten per gesprek (standaard 40)
+- MCP_SESSION_DB: pad naar het SQLite-bestand (standaard .mcp_sessions.db in de projectmap; leeg = alleen geheugen)
+"""
+
+import os
+import re
+import time
+import sqlite3
+import secrets
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+from mcp_cache import SQLiteBackend
+from mcp_metrics import Counter
+from mcp_rerank import dedupe, estimate_tokens, tokenize
+
+SESSIONS_ENABLED = os.getenv("MCP_SESSIONS", "0") == "1"
+SESSION_MAX = int(os.getenv("MCP_SESSION_MAX", "500"))
+SESSION_TTL = int(os.getenv("MCP_SESSION_TTL", "3600"))
+SESSION_TURNS = int(os.getenv("MCP_SESSION_TURNS", "3"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("MCP_SESSION_SUMMARY_TOKENS", "300"))
+SESSION_PASSAGES = int(os.getenv("MCP_SESSION_PASSAGES", "40"))
+SESSION_DB = os.getenv("MCP_SESSION_DB", str(Path(__file__).resolve().parent / ".mcp_sessions.db")) or None
+
+SESSION_COOKIE = "mcp_sessie"
+
+# Manieren waarop de context van een vraag in een gesprek tot stand komt
+REUSE = "hergebruik"
+DELTA = "delta"
+NEW = "nieuw"
+
+# Aantal termen van de eerste vraag dat het onderwerp van een gesprek vormt
+TOPIC_TERMS = 6
+# Vragen met hooguit zoveel termen ("en hoe installeer ik het?") horen bij het lopende onderwerp
+SHORT_FOLLOWUP = 2
+# Lengte van een eerder antwoord in de prompt (letterlijk) en in de samenvatting
+ANSWER_CHARS = 1200
+SUMMARY_ANSWER_CHARS = 160
+
+# Veelvoorkomende Nederlandse en Engelse woorden die niets over het onderwerp zeggen
+STOPWORDS = frozenset("""
+aan als bij dan dat de deze die dit door een en er het hoe hun ik in is je kan kun
+maar met mij na naar niet nog nu of om onder ook op over te tot uit van voor waar
+wat wel welke wie wij zijn zo zou meer andere anders graag leg uitleg geef vertel
+werkt werken zit zitten gaat gaan doe doet doen moet moeten wil kunnen heb hebben
+waarom wanneer hoeveel
+and are can could does for from has have how into its more not now that the then
+there these this what when where which who why will with would you your about also
+other please explain tell give doing work works get should
+""".split())
+
+SESSION_CONTEXT = Counter(
+    "mcp_session_context_total", "Hoe de context van een vraag in een gesprek tot stand kwam",
+    ("plan",)
+)
+
+_VALID_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+def new_session():
+    """Een leeg gesprek."""
+    return {"turns": [], "summary": [], "topic": [], "terms": [], "passages": []}
+
+def content_terms(text):
+    """Termen van een tekst die iets over het onderwerp zeggen, in volgorde en zonder dubbelen."""
+    terms = []
+    for term in tokenize(text):
+        if len(term) >= 3 and not term.isdigit() and term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+def _passage_terms(passages):
+    terms = set()
+    for item in passages:
+        terms.update(tokenize(f"{item['title']} {item['snippet']}"))
+    return terms
+
+def plan_context(session, question):
+    """
+    Bepaal hoe de context voor een vraag in dit gesprek tot stand komt.
+
+    Geeft (plan, zoekopdracht, rangschikking) terug: plan is REUSE, DELTA of
+    NEW; zoekopdracht is de tekst waarmee de MCP-tools bevraagd worden (None
+    bij REUSE) en rangschikking de tekst waartegen de passages gerangschikt
+    worden.
+    """
+    terms = content_terms(question)
+    if not session["topic"]:
+        return NEW, question, question
+    known = set(session["topic"]) | set(session["terms"]) | _passage_terms(session["passages"])
+    covered = [term for term in terms if term in known]
+    if len(terms) > SHORT_FOLLOWUP and not covered:
+        return NEW, question, question
+
+    topic = " ".join(session["topic"])
+    ranking = f"{topic} {question}"
+    new_terms = [term for term in terms if term not in known]
+    if not new_terms and session["passages"]:
+        return REUSE, None, ranking
+    # Nieuwe termen eerst: tools kappen de zoekopdracht af op een aantal woorden (zie words in mcp_servers.toml)
+    delta = [term for term in new_terms or terms if term not in session["topic"]]
+    return DELTA, " ".join(delta + session["topic"]), ranking
+
+def update_context(session, plan, question, passages):
+    """Verwerk de vraag en de opgehaalde passages in het gesprek (nieuwste resultaten eerst)."""
+    terms = content_terms(question)
+    if plan == NEW:
+        session["topic"] = terms[:TOPIC_TERMS]
+        session["terms"] = []
+        session["passages"] = []
+    session["terms"] = (session["terms"] + [term for term in terms if term not in session["terms"]])[-100:]
+    session["passages"] = dedupe(list(passages) + session["passages"])[:SESSION_PASSAGES]
+    SESSION_CONTEXT.inc(plan=plan)
+
+def _shorten(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+def add_turn(session, question, answer):
+    """Voeg een beurt toe en vat beurten buiten de laatste MCP_SESSION_TURNS samen."""
+    session["turns"].append({"question": question, "answer": answer})
+    while len(session["turns"]) > SESSION_TURNS:
+        old = session["turns"].pop(0)
+        first = re.split(r"(?<=[.!?])\s", " ".join(str(old["answer"]).split()), maxsplit=1)[0]
+        session["summary"].append(f"{_shorten(old['question'], 120)} → {_shorten(first, SUMMARY_ANSWER_CHARS)}")
+    while session["summary"] and sum(estimate_tokens(line) for line in session["summary"]) > SESSION_SUMMARY_TOKENS:
+        session["summary"].pop(0)
+
+def history_prompt(session):
+    """Het eerdere verloop van het gesprek voor in de prompt, of een lege string."""
+    parts = []
+    if session["summary"]:
+        parts.append("Samenvatting van eerdere vragen:\n" + "\n".join(f"- {line}" for line in session["summary"]))
+    for turn in session["turns"]:
+        parts.append(f"Vraag: {turn['question']}\nAntwoord: {_shorten(turn['answer'], ANSWER_CHARS)}")
+    if not parts:
+        return ""
+    return "## Eerder in dit gesprek\n\n" + "\n\n".join(parts)
+
+def conversation_prompt(session, context, question):
+    """Volledige prompt: context van de tools, het eerdere gesprek en de nieuwe vraag."""
+    parts = [part for part in (context, history_prompt(session)) if part]
+    if not parts:
+        return question
+    return "\n\n".join(parts + [f"Vraag: {question}"])
+
+class SessionStore:
+    """Begrensde opslag van gesprekken met een TTL, in het geheugen of in een gedeeld SQLite-bestand."""
+
+    def __init__(self, enabled=SESSIONS_ENABLED, max_sessions=SESSION_MAX, ttl=SESSION_TTL, db_path=SESSION_DB):
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evicted = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.backend = None
+        if enabled and db_path:
+            try:
+                # Verlopen gesprekken zijn niet meer nodig; direct opruimen
+                self.backend = SQLiteBackend(db_path, max_entries=max_sessions, stale_ttl=0)
+            except sqlite3.Error as e:
+                print(f"Fout bij het openen van sessiebestand {db_path}: {e}. Gesprekken worden alleen in het geheugen bewaard.")
+
+    def load(self, session_id):
+        """
+        Geef (id, gesprek) terug voor het id uit de cookie.
+
+        Bij een ontbrekend, ongeldig of verlopen id komt er een nieuw gesprek
+        met een nieuw id.
+        """
+        if session_id and _VALID_ID.match(session_id):
+            session = self._get(session_id)
+            if session is not None:
+                return session_id, session
+        return secrets.token_urlsafe(24), new_session()
+
+    def _get(self, session_id):
+        now = time.time()
+        if self.backend:
+            # Altijd uit het bestand lezen, want een andere worker kan het gesprek hebben bijgewerkt
+            try:
+                stored = self.backend.get(f"sessie:{session_id}")
+            except sqlite3.Error as e:
+                print(f"Fout bij het lezen uit sessiebestand: {e}")
+                return None
+            return stored[0] if stored is not None and stored[1] > now else None
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return entry[1]
+
+    def save(self, session_id, session):
+        """Bewaar een gesprek; de TTL begint opnieuw."""
+        expires_at = time.time() + self.ttl
+        if self.backend:
+            # Het bestand ruimt verlopen en de minst recent gebruikte gesprekken periodiek op
+            try:
+                self.backend.set(f"sessie:{session_id}", session, expires_at)
+            except sqlite3.Error as e:
+                print(f"Fout bij het schrijven naar sessiebestand: {e}")
+            return
+        with self._lock:
+            self._entries[session_id] = (expires_at, session)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, session_id):
+        """Verwijder een gesprek (bijvoorbeeld bij 'Nieuw gesprek')."""
+        if self.backend:
+            try:
+                # Een verlopen item telt als ontbrekend en wordt bij de volgende opruiming verwijderd
+                self.backend.set(f"sessie:{session_id}", new_session(), 0)
+            except sqlite3.Error as e:
+                print(f"Fout bij het schrijven naar sessiebestand: {e}")
+            return
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self):
+        """Geef statistieken voor /status."""
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            return {
+                "enabled": True,
+                "shared": self.backend is not None,
+                "in_memory": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "ttl": self.ttl,
+                "evicted": self.evicted
+            }
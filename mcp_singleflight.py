@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+MCP Singleflight
+
+Samenvoegen van identieke gelijktijdige aanroepen. Wanneer meerdere verzoeken
+tegelijk dezelfde (genormaliseerde) zoekopdracht uitvoeren, doet alleen het
+eerste verzoek de echte aanroep; de andere wachten daarop en krijgen hetzelfde
+resultaat (of dezelfde fout). Dit scheelt upstream-aanroepen en quotum bij
+pieken rond één onderwerp.
+
+Wordt gebruikt in de MCP-servers (rond de upstream-aanroep naar Brave/GitHub)
+en in de MCP-client van de applicatie (rond de aanroep naar een MCP-server).
+Samenvoegen gebeurt per proces.
+"""
+
+import asyncio
+import threading
+from functools import partial
+
+from mcp_metrics import Counter
+
+COALESCED = Counter(
+    "mcp_singleflight_shared_total", "Aantal aanroepen dat een lopende identieke aanroep heeft gedeeld",
+    ("group",)
+)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Voegt gelijktijdige aanroepen met dezelfde sleutel samen (voor threads)."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Voer func() uit, of wacht op een lopende aanroep met dezelfde sleutel."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(group=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """Voegt gelijktijdige aanroepen met dezelfde sleutel samen (voor asyncio)."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, func):
+        """Wacht op coroutinefunctie func(), of op een lopende aanroep met dezelfde sleutel."""
+        task = self._calls.get(key)
+        if task is not None:
+            COALESCED.inc(group=self.name)
+        else:
+            # Een eigen taak: een geannuleerde aanroeper (bijvoorbeeld door de deadline
+            # van zijn fan-out) annuleert de gedeelde aanroep niet voor de anderen
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._finish, key))
+        # shield: alleen de wachtende aanroeper wordt geannuleerd, niet de taak
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Markeer als opgehaald; voorkomt een waarschuwing zonder wachtenden
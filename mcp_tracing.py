@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+MCP Tracing
+
+Lichtgewicht tracing per verzoek door de hele promptverwerking: index() →
+get_tool_context → elke MCP-aanroep → upstream API's → query_llm. De actieve span
+wordt via contextvars doorgegeven (ook naar de threads van de fan-out) en als
+W3C 'traceparent' header meegestuurd naar de MCP-servers, zodat hun spans bij
+dezelfde trace horen.
+
+Afgeronde spans worden bewaard in een begrensde buffer in het geheugen (voor de
+debugweergave op /debug/traces) en optioneel weggeschreven als JSONL-bestand.
+Wordt dat bestand groter dan MCP_TRACE_FILE_MAX_MB, dan wordt het hernoemd naar
+<bestand>.1 (een eerdere .1 vervalt) en begint een nieuw bestand.
+De velden volgen de namen van OpenTelemetry (traceId, spanId, parentSpanId,
+startTimeUnixNano, ...), zodat het bestand eenvoudig naar een OTLP-collector kan
+worden doorgezet.
+
+Configuratie via omgevingsvariabelen:
+- MCP_TRACE_FILE: pad naar een JSONL-bestand voor spans (optioneel; kan door app en servers gedeeld worden)
+- MCP_TRACE_FILE_MAX_MB: maximale grootte van het JSONL-bestand voordat het geroteerd wordt (standaard 50)
+- MCP_TRACE_BUFFER: aantal recente traces in het geheugen (standaard 200)
+- MCP_TRACE_SLOW_MS: drempel voor trage verzoeken in de debugweergave (standaard 1000)
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+TRACE_FILE = os.getenv("MCP_TRACE_FILE") or None
+TRACE_FILE_MAX_BYTES = int(float(os.getenv("MCP_TRACE_FILE_MAX_MB", "50")) * 1024 * 1024)
+TRACE_BUFFER = int(os.getenv("MCP_TRACE_BUFFER", "200"))
+TRACE_SLOW_MS = float(os.getenv("MCP_TRACE_SLOW_MS", "1000"))
+
+# Endpoints die niet getraced worden (home is de statusroute van de servers, die de
+# gezondheidsmonitor steeds opvraagt)
+UNTRACED_ENDPOINTS = {"metrics", "static", "debug_traces", "home"}
+
+_current_span = contextvars.ContextVar("mcp_current_span", default=None)
+
+def _new_id(length):
+    return os.urandom(length // 2).hex()
+
+class Span:
+    """Eén gemeten stap binnen een trace."""
+
+    def __init__(self, name, service, trace_id=None, parent_id=None, **attributes):
+        self.name = name
+        self.service = service
+        self.trace_id = trace_id or _new_id(32)
+        self.span_id = _new_id(16)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        """Voeg attributen toe aan de span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class SpanExporter:
+    """Bewaart afgeronde spans per trace in het geheugen en optioneel in een JSONL-bestand."""
+
+    def __init__(self, path=TRACE_FILE, max_traces=TRACE_BUFFER, max_bytes=TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self._traces = OrderedDict()  # trace_id -> lijst van span-dicts
+        self._recent = deque(maxlen=max_traces)  # afgeronde traces (root-spans)
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        data = span.to_dict()
+        with self._lock:
+            spans = self._traces.setdefault(span.trace_id, [])
+            spans.append(data)
+            self._traces.move_to_end(span.trace_id)
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+            if span.parent_id is None or data["attributes"].get("remote_parent"):
+                self._recent.append(data)
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                        size = f.tell()
+                    if self.max_bytes and size > self.max_bytes:
+                        self._rotate()
+                except OSError as e:
+                    print(f"Fout bij het schrijven van trace naar {self.path}: {e}")
+
+    def _rotate(self):
+        # Aanroeper moet de lock vasthouden. Processen die het bestand delen schrijven na
+        # os.replace vanzelf naar een nieuw bestand, omdat elke export het opnieuw opent
+        try:
+            os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            # Een ander proces heeft het bestand net geroteerd
+            pass
+
+    def recent(self, min_duration_ms=0.0, limit=50):
+        """Recente traces (root-spans), traagste eerst."""
+        with self._lock:
+            roots = [root for root in self._recent if root["durationMs"] >= min_duration_ms]
+        return sorted(roots, key=lambda root: root["durationMs"], reverse=True)[:limit]
+
+    def spans(self, trace_id):
+        """Alle spans van een trace, aangevuld met spans van andere processen uit het JSONL-bestand."""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        if self.path and os.path.exists(self.path):
+            known = {span["spanId"] for span in spans}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    for line in deque(f, maxlen=20000):
+                        if trace_id in line:
+                            span = json.loads(line)
+                            if span["traceId"] == trace_id and span["spanId"] not in known:
+                                spans.append(span)
+            except (OSError, ValueError) as e:
+                print(f"Fout bij het lezen van tracebestand {self.path}: {e}")
+        return sorted(spans, key=lambda span: span["startTimeUnixNano"])
+
+exporter = SpanExporter()
+
+def waterfall(trace_id):
+    """
+    Zet de spans van een trace om naar rijen voor een watervalweergave.
+
+    Elke rij bevat de span met diepte (nesting), en begin en breedte als
+    percentage van de totale duur van de trace.
+    """
+    spans = exporter.spans(trace_id)
+    if not spans:
+        return []
+    start = min(span["startTimeUnixNano"] for span in spans)
+    end = max(span["endTimeUnixNano"] or span["startTimeUnixNano"] for span in spans)
+    total = max(end - start, 1)
+    by_id = {span["spanId"]: span for span in spans}
+
+    def depth(span):
+        level = 0
+        while span.get("parentSpanId") in by_id and level < 50:
+            span = by_id[span["parentSpanId"]]
+            level += 1
+        return level
+
+    return [
+        {
+            **span,
+            "depth": depth(span),
+            "offset_pct": round((span["startTimeUnixNano"] - start) / total * 100, 2),
+            "width_pct": max(round(span["durationMs"] * 1e6 / total * 100, 2), 0.3),
+        }
+        for span in spans
+    ]
+
+def current_span():
+    """De actieve span in de huidige context, of None."""
+    return _current_span.get()
+
+@contextmanager
+def span(name, service=None, **attributes):
+    """Meet een codeblok als child-span van de actieve span (of als nieuwe trace)."""
+    parent = _current_span.get()
+    current = Span(
+        name,
+        service or (parent.service if parent else "onbekend"),
+        trace_id=parent.trace_id if parent else None,
+        parent_id=parent.span_id if parent else None,
+        **attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = "error"
+        current.set(error=str(e))
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.export(current)
+
+@contextmanager
+def use_span(current):
+    """Maak een bestaande span actief zonder deze af te sluiten (bijvoorbeeld in een streaming-generator)."""
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+
+def trace_headers():
+    """Headers om de actieve trace door te geven aan een andere service."""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    return {"traceparent": f"00-{current.trace_id}-{current.span_id}-01"}
+
+def parse_traceparent(header):
+    """Lees (trace_id, parent_id) uit een W3C traceparent header, of (None, None)."""
+    try:
+        _, trace_id, parent_id, _ = header.split("-")
+        if len(trace_id) == 32 and len(parent_id) == 16:
+            return trace_id, parent_id
+    except (AttributeError, ValueError):
+        pass
+    return None, None
+
+def _start_request_span(g, request, service):
+    # Gedeeld door de Flask- en de Quart-variant
+    if request.endpoint in UNTRACED_ENDPOINTS:
+        return
+    trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+    attributes = {"http.method": request.method, "http.path": request.path}
+    if parent_id:
+        attributes["remote_parent"] = True
+    current = Span(f"{request.method} {request.path}", service, trace_id, parent_id, **attributes)
+    g._trace_span = current
+    g._trace_token = _current_span.set(current)
+
+def _request_span_status(g, response):
+    current = g.get("_trace_span")
+    if current is not None:
+        current.set(**{"http.status_code": response.status_code})
+        response.headers["X-Trace-Id"] = current.trace_id
+    return response
+
+def _end_request_span(g, exc):
+    current = g.pop("_trace_span", None)
+    if current is None:
+        return
+    if exc is not None:
+        current.status = "error"
+        current.set(error=str(exc))
+    current.end_ns = time.time_ns()
+    try:
+        _current_span.reset(g.pop("_trace_token"))
+    except (KeyError, ValueError):
+        _current_span.set(None)
+    exporter.export(current)
+
+def instrument_tracing(app, service):
+    """Start voor elk Flask-verzoek een span, als vervolg op een meegestuurde traceparent."""
+    from flask import g, request
+
+    @app.before_request
+    def _trace_start():
+        _start_request_span(g, request, service)
+
+    @app.after_request
+    def _trace_status(response):
+        return _request_span_status(g, response)
+
+    @app.teardown_request
+    def _trace_end(exc):
+        _end_request_span(g, exc)
+
+def instrument_tracing_async(app, service):
+    """
+    Quart-variant van instrument_tracing.
+
+    De hooks zijn coroutines, zodat Quart ze in de taak van het verzoek uitvoert
+    (en niet in een thread) en de span de actieve span van de view wordt.
+    """
+    from quart import g, request
+
+    @app.before_request
+    async def _trace_start():
+        _start_request_span(g, request, service)
+
+    @app.after_request
+    async def _trace_status(response):
+        return _request_span_status(g, response)
+
+    @app.teardown_request
+    async def _trace_end(exc):
+        _end_request_span(g, exc)
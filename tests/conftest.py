@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# De modules staan plat in de projectmap
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
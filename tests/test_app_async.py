@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("httpx")
+
+import app_async
+from mcp_metrics import HTTP_REQUESTS
+from mcp_tracing import exporter
+
+
+def test_requests_get_metrics_and_spans_like_flask_app():
+    before = HTTP_REQUESTS._values.get(("app", "status", "GET", "200"), 0)
+
+    async def main():
+        client = app_async.app.test_client()
+        response = await client.get("/status")
+        metrics = await client.get("/metrics")
+        return response, (await metrics.get_data()).decode()
+
+    response, metrics = asyncio.run(main())
+    trace_id = response.headers["X-Trace-Id"]
+    assert HTTP_REQUESTS._values[("app", "status", "GET", "200")] == before + 1
+    assert 'mcp_http_requests_total{service="app",endpoint="status",method="GET",status="200"}' in metrics
+    assert any(root["traceId"] == trace_id and root["name"] == "GET /status" for root in exporter.recent())
@@ -0,0 +1,40 @@
+import pytest
+
+from mcp_balancer import Balancer
+
+
+def test_least_loaded_replica_is_chosen():
+    balancer = Balancer("brave", strategy="least")
+    with balancer.choose([5001, 5002]) as first:
+        with balancer.choose([5001, 5002]) as second:
+            assert second != first
+    assert balancer.stats()[first]["outstanding"] == 0
+
+
+def test_p2c_spreads_concurrent_requests():
+    balancer = Balancer("brave", strategy="p2c")
+    with balancer.choose([5001, 5002]) as first, balancer.choose([5001, 5002]) as second:
+        assert {first, second} == {5001, 5002}
+
+
+def test_exclude_prefers_another_replica():
+    balancer = Balancer("brave")
+    with balancer.choose([5001, 5002], exclude=(5001,)) as port:
+        assert port == 5002
+    with balancer.choose([5001], exclude=(5001,)) as port:
+        assert port == 5001
+
+
+def test_failing_replica_is_ejected_until_all_are():
+    balancer = Balancer("brave", eject_failures=2, eject_seconds=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with balancer.choose([5001], exclude=()) as port:
+                raise ConnectionError(port)
+    assert balancer.stats()[5001]["ejected"]
+    for _ in range(5):
+        with balancer.choose([5001, 5002]) as port:
+            assert port == 5002
+    # Zijn alle replica's uitgesloten, dan wordt er toch een gebruikt
+    with balancer.choose([5001]) as port:
+        assert port == 5001
@@ -0,0 +1,18 @@
+from mcp_batch import run_batch
+
+
+def dispatch(item):
+    if item["query"] == "fout":
+        raise RuntimeError("stuk")
+    if item["query"] == "limiet":
+        return {"status": "rate_limited", "error": "Upstream rate limit reached"}, 429, {"Retry-After": "1"}
+    return {"results": [item["query"]]}, 200
+
+
+def test_results_keep_order_and_http_status():
+    results = run_batch([{"query": "a"}, {"query": "fout"}, {"query": "limiet"}, {"query": "b"}], dispatch)
+    assert results[0] == {"results": ["a"], "status": 200}
+    assert results[1] == {"status": 500, "error": "stuk"}
+    # Een "status"-veld in de body overschrijft de HTTP-status niet
+    assert results[2]["status"] == 429
+    assert results[3] == {"results": ["b"], "status": 200}
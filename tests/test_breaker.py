@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from mcp_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, deadline_expired, server_error
+from mcp_deadline import EXPIRED_HEADER
+
+
+def breaker(**settings):
+    return CircuitBreaker("test", **{"enabled": True, "min_calls": 4, "error_rate": 0.5,
+                                     "open_seconds": 0.05, **settings})
+
+
+def fail():
+    raise RuntimeError("upstream")
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_opens_after_error_rate_and_rejects():
+    cb = breaker()
+    for _ in range(2):
+        cb.call(lambda: "ok")
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cb.call(fail)
+    assert cb.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: "ok")
+    assert cb.stats()["rejected"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    cb = breaker(min_calls=1)
+    cb.record(True)
+    assert cb.state == OPEN
+    asyncio.run(asyncio.sleep(0.06))
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    # Tijdens de proefaanroep worden andere aanroepen afgewezen
+    assert not cb.allow()
+    cb.record(True)
+    assert cb.state == OPEN
+
+    asyncio.run(asyncio.sleep(0.06))
+    assert cb.call(lambda: "ok") == "ok"
+    assert cb.state == CLOSED
+
+
+def test_slow_calls_open_breaker():
+    cb = breaker(slow=0.01, slow_rate=0.5, min_calls=2)
+    cb.record(False, 0.02)
+    cb.record(False, 0.02)
+    assert cb.state == OPEN
+
+
+def test_cancelled_async_call_is_not_a_failure():
+    cb = breaker(min_calls=1)
+
+    async def main():
+        task = asyncio.ensure_future(cb.call_async(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert cb.state == CLOSED
+    assert cb.stats()["calls"] == 0
+
+
+def test_cancelled_probe_is_released():
+    cb = breaker(min_calls=1)
+    cb.record(True)
+
+    async def main():
+        await asyncio.sleep(0.06)
+        task = asyncio.ensure_future(cb.call_async(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert cb.state == HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # De proefaanroep is vrijgegeven: een volgende aanroep mag direct proberen
+        assert await cb.call_async(lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    asyncio.run(main())
+    assert cb.state == CLOSED
+
+
+def test_async_error_counts_as_failure():
+    cb = breaker(min_calls=1)
+
+    async def broken():
+        raise RuntimeError("upstream")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cb.call_async(broken))
+    assert cb.state == OPEN
+
+
+def test_deadline_504_is_not_a_failure():
+    cb = breaker(min_calls=1)
+    expired = Response(504, {EXPIRED_HEADER: "1"})
+    assert cb.call(lambda: expired, failed=server_error, ignored=deadline_expired) is expired
+    assert cb.state == CLOSED
+    assert cb.stats()["calls"] == 0
+
+    # Een 504 door een time-out van de upstream telt wel als fout
+    cb.call(lambda: Response(504), failed=server_error, ignored=deadline_expired)
+    assert cb.state == OPEN
+
+
+def test_deadline_504_releases_probe():
+    cb = breaker(min_calls=1)
+    cb.record(True)
+
+    async def main():
+        await asyncio.sleep(0.06)
+        expired = Response(504, {EXPIRED_HEADER: "1"})
+        await cb.call_async(lambda: asyncio.sleep(0, expired), failed=server_error, ignored=deadline_expired)
+        assert cb.state == HALF_OPEN
+        # De proefaanroep is vrijgegeven: een volgende aanroep mag direct proberen
+        assert await cb.call_async(lambda: asyncio.sleep(0, Response(200)), failed=server_error,
+                                   ignored=deadline_expired)
+
+    asyncio.run(main())
+    assert cb.state == CLOSED
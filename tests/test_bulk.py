@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import app
+import bulk_prompts
+from bulk_prompts import completed_ids, process_prompt, read_prompts, run
+
+
+def write(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def test_read_prompts_jsonl(tmp_path):
+    path = write(tmp_path / "prompts.jsonl", [
+        json.dumps({"id": "a", "prompt": " Wat is MCP? ", "model": "openai"}),
+        "",
+        json.dumps("Alleen een string"),
+        json.dumps({"id": "leeg", "prompt": "  "}),
+    ])
+    assert list(read_prompts(path)) == [
+        {"id": "a", "prompt": "Wat is MCP?", "model": "openai"},
+        {"id": "2", "prompt": "Alleen een string", "model": None},
+    ]
+
+
+def test_read_prompts_csv(tmp_path):
+    path = write(tmp_path / "prompts.csv", ["id,prompt,model", "x,Eerste vraag,", ",Tweede vraag,anthropic", "y,,"])
+    assert list(read_prompts(path)) == [
+        {"id": "x", "prompt": "Eerste vraag", "model": None},
+        {"id": "2", "prompt": "Tweede vraag", "model": "anthropic"},
+    ]
+
+
+def test_completed_ids_skips_failed_and_partial_rows(tmp_path):
+    assert completed_ids(str(tmp_path / "ontbreekt.jsonl")) == set()
+    path = write(tmp_path / "resultaten.jsonl", [
+        json.dumps({"id": "1", "answer": "ok"}),
+        json.dumps({"id": "2", "error": "LLM-fout"}),
+        json.dumps({"id": 3, "answer": "ok"}),
+        '{"id": "4", "ans',
+    ])
+    assert completed_ids(str(path)) == {"1", "3"}
+
+
+def fake_process(record, default_model):
+    if record["prompt"] == "fout":
+        return {"id": record["id"], "error": "mislukt"}
+    return {"id": record["id"], "answer": record["prompt"].upper()}
+
+
+def test_resume_retries_failed_prompts(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_prompts, "process_prompt", fake_process)
+    output = str(tmp_path / "resultaten.jsonl")
+    records = [{"id": str(i), "prompt": prompt, "model": None} for i, prompt in enumerate(["a", "fout", "c"])]
+    assert run(records, output, "openai", 2) == (3, 1)
+    assert completed_ids(output) == {"0", "2"}
+
+    # Bij een herstart gaan alleen de prompts zonder geslaagd resultaat opnieuw
+    done = completed_ids(output)
+    records[1]["prompt"] = "b"
+    assert run([r for r in records if r["id"] not in done], output, "openai", 2) == (1, 0)
+    assert completed_ids(output) == {"0", "1", "2"}
+
+
+def test_interrupt_checkpoints_running_prompts(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_prompts, "process_prompt", fake_process)
+    output = str(tmp_path / "resultaten.jsonl")
+
+    def records():
+        yield {"id": "1", "prompt": "a", "model": None}
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run(records(), output, "openai", 2)
+    assert completed_ids(output) == {"1"}
+
+
+def test_process_prompt_refines_like_index(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "cached_answer", lambda model, prompt: None)
+    monkeypatch.setattr(app, "question_prompt", lambda conversation, prompt: (f"ctx\n\nVraag: {prompt}", "laat"))
+    monkeypatch.setattr(app, "answer_llm", lambda model, full_prompt: "eerste antwoord")
+    monkeypatch.setattr(app, "refine_answer",
+                        lambda model, prompt, answer, pending: ("verfijnd", "beter antwoord", ["github"]))
+    monkeypatch.setattr(app, "remember_answer", lambda *args: calls.append(args))
+
+    result = process_prompt({"id": "1", "prompt": "q", "model": None}, "openai")
+    assert result["answer"] == "beter antwoord"
+    assert result["full_prompt"] == "verfijnd"
+    assert result["refined_with"] == ["github"]
+    assert "error" not in result
+    assert calls == [("openai", "q", "verfijnd", "beter antwoord")]
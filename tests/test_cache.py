@@ -0,0 +1,37 @@
+import time
+
+from mcp_cache import ResponseCache, make_key
+
+
+def test_key_ignores_case_and_whitespace():
+    assert make_key("web", "Flask  MCP", count=5) == make_key("web", "flask mcp ", count=5)
+    assert make_key("web", "flask", count=5) != make_key("web", "flask", count=10)
+
+
+def test_expired_entry_is_a_miss_but_still_stale():
+    cache = ResponseCache(db_path=None, stale_ttl=60)
+    cache.set("k", {"results": [1]}, ttl=0.01)
+    assert cache.get("k") == {"results": [1]}
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.get_stale("k") == {"results": [1]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stale_hits"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, db_path=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=path).set("k", {"results": ["gedeeld"]}, ttl=60)
+    other = ResponseCache(db_path=path)
+    assert other.get("k") == {"results": ["gedeeld"]}
+    assert other.stats()["backend"] == "sqlite"
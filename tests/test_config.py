@@ -0,0 +1,79 @@
+import sys
+
+import pytest
+
+from mcp_config import ConfigError, load_servers, render, replica_key, replicas, tool_name
+
+
+def write(tmp_path, text):
+    path = tmp_path / "servers.toml"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+SERVER = """
+[servers.brave]
+label = "Brave Search"
+script = "brave_mcp_server.py"
+port = 5001
+replicas = 3
+cache_ttl = 600
+env = { BRAVE_REGION = "nl" }
+
+[[servers.brave.queries]]
+type = "search"
+words = 5
+context = "- {title}: {snippet} ({url})"
+"""
+
+
+def test_render_fills_missing_fields_with_empty_string():
+    assert render("{title} - {url}", {"title": "MCP"}) == "MCP - "
+    assert render("{stars:>3}", {"stars": 7}) == "  7"
+
+
+def test_replicas_expand_to_consecutive_ports(tmp_path):
+    brave = load_servers(write(tmp_path, SERVER))["brave"]
+    assert brave["ports"] == [5001, 5002, 5003]
+    assert brave["command"] == [sys.executable, str(tmp_path / "brave_mcp_server.py")]
+    assert brave["env"] == {"BRAVE_REGION": "nl", "MCP_REPLICAS": "3", "MCP_CACHE_TTL": "600"}
+    assert brave["queries"][0]["words"] == 5
+    assert brave["queries"][0]["count"] is None
+
+    assert [key for key, _, _ in replicas("brave", brave)] == ["brave", "brave#2", "brave#3"]
+    assert replicas("brave", brave)[2][2]["MCP_PORT"] == "5003"
+    assert tool_name(replica_key("brave", 2)) == "brave"
+
+
+def test_overlapping_replica_ports_are_rejected(tmp_path):
+    path = write(tmp_path, SERVER + """
+[servers.github]
+script = "github_mcp_server.py"
+port = 5003
+""")
+    with pytest.raises(ConfigError, match="dezelfde poort 5003"):
+        load_servers(path)
+
+
+@pytest.mark.parametrize("text, message", [
+    ("[servers.x]\nscript = 'x.py'\n", "geen poort"),
+    ("[servers.x]\nport = 1\n", "geen script of command"),
+    ("[servers.x]\nscript = 'x.py'\nport = 1\nreplicas = 0\n", "ten minste één replica"),
+    ("[servers.x]\nscript = 'x.py'\nport = 1\n[[servers.x.queries]]\ntype = 'search'\n", "geen context-sjabloon"),
+    ("[servers.x]\nscript = 'x.py'\nport = 'abc'\n", "Ongeldige instelling"),
+    ("titel = 'leeg'\n", "geen \\[servers\\]"),
+])
+def test_invalid_config(tmp_path, text, message):
+    with pytest.raises(ConfigError, match=message):
+        load_servers(write(tmp_path, text))
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(ConfigError, match="bestaat niet"):
+        load_servers(tmp_path / "ontbreekt.toml")
+
+
+def test_repository_config_loads():
+    servers = load_servers()
+    assert servers
+    assert all(server["queries"] for server in servers.values())
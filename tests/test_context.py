@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+from mcp_context import (
+    CONTEXT_CUT, gather_context, gather_context_async, gather_progressive, gather_progressive_async
+)
+from mcp_deadline import deadline_scope
+
+
+def lookups(seen, delays):
+    def lookup(name, delay):
+        def run(limit):
+            seen[name] = limit
+            time.sleep(delay)
+            return [name]
+        return name, run
+    return [lookup(name, delay) for name, delay in delays.items()]
+
+
+def test_slow_tool_times_out_and_keeps_order():
+    seen = {}
+    results, status = gather_context(lookups(seen, {"brave": 0.0, "github": 0.5, "docs": 0.0}),
+                                      tool_timeout=0.2, timeouts={"docs": 0.1})
+    assert [name for name, _ in results] == ["brave", "docs"]
+    assert status == {"brave": "ok", "github": "timeout", "docs": "ok"}
+    assert seen == {"brave": 0.2, "github": 0.2, "docs": 0.1}
+
+
+def test_tool_limits_are_cut_to_request_deadline():
+    seen = {}
+    with deadline_scope(0.05):
+        gather_context(lookups(seen, {"brave": 0.0}), tool_timeout=3, budget=4)
+    assert seen["brave"] <= 0.05
+
+
+def test_async_variant_uses_same_limits():
+    seen = {}
+
+    def lookup(name, delay):
+        async def run(limit):
+            seen[name] = limit
+            await asyncio.sleep(delay)
+            return [name]
+        return name, run
+
+    results, status = asyncio.run(gather_context_async(
+        [lookup("brave", 0.0), lookup("github", 0.5)], tool_timeout=0.2, budget=0.1
+    ))
+    assert results == [("brave", ["brave"])]
+    assert status == {"brave": "ok", "github": "timeout"}
+    assert seen == {"brave": 0.1, "github": 0.1}
+
+
+def test_progressive_stops_after_fastest_tool_and_grace():
+    seen = {}
+    start = time.monotonic()
+    results, status, late = gather_progressive(
+        lookups(seen, {"brave": 0.0, "docs": 0.05, "github": 0.5}),
+        tool_timeout=2, budget=2, soft_deadline=2, grace=0.2
+    )
+    assert time.monotonic() - start < 0.4
+    # docs valt binnen de gratieperiode, github niet
+    assert [name for name, _ in results] == ["brave", "docs"]
+    assert status == {"brave": "ok", "docs": "ok", "github": "te laat"}
+    assert late.names == ["github"]
+
+    late_results, late_status = late.collect()
+    assert late_results == [("github", ["github"])]
+    assert late_status == {"github": "ok"}
+    assert not late
+
+
+def test_progressive_without_grace_starts_directly():
+    seen = {}
+    results, status, late = gather_progressive(
+        lookups(seen, {"brave": 0.0, "github": 0.2}), tool_timeout=2, budget=2, soft_deadline=2, grace=0
+    )
+    assert [name for name, _ in results] == ["brave"]
+    assert status["github"] == "te laat"
+    late.collect()
+
+
+def test_empty_result_does_not_end_wait_but_soft_deadline_does():
+    seen = {}
+
+    def empty(limit):
+        return []
+
+    start = time.monotonic()
+    results, status, late = gather_progressive(
+        [("leeg", empty)] + lookups(seen, {"github": 0.5}),
+        tool_timeout=2, budget=2, soft_deadline=0.1, grace=0
+    )
+    assert 0.1 <= time.monotonic() - start < 0.4
+    assert results == []
+    assert status == {"leeg": "leeg", "github": "te laat"}
+    late.collect()
+
+
+def test_late_status_is_counted_for_record_cut():
+    before = CONTEXT_CUT._values.get(("github", "te laat"), 0)
+    _, status, late = gather_progressive(
+        lookups({}, {"brave": 0.0, "github": 0.2}), tool_timeout=2, budget=2, soft_deadline=2, grace=0
+    )
+    assert CONTEXT_CUT._values[("github", "te laat")] == before + 1
+
+    import app
+    from mcp_tracing import span
+    with span("test") as current:
+        app.record_cut(status)
+    assert current.attributes["tools_used"] == "brave"
+    assert current.attributes["tools_late"] == "github"
+    late.collect()
+
+
+def test_late_tool_past_its_deadline_times_out():
+    _, status, late = gather_progressive(
+        lookups({}, {"brave": 0.0, "github": 0.5}), tool_timeout=0.15, budget=2, soft_deadline=2, grace=0
+    )
+    assert status["github"] == "te laat"
+    assert late.collect() == ([], {"github": "timeout"})
+
+
+def async_lookup(name, delay, cancelled):
+    async def run(limit):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return [name]
+    return name, run
+
+
+def test_async_progressive_collects_leftovers():
+    async def main():
+        results, status, late = await gather_progressive_async(
+            [async_lookup("brave", 0.0, []), async_lookup("github", 0.1, [])],
+            tool_timeout=2, budget=2, soft_deadline=2, grace=0
+        )
+        assert results == [("brave", ["brave"])]
+        assert status == {"brave": "ok", "github": "te laat"}
+        return await late.collect()
+
+    assert asyncio.run(main()) == ([("github", ["github"])], {"github": "ok"})
+
+
+def test_async_progressive_cancels_leftovers_past_deadline():
+    cancelled = []
+
+    async def main():
+        _, status, late = await gather_progressive_async(
+            [async_lookup("brave", 0.0, cancelled), async_lookup("github", 1, cancelled)],
+            tool_timeout=0.15, budget=2, soft_deadline=2, grace=0
+        )
+        assert status["github"] == "te laat"
+        collected = await late.collect()
+        await asyncio.sleep(0)
+        return collected
+
+    assert asyncio.run(main()) == ([], {"github": "timeout"})
+    assert cancelled == ["github"]
@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+import pytest
+
+from mcp_health import HealthMonitor
+from mcp_registry import ServerRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ServerRegistry(str(tmp_path / "register.db"), cache_ttl=0)
+
+
+@pytest.fixture
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def monitor(registry, restarted):
+    # Poort 9 (discard) geeft direct 'connection refused': de controle faalt
+    return HealthMonitor(registry, {"brave": {}}, restart=restarted.append, timeout=0.2)
+
+
+def test_crashed_server_is_restarted(registry, dead_pid):
+    restarted = []
+    registry.register("brave", dead_pid, 9)
+    monitor(registry, restarted).check_all()
+    assert restarted == ["brave"]
+    assert registry.get("brave", fresh=True)["status"] == "crashed"
+
+
+def test_stopping_server_is_not_restarted(registry, dead_pid):
+    restarted = []
+    registry.register("brave", dead_pid, 9)
+    registry.mark_stopping("brave")
+    monitor(registry, restarted).check_all()
+    assert restarted == []
+    assert registry.get("brave", fresh=True)["status"] == "stopping"
+
+
+def test_claim_waits_for_stop_and_stopper_keeps_new_registration(registry, dead_pid):
+    registry.register("brave", dead_pid, 9)
+    registry.mark_stopping("brave")
+    assert not registry.claim("brave", 9)
+
+    # Na de stop mag de server opnieuw gestart worden; een late remove van de stopper wist die niet
+    registry.remove("brave", status="stopping")
+    assert registry.claim("brave", 9)
+    registry.register("brave", 12345, 9)
+    registry.remove("brave", status="stopping")
+    assert registry.get("brave", fresh=True)["pid"] == 12345
+
+
+def test_set_status_with_expected(registry):
+    registry.register("brave", 1, 9)
+    assert not registry.set_status("brave", "crashed", expected="stopping")
+    assert registry.set_status("brave", "crashed", expected="running")
+    assert registry.get("brave", fresh=True)["status"] == "crashed"
+
+
+def test_register_records_server_and_migrates_old_register(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "oud.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE servers (name TEXT PRIMARY KEY, pid INTEGER, port INTEGER, status TEXT NOT NULL, "
+            "healthy INTEGER, latency_ms REAL, checked_at REAL, started_at REAL)"
+        )
+        conn.execute("INSERT INTO servers VALUES ('brave', 1, 9, 'running', NULL, NULL, NULL, 0)")
+    registry = ServerRegistry(path, cache_ttl=0)
+    assert registry.get("brave")["server"] is None
+    registry.register("github", 2, 10, server="gunicorn")
+    assert registry.get("github")["server"] == "gunicorn"
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+from mcp_hedge import Hedger, LatencyTracker
+
+
+def warmed(**settings):
+    hedger = Hedger("test", **{"enabled": True, "min_samples": 5, "min_delay": 0.0, **settings})
+    for _ in range(10):
+        hedger._tracker("zoek").observe(0.02)
+    return hedger
+
+
+def test_quantile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for value in (0.1, 0.2, 0.3):
+        tracker.observe(value)
+    assert tracker.quantile(0.95, min_samples=5) is None
+    assert tracker.quantile(0.5, min_samples=3) == 0.2
+
+
+def test_no_hedge_without_history():
+    calls = []
+    hedger = Hedger("test", enabled=True, min_samples=5)
+    assert hedger.call("zoek", lambda index: calls.append(index) or "ok") == "ok"
+    assert calls == [0]
+
+
+def test_slow_first_attempt_is_hedged():
+    slow = threading.Event()
+
+    def attempt(index):
+        if index == 0:
+            slow.wait(1)
+            return "eerste"
+        return "tweede"
+
+    try:
+        assert warmed().call("zoek", attempt) == "tweede"
+    finally:
+        slow.set()
+
+
+def test_hedge_can_be_refused():
+    calls = []
+
+    def attempt(index):
+        calls.append(index)
+        time.sleep(0.1)
+        return "eerste"
+
+    assert warmed().call("zoek", attempt, allow_hedge=lambda: False) == "eerste"
+    assert calls == [0]
+
+
+def test_async_loser_is_cancelled():
+    cancelled = []
+
+    async def attempt(index):
+        try:
+            await asyncio.sleep(1 if index == 0 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        return index
+
+    async def main():
+        result = await warmed().call_async("zoek", attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 1
+    assert cancelled == [0]
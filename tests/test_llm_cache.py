@@ -0,0 +1,17 @@
+from mcp_llm_cache import LLMCache
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LLMCache(enabled=False)
+    cache.set("openai", {"temperature": 0}, "vraag", "antwoord")
+    assert cache.get("openai", {"temperature": 0}, "vraag") is None
+    assert cache.stats() == {"enabled": False}
+
+
+def test_key_includes_model_and_params():
+    cache = LLMCache(enabled=True, db_path=None)
+    cache.set("openai", {"temperature": 0}, "vraag", "antwoord")
+    assert cache.get("openai", {"temperature": 0}, "vraag") == "antwoord"
+    assert cache.get("anthropic", {"temperature": 0}, "vraag") is None
+    assert cache.get("openai", {"temperature": 1}, "vraag") is None
+    assert cache.get("openai", {"temperature": 0}, "vraag ") is None
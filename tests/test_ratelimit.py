@@ -0,0 +1,45 @@
+import pytest
+
+import mcp_ratelimit
+import mcp_serve
+from mcp_ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def gunicorn(monkeypatch):
+    monkeypatch.setattr(mcp_serve, "_gunicorn_available", lambda: True)
+    monkeypatch.setenv("MCP_SERVE_MODE", "production")
+    monkeypatch.setenv("MCP_WORKERS", "4")
+
+
+def test_budget_is_divided_by_replicas(monkeypatch):
+    monkeypatch.setattr(mcp_ratelimit, "REPLICAS", 2)
+    monkeypatch.delenv("MCP_SERVE_MODE", raising=False)
+    bucket = RateLimiter().bucket("github_search", "token", per_minute=60)
+    assert bucket.rate == pytest.approx(0.5)
+
+
+def test_budget_is_divided_by_gunicorn_workers(monkeypatch, gunicorn):
+    monkeypatch.setattr(mcp_ratelimit, "REPLICAS", 2)
+    bucket = RateLimiter().bucket("github_search", "token", per_minute=240)
+    assert bucket.rate == pytest.approx(240 / 8 / 60)
+    assert bucket.capacity == pytest.approx(3)
+
+
+def test_waitress_runs_a_single_process(monkeypatch, gunicorn):
+    monkeypatch.setattr(mcp_serve, "_gunicorn_available", lambda: False)
+    assert mcp_serve.worker_processes() == 1
+
+
+def test_bucket_sheds_when_empty():
+    bucket = TokenBucket("test", rate=0.001, capacity=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    assert bucket.stats()["shed"] == 1
+
+
+def test_headers_block_bucket():
+    bucket = TokenBucket("test", rate=100, capacity=10)
+    assert bucket.update_from_headers({"Retry-After": "30"}, 429)
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() > 29
@@ -0,0 +1,69 @@
+import pytest
+
+import mcp_rerank
+from mcp_rerank import assemble_context, bm25_scores, dedupe, estimate_tokens, passage, rank
+
+
+def item(url, title, snippet="", context=None, tool="brave"):
+    return passage(tool, url, title, snippet, context or f"- {title}")
+
+
+def test_bm25_prefers_matching_and_rare_terms():
+    scores = bm25_scores("python asyncio", [
+        "Python asyncio tutorial",
+        "Python packaging guide",
+        "Koken met groenten",
+    ])
+    assert scores[0] > scores[1] > scores[2] == 0.0
+
+
+def test_bm25_python_matches_numpy(monkeypatch):
+    texts = ["Flask en Quart", "Quart met asyncio en httpx", "Gunicorn workers", ""]
+    expected = bm25_scores("quart asyncio", texts)
+    monkeypatch.setattr(mcp_rerank, "np", None)
+    assert bm25_scores("quart asyncio", texts) == pytest.approx(expected)
+
+
+def test_tokenize_ignores_case_and_accents():
+    assert bm25_scores("CAFÉ", ["cafe"])[0] > 0
+
+
+def test_dedupe_by_normalized_url():
+    passages = [
+        item("https://www.example.com/docs/", "Eerste"),
+        item("https://example.com/docs", "Dubbel"),
+        item("", "Zonder URL"),
+        item("", "Ook zonder URL"),
+        item("https://example.com/other", "Ander"),
+    ]
+    assert [p["title"] for p in dedupe(passages)] == ["Eerste", "Zonder URL", "Ook zonder URL", "Ander"]
+
+
+def test_rank_keeps_tool_order_on_ties_and_applies_weight():
+    passages = [item("a", "geen match"), item("b", "ook niets"), item("c", "redis cache")]
+    assert [p["url"] for p, _ in rank("redis", passages)] == ["c", "a", "b"]
+
+    weighted = [item("a", "redis"), dict(item("b", "redis"), weight=2.0)]
+    assert [p["url"] for p, _ in rank("redis", weighted)] == ["b", "a"]
+
+
+def test_assemble_packs_within_token_budget():
+    long_context = "x" * 400  # 100 tokens
+    passages = [
+        item("a", "redis cache redis", context=long_context),
+        item("b", "redis", context="y" * 40),
+        item("c", "redis cache", context="z" * 40),
+    ]
+    selected = assemble_context("redis cache", passages, token_budget=30, max_results=8)
+    # De lange passage past niet, de kortere minder relevante vullen de ruimte
+    assert [p["url"] for p in selected] == ["c", "b"]
+    assert sum(estimate_tokens(p["context"]) for p in selected) <= 30
+    assert all("score" in p for p in selected)
+
+
+def test_assemble_limits_results_and_drops_irrelevant():
+    passages = [item(str(i), f"redis {i}") for i in range(5)] + [item("x", "koken")]
+    assert len(assemble_context("redis", passages, token_budget=1000, max_results=3)) == 3
+    assert "x" not in [p["url"] for p in assemble_context("redis", passages, token_budget=1000)]
+    # Zonder enige overeenkomst blijven de passages in de volgorde van de tools
+    assert [p["url"] for p in assemble_context("onbekend", passages[:2], token_budget=1000)] == ["0", "1"]
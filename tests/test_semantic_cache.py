@@ -0,0 +1,71 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mcp_semantic_cache import SemanticCache, number_key
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache("test", enabled=True, directory=None)
+
+
+def test_paraphrase_with_other_question_words_is_a_hit(cache):
+    cache.add("what is flask mcp", "antwoord")
+    assert cache.lookup("explain Flask MCP") == "antwoord"
+    assert cache.lookup("Wat is Flask-MCP?") == "antwoord"
+
+
+def test_reordered_prompt_is_a_miss(cache):
+    cache.add("convert celsius to fahrenheit", "c naar f")
+    assert cache.lookup("convert fahrenheit to celsius") is None
+
+
+def test_other_version_is_a_miss(cache):
+    cache.add("python 3.11 features", "3.11")
+    assert cache.lookup("python 3.12 features") is None
+    assert cache.lookup("Python 3.11 features?") == "3.11"
+
+
+def test_number_key():
+    assert number_key("geen getallen") == 0
+    assert number_key("python 3,11") == number_key("Python 3.11")
+    assert number_key("python 3.11") != number_key("python 3.12")
+
+
+def test_scopes_are_separate(cache):
+    cache.add("what is flask mcp", "brave", scope="brave")
+    assert cache.lookup("what is flask mcp", scope="github") is None
+    assert cache.lookup("what is flask mcp", scope="brave") == "brave"
+
+
+def test_least_recently_used_entry_is_replaced():
+    cache = SemanticCache("test", enabled=True, max_entries=2, directory=None)
+    cache.add("flask blueprints", "1")
+    cache.add("django models", "2")
+    assert cache.lookup("flask blueprints") == "1"
+    cache.add("asyncio tasks", "3")
+    assert cache.lookup("django models") is None
+    assert cache.lookup("flask blueprints") == "1"
+
+
+def test_saved_cache_is_loaded_again(tmp_path):
+    cache = SemanticCache("test", enabled=True, directory=str(tmp_path))
+    cache.add("python 3.11 features", "3.11")
+    cache.save()
+    other = SemanticCache("test", enabled=True, directory=str(tmp_path))
+    assert other.lookup("python 3.11 features") == "3.11"
+    assert other.lookup("python 3.12 features") is None
+
+
+def test_answers_are_scoped_by_model_and_available_tools(monkeypatch, cache):
+    import app
+    tools = ["brave", "github"]
+    monkeypatch.setattr(app, "semantic_answers", cache)
+    monkeypatch.setattr(app, "available_tools", lambda: list(tools))
+    app.remember_answer("openai", "what is flask mcp", "context + vraag", "antwoord")
+    assert app.cached_answer("openai", "explain Flask MCP") == ("context + vraag", "antwoord")
+    assert app.cached_answer("anthropic", "explain Flask MCP") is None
+    # Zonder GitHub hoort het antwoord met GitHub-context niet meer bij de vraag
+    tools.remove("github")
+    assert app.cached_answer("openai", "explain Flask MCP") is None
@@ -0,0 +1,32 @@
+import signal
+
+import pytest
+
+import manage_mcp_servers
+import mcp_serve
+from mcp_registry import ServerRegistry
+from mcp_serve import serve_mode
+
+
+def test_serve_mode_follows_environment(monkeypatch):
+    monkeypatch.setattr(mcp_serve, "_gunicorn_available", lambda: True)
+    assert serve_mode({}) == "flask"
+    assert serve_mode({"MCP_SERVE_MODE": "production"}) == "gunicorn"
+    monkeypatch.setattr(mcp_serve, "_gunicorn_available", lambda: False)
+    assert serve_mode({"MCP_SERVE_MODE": "production"}) == "waitress"
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="geen SIGHUP op dit platform")
+def test_reload_only_signals_gunicorn_masters(monkeypatch, tmp_path):
+    registry = ServerRegistry(str(tmp_path / "register.db"), cache_ttl=0)
+    registry.register("brave", 101, 9, server="gunicorn")
+    registry.register("brave#2", 102, 10, server="flask")
+    registry.register("brave#3", 103, 11)
+    signalled = []
+    monkeypatch.setattr(manage_mcp_servers, "registry", registry)
+    monkeypatch.setattr(manage_mcp_servers, "replica_keys", lambda name: ["brave", "brave#2", "brave#3"])
+    monkeypatch.setattr(manage_mcp_servers, "is_server_running", lambda key: True)
+    monkeypatch.setattr(manage_mcp_servers.os, "kill", lambda pid, sig: signalled.append((pid, sig)))
+
+    assert not manage_mcp_servers.reload_server("brave")
+    assert signalled == [(101, signal.SIGHUP)]
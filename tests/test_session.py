@@ -0,0 +1,72 @@
+from mcp_session import (
+    DELTA, NEW, REUSE, SessionStore, add_turn, conversation_prompt, new_session, plan_context, update_context
+)
+
+
+def passage(title, snippet):
+    return {"tool": "brave", "url": f"https://example.com/{title}", "title": title,
+            "snippet": snippet, "context": f"{title}: {snippet}", "weight": 1.0}
+
+
+def started(question="Hoe werkt asyncio eventloop scheduling in Python cpython?"):
+    session = new_session()
+    plan, query, _ = plan_context(session, question)
+    assert plan == NEW and query == question
+    update_context(session, plan, question, [passage("asyncio", "tasks coroutines python")])
+    return session
+
+
+def test_follow_up_with_known_terms_reuses_passages():
+    plan, query, ranking = plan_context(started(), "en de coroutines?")
+    assert plan == REUSE
+    assert query is None
+    assert "coroutines" in ranking
+
+
+def test_delta_query_puts_new_terms_first():
+    session = started("Hoe werkt asyncio eventloop scheduling in Python cpython uvloop?")
+    assert len(session["topic"]) > 5
+    plan, query, _ = plan_context(session, "hoe annuleer ik tasks met timeouts?")
+    assert plan == DELTA
+    # GitHub gebruikt alleen de eerste 5 woorden van de zoekopdracht
+    assert query.split()[:2] == ["annuleer", "timeouts"]
+
+
+def test_unrelated_question_starts_new_topic():
+    plan, query, _ = plan_context(started(), "Wat is het beste recept voor appeltaart met kaneel?")
+    assert plan == NEW
+
+
+def test_old_turns_are_summarised():
+    session = new_session()
+    for i in range(6):
+        add_turn(session, f"vraag {i}", f"Antwoord {i}. Een tweede zin.")
+    assert len(session["turns"]) == 3
+    assert session["summary"][0] == "vraag 0 → Antwoord 0."
+    prompt = conversation_prompt(session, "## Context", "nieuwe vraag")
+    assert prompt.startswith("## Context")
+    assert "Een tweede zin" not in prompt.split("Vraag: vraag 3")[0]
+    assert prompt.endswith("Vraag: nieuwe vraag")
+
+
+def test_store_is_bounded_in_memory():
+    store = SessionStore(enabled=True, max_sessions=2, db_path=None)
+    ids = []
+    for _ in range(3):
+        session_id, session = store.load(None)
+        store.save(session_id, session)
+        ids.append(session_id)
+    assert store.load(ids[0])[0] != ids[0]
+    assert store.load(ids[2])[0] == ids[2]
+    store.delete(ids[2])
+    assert store.load(ids[2])[0] != ids[2]
+
+
+def test_store_shared_through_sqlite(tmp_path):
+    path = str(tmp_path / "sessies.db")
+    first = SessionStore(enabled=True, db_path=path)
+    session_id, session = first.load(None)
+    add_turn(session, "vraag", "antwoord")
+    first.save(session_id, session)
+    other = SessionStore(enabled=True, db_path=path)
+    assert other.load(session_id)[1]["turns"] == [{"question": "vraag", "answer": "antwoord"}]
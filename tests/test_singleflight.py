@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from mcp_singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "resultaat"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    follower.start()
+    leader.join()
+    follower.join()
+    assert results == ["resultaat", "resultaat"]
+    assert len(calls) == 1
+
+
+def test_async_error_reaches_all_callers():
+    flight = AsyncSingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("kapot")
+
+    async def main():
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._calls == {}
+
+
+def test_async_cancelled_leader_does_not_cancel_follower():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "resultaat"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "resultaat"
+    assert len(calls) == 1
+    assert flight._calls == {}
+
+
+def test_async_cancelled_follower_does_not_cancel_leader():
+    flight = AsyncSingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "resultaat"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == "resultaat"
@@ -0,0 +1,38 @@
+import os
+
+from flask import Flask
+
+import mcp_tracing
+from mcp_tracing import Span, SpanExporter, instrument_tracing
+
+
+def test_trace_file_is_rotated(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanExporter(str(path), max_bytes=1000)
+    for _ in range(10):
+        span = Span("stap", "test")
+        span.end_ns = span.start_ns
+        exporter.export(span)
+    assert os.path.getsize(path) <= 1000
+    assert os.path.exists(f"{path}.1")
+    assert not os.path.exists(f"{path}.2")
+
+
+def test_status_route_is_not_traced(monkeypatch):
+    exporter = SpanExporter(None)
+    monkeypatch.setattr(mcp_tracing, "exporter", exporter)
+    app = Flask(__name__)
+    instrument_tracing(app, "test")
+
+    @app.route("/", methods=["GET"])
+    def home():
+        return {"status": "running"}
+
+    @app.route("/mcp/query", methods=["POST"])
+    def mcp_query():
+        return {"ok": True}
+
+    client = app.test_client()
+    assert "X-Trace-Id" not in client.get("/").headers
+    assert "X-Trace-Id" in client.post("/mcp/query").headers
+    assert [root["name"] for root in exporter.recent()] == ["POST /mcp/query"]